@@ -42,6 +42,9 @@
 #include <derivative_dynmat.h>
 #include <kgrid.h>
 #include <tetrahedron_method.h>
+#ifdef PHPY_WITH_LAPACK
+#include <phonon_solver.h>
+#endif
 
 #define KB 8.6173382568083159E-05
 
@@ -54,16 +57,30 @@ static PyObject *
 py_perm_trans_symmetrize_compact_fc(PyObject *self, PyObject *args);
 static PyObject * py_transpose_compact_fc(PyObject *self, PyObject *args);
 static PyObject * py_get_dynamical_matrix(PyObject *self, PyObject *args);
+static PyObject * py_get_dynamical_matrices(PyObject *self, PyObject *args);
+static PyObject *
+py_get_dynamical_matrices_fc_pairs(PyObject *self, PyObject *args);
 static PyObject * py_get_nac_dynamical_matrix(PyObject *self, PyObject *args);
 static PyObject * py_get_dipole_dipole(PyObject *self, PyObject *args);
+static PyObject * py_get_dipole_dipoles(PyObject *self, PyObject *args);
 static PyObject * py_get_dipole_dipole_q0(PyObject *self, PyObject *args);
 static PyObject * py_get_derivative_dynmat(PyObject *self, PyObject *args);
+static PyObject * py_get_derivative_dynmats(PyObject *self, PyObject *args);
+#ifdef PHPY_WITH_LAPACK
+static PyObject * py_get_phonons_at_qpoints(PyObject *self, PyObject *args);
+#endif
 static PyObject * py_get_thermal_properties(PyObject *self, PyObject *args);
+static PyObject *
+py_get_projected_thermal_properties(PyObject *self, PyObject *args);
+static PyObject *
+py_get_thermal_displacement_matrices(PyObject *self, PyObject *args);
 static PyObject * py_distribute_fc2(PyObject *self, PyObject *args);
 static PyObject * py_compute_permutation(PyObject *self, PyObject *args);
 static PyObject * py_gsv_copy_smallest_vectors(PyObject *self, PyObject *args);
 static PyObject * py_gsv_set_smallest_vectors(PyObject *self, PyObject *args);
 static PyObject *
+py_gsv_set_smallest_vectors_compact(PyObject *self, PyObject *args);
+static PyObject *
 py_thm_neighboring_grid_points(PyObject *self, PyObject *args);
 static PyObject *
 py_thm_relative_grid_address(PyObject *self, PyObject *args);
@@ -107,6 +124,18 @@ static void gsv_set_smallest_vectors(double (*smallest_vectors)[27][3],
                                      PHPYCONST double reduced_basis[3][3],
                                      PHPYCONST int trans_mat[3][3],
                                      const double symprec);
+static void
+gsv_set_smallest_vectors_compact(double (*smallest_vectors)[3],
+                                 int (*multiplicity)[2],
+                                 PHPYCONST double (*pos_to)[3],
+                                 const int num_pos_to,
+                                 PHPYCONST double (*pos_from)[3],
+                                 const int num_pos_from,
+                                 PHPYCONST int lattice_points[27][3],
+                                 PHPYCONST double reduced_basis[3][3],
+                                 PHPYCONST int trans_mat[3][3],
+                                 const int initialize,
+                                 const double symprec);
 static double get_free_energy(const double temperature,
                                     const double f);
 static double get_entropy(const double temperature,
@@ -130,6 +159,23 @@ static void set_translational_symmetry_compact_fc(double * fc,
                                                   const int n_satom,
                                                   const int n_patom);
 
+static void get_projected_thermal_properties(double *thermal_props,
+                                             const double *temperatures,
+                                             const int num_temp,
+                                             const double *freqs,
+                                             const double *coef,
+                                             const int *weights,
+                                             const int num_qpoints,
+                                             const int num_bands,
+                                             const int num_coef,
+                                             const double cutoff_frequency);
+static void get_thermal_displacement_matrices(double *disp_matrices,
+                                              const double *Q2,
+                                              const double *eigvecs,
+                                              const double *masses,
+                                              const int num_modes,
+                                              const int num_temp,
+                                              const int num_atom);
 /* static double get_energy(double temperature, double f); */
 static int nint(const double a);
 
@@ -165,16 +211,32 @@ static PyMethodDef _phonopy_methods[] = {
    "Transpose compact force constants"},
   {"dynamical_matrix", py_get_dynamical_matrix, METH_VARARGS,
    "Dynamical matrix"},
+  {"dynamical_matrices", py_get_dynamical_matrices, METH_VARARGS,
+   "Dynamical matrices at q-points"},
+  {"dynamical_matrices_fc_pairs", py_get_dynamical_matrices_fc_pairs,
+   METH_VARARGS, "Dynamical matrices at q-points from force constants pairs"},
   {"nac_dynamical_matrix", py_get_nac_dynamical_matrix, METH_VARARGS,
    "NAC dynamical matrix"},
   {"dipole_dipole", py_get_dipole_dipole, METH_VARARGS,
    "Dipole-dipole interaction"},
+  {"dipole_dipoles", py_get_dipole_dipoles, METH_VARARGS,
+   "Dipole-dipole interaction at q-points"},
   {"dipole_dipole_q0", py_get_dipole_dipole_q0, METH_VARARGS,
    "q=0 terms of Dipole-dipole interaction"},
   {"derivative_dynmat", py_get_derivative_dynmat, METH_VARARGS,
    "Q derivative of dynamical matrix"},
+  {"derivative_dynmats", py_get_derivative_dynmats, METH_VARARGS,
+   "Q derivatives of dynamical matrices at q-points"},
+#ifdef PHPY_WITH_LAPACK
+  {"phonons_at_qpoints", py_get_phonons_at_qpoints, METH_VARARGS,
+   "Solve phonons at q-points by LAPACK zheevd"},
+#endif
   {"thermal_properties", py_get_thermal_properties, METH_VARARGS,
    "Thermal properties"},
+  {"projected_thermal_properties", py_get_projected_thermal_properties,
+   METH_VARARGS, "Projected thermal properties"},
+  {"thermal_displacement_matrices", py_get_thermal_displacement_matrices,
+   METH_VARARGS, "Thermal displacement matrices at temperatures"},
   {"distribute_fc2", py_distribute_fc2,
    METH_VARARGS,
    "Distribute force constants for all atoms in atom_list using precomputed symmetry mappings."},
@@ -184,6 +246,8 @@ static PyMethodDef _phonopy_methods[] = {
    "Implementation detail of get_smallest_vectors."},
   {"gsv_set_smallest_vectors", py_gsv_set_smallest_vectors, METH_VARARGS,
    "Set candidate vectors."},
+  {"gsv_set_smallest_vectors_compact", py_gsv_set_smallest_vectors_compact,
+   METH_VARARGS, "Implementation detail of get_smallest_vectors."},
   {"neighboring_grid_points", py_thm_neighboring_grid_points,
    METH_VARARGS, "Neighboring grid points by relative grid addresses"},
   {"tetrahedra_relative_grid_address", py_thm_relative_grid_address,
@@ -274,9 +338,9 @@ static PyObject * py_transform_dynmat_to_fc(PyObject *self, PyObject *args)
   double* fc;
   double* dm;
   double (*comm_points)[3];
-  double (*shortest_vectors)[27][3];
+  double (*svecs)[3];
   double* masses;
-  int* multiplicities;
+  int (*multi)[2];
   int* s2pp_map;
   int* fc_index_map;
   int num_patom;
@@ -297,9 +361,9 @@ static PyObject * py_transform_dynmat_to_fc(PyObject *self, PyObject *args)
   fc = (double*)PyArray_DATA(py_force_constants);
   dm = (double*)PyArray_DATA(py_dynamical_matrices);
   comm_points = (double(*)[3])PyArray_DATA(py_commensurate_points);
-  shortest_vectors = (double(*)[27][3])PyArray_DATA(py_shortest_vectors);
+  svecs = (double(*)[3])PyArray_DATA(py_shortest_vectors);
   masses = (double*)PyArray_DATA(py_masses);
-  multiplicities = (int*)PyArray_DATA(py_multiplicities);
+  multi = (int(*)[2])PyArray_DATA(py_multiplicities);
   s2pp_map = (int*)PyArray_DATA(py_s2pp_map);
   fc_index_map = (int*)PyArray_DATA(py_fc_index_map);
   num_patom = PyArray_DIMS(py_multiplicities)[1];
@@ -308,8 +372,8 @@ static PyObject * py_transform_dynmat_to_fc(PyObject *self, PyObject *args)
   dym_transform_dynmat_to_fc(fc,
                              dm,
                              comm_points,
-                             shortest_vectors,
-                             multiplicities,
+                             svecs,
+                             multi,
                              masses,
                              s2pp_map,
                              fc_index_map,
@@ -457,6 +521,66 @@ static PyObject * py_gsv_set_smallest_vectors(PyObject *self, PyObject *args)
   Py_RETURN_NONE;
 }
 
+static PyObject *
+py_gsv_set_smallest_vectors_compact(PyObject *self, PyObject *args)
+{
+  PyArrayObject* py_smallest_vectors;
+  PyArrayObject* py_multiplicity;
+  PyArrayObject* py_pos_to;
+  PyArrayObject* py_pos_from;
+  PyArrayObject* py_lattice_points;
+  PyArrayObject* py_reduced_basis;
+  PyArrayObject* py_trans_mat;
+  int initialize;
+  double symprec;
+
+  double (*smallest_vectors)[3];
+  int (*multiplicity)[2];
+  double (*pos_to)[3];
+  double (*pos_from)[3];
+  int (*lattice_points)[3];
+  double (*reduced_basis)[3];
+  int (*trans_mat)[3];
+  int num_pos_to, num_pos_from;
+
+  if (!PyArg_ParseTuple(args, "OOOOOOOid",
+                        &py_smallest_vectors,
+                        &py_multiplicity,
+                        &py_pos_to,
+                        &py_pos_from,
+                        &py_lattice_points,
+                        &py_reduced_basis,
+                        &py_trans_mat,
+                        &initialize,
+                        &symprec)) {
+    return NULL;
+  }
+
+  smallest_vectors = (double(*)[3])PyArray_DATA(py_smallest_vectors);
+  multiplicity = (int(*)[2])PyArray_DATA(py_multiplicity);
+  pos_to = (double(*)[3])PyArray_DATA(py_pos_to);
+  pos_from = (double(*)[3])PyArray_DATA(py_pos_from);
+  num_pos_to = PyArray_DIMS(py_pos_to)[0];
+  num_pos_from = PyArray_DIMS(py_pos_from)[0];
+  lattice_points = (int(*)[3])PyArray_DATA(py_lattice_points);
+  reduced_basis = (double(*)[3])PyArray_DATA(py_reduced_basis);
+  trans_mat = (int(*)[3])PyArray_DATA(py_trans_mat);
+
+  gsv_set_smallest_vectors_compact(smallest_vectors,
+                                   multiplicity,
+                                   pos_to,
+                                   num_pos_to,
+                                   pos_from,
+                                   num_pos_from,
+                                   lattice_points,
+                                   reduced_basis,
+                                   trans_mat,
+                                   initialize,
+                                   symprec);
+
+  Py_RETURN_NONE;
+}
+
 static PyObject * py_perm_trans_symmetrize_fc(PyObject *self, PyObject *args)
 {
   PyArrayObject* force_constants;
@@ -649,9 +773,9 @@ static PyObject * py_get_dynamical_matrix(PyObject *self, PyObject *args)
   double* dm;
   double* fc;
   double* q;
-  double (*svecs)[27][3];
+  double (*svecs)[3];
   double* m;
-  int* multi;
+  int (*multi)[2];
   int* s2p_map;
   int* p2s_map;
   int num_patom;
@@ -672,14 +796,15 @@ static PyObject * py_get_dynamical_matrix(PyObject *self, PyObject *args)
   dm = (double*)PyArray_DATA(py_dynamical_matrix);
   fc = (double*)PyArray_DATA(py_force_constants);
   q = (double*)PyArray_DATA(py_q);
-  svecs = (double(*)[27][3])PyArray_DATA(py_shortest_vectors);
+  svecs = (double(*)[3])PyArray_DATA(py_shortest_vectors);
   m = (double*)PyArray_DATA(py_masses);
-  multi = (int*)PyArray_DATA(py_multiplicities);
+  multi = (int(*)[2])PyArray_DATA(py_multiplicities);
   s2p_map = (int*)PyArray_DATA(py_s2p_map);
   p2s_map = (int*)PyArray_DATA(py_p2s_map);
   num_patom = PyArray_DIMS(py_p2s_map)[0];
   num_satom = PyArray_DIMS(py_s2p_map)[0];
 
+  Py_BEGIN_ALLOW_THREADS
   dym_get_dynamical_matrix_at_q(dm,
                                 num_patom,
                                 num_satom,
@@ -692,10 +817,141 @@ static PyObject * py_get_dynamical_matrix(PyObject *self, PyObject *args)
                                 p2s_map,
                                 NULL,
                                 1);
+  Py_END_ALLOW_THREADS
+
+  Py_RETURN_NONE;
+}
+
+static PyObject * py_get_dynamical_matrices(PyObject *self, PyObject *args)
+{
+  PyArrayObject* py_dynamical_matrices;
+  PyArrayObject* py_force_constants;
+  PyArrayObject* py_shortest_vectors;
+  PyArrayObject* py_qpoints;
+  PyArrayObject* py_multiplicities;
+  PyArrayObject* py_masses;
+  PyArrayObject* py_s2p_map;
+  PyArrayObject* py_p2s_map;
+
+  double* dm;
+  double* fc;
+  double (*qpoints)[3];
+  double (*svecs)[3];
+  double* m;
+  int (*multi)[2];
+  int* s2p_map;
+  int* p2s_map;
+  int num_qpoints;
+  int num_patom;
+  int num_satom;
+
+  if (!PyArg_ParseTuple(args, "OOOOOOOO",
+                        &py_dynamical_matrices,
+                        &py_force_constants,
+                        &py_qpoints,
+                        &py_shortest_vectors,
+                        &py_multiplicities,
+                        &py_masses,
+                        &py_s2p_map,
+                        &py_p2s_map)) {
+    return NULL;
+  }
+
+  dm = (double*)PyArray_DATA(py_dynamical_matrices);
+  fc = (double*)PyArray_DATA(py_force_constants);
+  qpoints = (double(*)[3])PyArray_DATA(py_qpoints);
+  svecs = (double(*)[3])PyArray_DATA(py_shortest_vectors);
+  m = (double*)PyArray_DATA(py_masses);
+  multi = (int(*)[2])PyArray_DATA(py_multiplicities);
+  s2p_map = (int*)PyArray_DATA(py_s2p_map);
+  p2s_map = (int*)PyArray_DATA(py_p2s_map);
+  num_qpoints = PyArray_DIMS(py_qpoints)[0];
+  num_patom = PyArray_DIMS(py_p2s_map)[0];
+  num_satom = PyArray_DIMS(py_s2p_map)[0];
+
+  Py_BEGIN_ALLOW_THREADS
+  dym_get_dynamical_matrices_at_qpoints(dm,
+                                        qpoints,
+                                        num_qpoints,
+                                        num_patom,
+                                        num_satom,
+                                        fc,
+                                        svecs,
+                                        multi,
+                                        m,
+                                        s2p_map,
+                                        p2s_map);
+  Py_END_ALLOW_THREADS
 
   Py_RETURN_NONE;
 }
 
+static PyObject *
+py_get_dynamical_matrices_fc_pairs(PyObject *self, PyObject *args)
+{
+  PyArrayObject* py_dynamical_matrices;
+  PyArrayObject* py_fc_pairs;
+  PyArrayObject* py_pair_ptr;
+  PyArrayObject* py_pair_satoms;
+  PyArrayObject* py_qpoints;
+  PyArrayObject* py_shortest_vectors;
+  PyArrayObject* py_multiplicities;
+  PyArrayObject* py_masses;
+  PyArrayObject* py_s2pp_map;
+
+  double* dm;
+  double (*fc_pairs)[3][3];
+  int* pair_ptr;
+  int* pair_satoms;
+  double (*qpoints)[3];
+  double (*svecs)[3];
+  double* m;
+  int (*multi)[2];
+  int* s2pp_map;
+  int num_qpoints;
+  int num_patom;
+
+  if (!PyArg_ParseTuple(args, "OOOOOOOOO",
+                        &py_dynamical_matrices,
+                        &py_fc_pairs,
+                        &py_pair_ptr,
+                        &py_pair_satoms,
+                        &py_qpoints,
+                        &py_shortest_vectors,
+                        &py_multiplicities,
+                        &py_masses,
+                        &py_s2pp_map)) {
+    return NULL;
+  }
+
+  dm = (double*)PyArray_DATA(py_dynamical_matrices);
+  fc_pairs = (double(*)[3][3])PyArray_DATA(py_fc_pairs);
+  pair_ptr = (int*)PyArray_DATA(py_pair_ptr);
+  pair_satoms = (int*)PyArray_DATA(py_pair_satoms);
+  qpoints = (double(*)[3])PyArray_DATA(py_qpoints);
+  svecs = (double(*)[3])PyArray_DATA(py_shortest_vectors);
+  m = (double*)PyArray_DATA(py_masses);
+  multi = (int(*)[2])PyArray_DATA(py_multiplicities);
+  s2pp_map = (int*)PyArray_DATA(py_s2pp_map);
+  num_qpoints = PyArray_DIMS(py_qpoints)[0];
+  num_patom = PyArray_DIMS(py_masses)[0];
+
+  Py_BEGIN_ALLOW_THREADS
+  dym_get_dynamical_matrices_at_qpoints_fc_pairs(dm,
+                                                 qpoints,
+                                                 num_qpoints,
+                                                 num_patom,
+                                                 fc_pairs,
+                                                 pair_ptr,
+                                                 pair_satoms,
+                                                 svecs,
+                                                 multi,
+                                                 m,
+                                                 s2pp_map);
+  Py_END_ALLOW_THREADS
+
+  Py_RETURN_NONE;
+}
 
 static PyObject * py_get_nac_dynamical_matrix(PyObject *self, PyObject *args)
 {
@@ -715,10 +971,10 @@ static PyObject * py_get_nac_dynamical_matrix(PyObject *self, PyObject *args)
   double* fc;
   double* q_cart;
   double* q;
-  double (*svecs)[27][3];
+  double (*svecs)[3];
   double* m;
   double (*born)[3][3];
-  int* multi;
+  int (*multi)[2];
   int* s2p_map;
   int* p2s_map;
   int num_patom;
@@ -745,10 +1001,10 @@ static PyObject * py_get_nac_dynamical_matrix(PyObject *self, PyObject *args)
   fc = (double*)PyArray_DATA(py_force_constants);
   q_cart = (double*)PyArray_DATA(py_q_cart);
   q = (double*)PyArray_DATA(py_q);
-  svecs = (double(*)[27][3])PyArray_DATA(py_shortest_vectors);
+  svecs = (double(*)[3])PyArray_DATA(py_shortest_vectors);
   m = (double*)PyArray_DATA(py_masses);
   born = (double(*)[3][3])PyArray_DATA(py_born);
-  multi = (int*)PyArray_DATA(py_multiplicities);
+  multi = (int(*)[2])PyArray_DATA(py_multiplicities);
   s2p_map = (int*)PyArray_DATA(py_s2p_map);
   p2s_map = (int*)PyArray_DATA(py_p2s_map);
   num_patom = PyArray_DIMS(py_p2s_map)[0];
@@ -758,6 +1014,7 @@ static PyObject * py_get_nac_dynamical_matrix(PyObject *self, PyObject *args)
     malloc(sizeof(double[3][3]) * num_patom * num_patom);
   n = num_satom / num_patom;
 
+  Py_BEGIN_ALLOW_THREADS
   dym_get_charge_sum(charge_sum, num_patom, factor / n, q_cart, born);
   dym_get_dynamical_matrix_at_q(dm,
                                 num_patom,
@@ -771,6 +1028,7 @@ static PyObject * py_get_nac_dynamical_matrix(PyObject *self, PyObject *args)
                                 p2s_map,
                                 charge_sum,
                                 1);
+  Py_END_ALLOW_THREADS
 
   free(charge_sum);
 
@@ -787,6 +1045,7 @@ static PyObject * py_get_dipole_dipole(PyObject *self, PyObject *args)
   PyArrayObject* py_born;
   PyArrayObject* py_dielectric;
   PyArrayObject* py_positions;
+  PyArrayObject* py_masses;
   double factor;
   double lambda;
   double tolerance;
@@ -799,9 +1058,10 @@ static PyObject * py_get_dipole_dipole(PyObject *self, PyObject *args)
   double (*born)[3][3];
   double (*dielectric)[3];
   double (*pos)[3];
+  double* masses;
   int num_patom, num_G;
 
-  if (!PyArg_ParseTuple(args, "OOOOOOOOddd",
+  if (!PyArg_ParseTuple(args, "OOOOOOOOOddd",
                         &py_dd,
                         &py_dd_q0,
                         &py_G_list,
@@ -810,6 +1070,7 @@ static PyObject * py_get_dipole_dipole(PyObject *self, PyObject *args)
                         &py_born,
                         &py_dielectric,
                         &py_positions,
+                        &py_masses,
                         &factor,
                         &lambda,
                         &tolerance))
@@ -828,9 +1089,15 @@ static PyObject * py_get_dipole_dipole(PyObject *self, PyObject *args)
   born = (double(*)[3][3])PyArray_DATA(py_born);
   dielectric = (double(*)[3])PyArray_DATA(py_dielectric);
   pos = (double(*)[3])PyArray_DATA(py_positions);
+  if ((PyObject*)py_masses == Py_None) {
+    masses = NULL;
+  } else {
+    masses = (double*)PyArray_DATA(py_masses);
+  }
   num_G = PyArray_DIMS(py_G_list)[0];
   num_patom = PyArray_DIMS(py_positions)[0];
 
+  Py_BEGIN_ALLOW_THREADS
   dym_get_dipole_dipole(dd, /* [natom, 3, natom, 3, (real, imag)] */
                         dd_q0, /* [natom, 3, 3, (real, imag)] */
                         G_list, /* [num_kvec, 3] */
@@ -841,9 +1108,86 @@ static PyObject * py_get_dipole_dipole(PyObject *self, PyObject *args)
                         born,
                         dielectric,
                         pos, /* [natom, 3] */
+                        masses,
                         factor, /* 4pi/V*unit-conv */
                         lambda, /* 4 * Lambda^2 */
-                        tolerance);
+                        tolerance,
+                        1);
+  Py_END_ALLOW_THREADS
+
+  Py_RETURN_NONE;
+}
+
+static PyObject * py_get_dipole_dipoles(PyObject *self, PyObject *args)
+{
+  PyArrayObject* py_dd;
+  PyArrayObject* py_dd_q0;
+  PyArrayObject* py_G_list;
+  PyArrayObject* py_q_cart;
+  PyArrayObject* py_born;
+  PyArrayObject* py_dielectric;
+  PyArrayObject* py_positions;
+  PyArrayObject* py_masses;
+  double factor;
+  double lambda;
+  double tolerance;
+
+  double* dd;
+  double* dd_q0;
+  double (*G_list)[3];
+  double (*q_cart)[3];
+  double (*born)[3][3];
+  double (*dielectric)[3];
+  double (*pos)[3];
+  double* masses;
+  int num_patom, num_G, num_qpoints;
+
+  if (!PyArg_ParseTuple(args, "OOOOOOOOddd",
+                        &py_dd,
+                        &py_dd_q0,
+                        &py_G_list,
+                        &py_q_cart,
+                        &py_born,
+                        &py_dielectric,
+                        &py_positions,
+                        &py_masses,
+                        &factor,
+                        &lambda,
+                        &tolerance))
+    return NULL;
+
+  dd = (double*)PyArray_DATA(py_dd);
+  dd_q0 = (double*)PyArray_DATA(py_dd_q0);
+  G_list = (double(*)[3])PyArray_DATA(py_G_list);
+  q_cart = (double(*)[3])PyArray_DATA(py_q_cart);
+  born = (double(*)[3][3])PyArray_DATA(py_born);
+  dielectric = (double(*)[3])PyArray_DATA(py_dielectric);
+  pos = (double(*)[3])PyArray_DATA(py_positions);
+  if ((PyObject*)py_masses == Py_None) {
+    masses = NULL;
+  } else {
+    masses = (double*)PyArray_DATA(py_masses);
+  }
+  num_G = PyArray_DIMS(py_G_list)[0];
+  num_patom = PyArray_DIMS(py_positions)[0];
+  num_qpoints = PyArray_DIMS(py_q_cart)[0];
+
+  Py_BEGIN_ALLOW_THREADS
+  dym_get_dipole_dipoles_at_qpoints(dd, /* [num_q, natom, 3, natom, 3, 2] */
+                                    q_cart, /* [num_q, 3] */
+                                    num_qpoints,
+                                    dd_q0, /* [natom, 3, 3, (real, imag)] */
+                                    G_list, /* [num_kvec, 3] */
+                                    num_G,
+                                    num_patom,
+                                    born,
+                                    dielectric,
+                                    pos, /* [natom, 3] */
+                                    masses,
+                                    factor, /* 4pi/V*unit-conv */
+                                    lambda,
+                                    tolerance);
+  Py_END_ALLOW_THREADS
 
   Py_RETURN_NONE;
 }
@@ -884,6 +1228,7 @@ static PyObject * py_get_dipole_dipole_q0(PyObject *self, PyObject *args)
   num_G = PyArray_DIMS(py_G_list)[0];
   num_patom = PyArray_DIMS(py_positions)[0];
 
+  Py_BEGIN_ALLOW_THREADS
   dym_get_dipole_dipole_q0(dd_q0, /* [natom, 3, 3, (real, imag)] */
                            G_list, /* [num_kvec, 3] */
                            num_G,
@@ -893,6 +1238,7 @@ static PyObject * py_get_dipole_dipole_q0(PyObject *self, PyObject *args)
                            pos, /* [natom, 3] */
                            lambda, /* 4 * Lambda^2 */
                            tolerance);
+  Py_END_ALLOW_THREADS
 
   Py_RETURN_NONE;
 }
@@ -974,6 +1320,7 @@ static PyObject * py_get_derivative_dynmat(PyObject *self, PyObject *args)
     q_dir = (double*)PyArray_DATA(q_direction);
   }
 
+  Py_BEGIN_ALLOW_THREADS
   get_derivative_dynmat_at_q(ddm,
                              num_patom,
                              num_satom,
@@ -989,10 +1336,304 @@ static PyObject * py_get_derivative_dynmat(PyObject *self, PyObject *args)
                              z,
                              epsilon,
                              q_dir);
+  Py_END_ALLOW_THREADS
 
   Py_RETURN_NONE;
 }
 
+static PyObject * py_get_derivative_dynmats(PyObject *self, PyObject *args)
+{
+  PyArrayObject* derivative_dynmats;
+  PyArrayObject* py_force_constants;
+  PyArrayObject* r_vector;
+  PyArrayObject* lattice;
+  PyArrayObject* py_qpoints;
+  PyArrayObject* py_multiplicities;
+  PyArrayObject* py_masses;
+  PyArrayObject* py_s2p_map;
+  PyArrayObject* py_p2s_map;
+  PyArrayObject* py_born;
+  PyArrayObject* dielectric;
+  PyArrayObject* q_direction;
+  PyArrayObject* py_directions;
+  double nac_factor;
+
+  double* ddms;
+  double* fc;
+  double* qpoints;
+  double* lat;
+  double* r;
+  double* m;
+  int* multi;
+  int* s2p_map;
+  int* p2s_map;
+  int num_qpoints;
+  int num_patom;
+  int num_satom;
+  int num_directions;
+
+  double *z;
+  double *epsilon;
+  double *q_dir;
+  double *directions;
+
+  if (!PyArg_ParseTuple(args, "OOOOOOOOOdOOOO",
+                        &derivative_dynmats,
+                        &py_force_constants,
+                        &py_qpoints,
+                        &lattice, /* column vectors */
+                        &r_vector,
+                        &py_multiplicities,
+                        &py_masses,
+                        &py_s2p_map,
+                        &py_p2s_map,
+                        &nac_factor,
+                        &py_born,
+                        &dielectric,
+                        &q_direction,
+                        &py_directions)) {
+    return NULL;
+  }
+
+  ddms = (double*)PyArray_DATA(derivative_dynmats);
+  fc = (double*)PyArray_DATA(py_force_constants);
+  qpoints = (double*)PyArray_DATA(py_qpoints);
+  num_qpoints = PyArray_DIMS(py_qpoints)[0];
+  lat = (double*)PyArray_DATA(lattice);
+  r = (double*)PyArray_DATA(r_vector);
+  m = (double*)PyArray_DATA(py_masses);
+  multi = (int*)PyArray_DATA(py_multiplicities);
+  s2p_map = (int*)PyArray_DATA(py_s2p_map);
+  p2s_map = (int*)PyArray_DATA(py_p2s_map);
+  num_patom = PyArray_DIMS(py_p2s_map)[0];
+  num_satom = PyArray_DIMS(py_s2p_map)[0];
+
+  if ((PyObject*)py_born == Py_None) {
+    z = NULL;
+  } else {
+    z = (double*)PyArray_DATA(py_born);
+  }
+  if ((PyObject*)dielectric == Py_None) {
+    epsilon = NULL;
+  } else {
+    epsilon = (double*)PyArray_DATA(dielectric);
+  }
+  if ((PyObject*)q_direction == Py_None) {
+    q_dir = NULL;
+  } else {
+    q_dir = (double*)PyArray_DATA(q_direction);
+  }
+  if ((PyObject*)py_directions == Py_None) {
+    directions = NULL;
+    num_directions = 0;
+  } else {
+    directions = (double*)PyArray_DATA(py_directions);
+    num_directions = PyArray_DIMS(py_directions)[0];
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  get_derivative_dynmat_at_qpoints(ddms,
+                                   num_qpoints,
+                                   num_patom,
+                                   num_satom,
+                                   fc,
+                                   qpoints,
+                                   lat,
+                                   r,
+                                   multi,
+                                   m,
+                                   s2p_map,
+                                   p2s_map,
+                                   nac_factor,
+                                   z,
+                                   epsilon,
+                                   q_dir,
+                                   directions,
+                                   num_directions);
+  Py_END_ALLOW_THREADS
+
+  Py_RETURN_NONE;
+}
+
+#ifdef PHPY_WITH_LAPACK
+static PyObject * py_get_phonons_at_qpoints(PyObject *self, PyObject *args)
+{
+  PyArrayObject* py_frequencies;
+  PyArrayObject* py_eigenvectors;
+  PyArrayObject* py_qpoints;
+  PyArrayObject* py_force_constants;
+  PyArrayObject* py_gonze_force_constants;
+  PyArrayObject* py_shortest_vectors;
+  PyArrayObject* py_multiplicities;
+  PyArrayObject* py_masses;
+  PyArrayObject* py_s2p_map;
+  PyArrayObject* py_p2s_map;
+  PyArrayObject* py_reciprocal_lattice;
+  PyArrayObject* py_born;
+  PyArrayObject* py_dielectric;
+  PyArrayObject* py_q_direction;
+  PyArrayObject* py_dd_q0;
+  PyArrayObject* py_G_list;
+  PyArrayObject* py_positions;
+  double nac_factor;
+  double lambda;
+  double frequency_factor;
+  double tolerance;
+  char* uplo;
+
+  double* freqs;
+  double* eigvecs;
+  double (*qpoints)[3];
+  double* fc;
+  double* gonze_fc;
+  double (*svecs)[3];
+  int (*multi)[2];
+  double* m;
+  int* s2p_map;
+  int* p2s_map;
+  double (*rec_lat)[3];
+  double (*born)[3][3];
+  double (*dielectric)[3];
+  double* q_direction;
+  double* dd_q0;
+  double (*G_list)[3];
+  double (*pos)[3];
+  int num_qpoints, num_patom, num_satom, num_G, num_failed, i;
+  int *info;
+
+  if (!PyArg_ParseTuple(args, "OOOOOOOOOOOOOdOOOOddds",
+                        &py_frequencies,
+                        &py_eigenvectors,
+                        &py_qpoints,
+                        &py_force_constants,
+                        &py_gonze_force_constants,
+                        &py_shortest_vectors,
+                        &py_multiplicities,
+                        &py_masses,
+                        &py_s2p_map,
+                        &py_p2s_map,
+                        &py_reciprocal_lattice,
+                        &py_born,
+                        &py_dielectric,
+                        &nac_factor,
+                        &py_q_direction,
+                        &py_dd_q0,
+                        &py_G_list,
+                        &py_positions,
+                        &lambda,
+                        &frequency_factor,
+                        &tolerance,
+                        &uplo)) {
+    return NULL;
+  }
+
+  freqs = (double*)PyArray_DATA(py_frequencies);
+  if ((PyObject*)py_eigenvectors == Py_None) {
+    eigvecs = NULL;
+  } else {
+    eigvecs = (double*)PyArray_DATA(py_eigenvectors);
+  }
+  qpoints = (double(*)[3])PyArray_DATA(py_qpoints);
+  fc = (double*)PyArray_DATA(py_force_constants);
+  if ((PyObject*)py_gonze_force_constants == Py_None) {
+    gonze_fc = NULL;
+  } else {
+    gonze_fc = (double*)PyArray_DATA(py_gonze_force_constants);
+  }
+  svecs = (double(*)[3])PyArray_DATA(py_shortest_vectors);
+  multi = (int(*)[2])PyArray_DATA(py_multiplicities);
+  m = (double*)PyArray_DATA(py_masses);
+  s2p_map = (int*)PyArray_DATA(py_s2p_map);
+  p2s_map = (int*)PyArray_DATA(py_p2s_map);
+  rec_lat = (double(*)[3])PyArray_DATA(py_reciprocal_lattice);
+  if ((PyObject*)py_born == Py_None) {
+    born = NULL;
+    dielectric = NULL;
+  } else {
+    born = (double(*)[3][3])PyArray_DATA(py_born);
+    dielectric = (double(*)[3])PyArray_DATA(py_dielectric);
+  }
+  if ((PyObject*)py_q_direction == Py_None) {
+    q_direction = NULL;
+  } else {
+    q_direction = (double*)PyArray_DATA(py_q_direction);
+  }
+  if ((PyObject*)py_G_list == Py_None) {
+    dd_q0 = NULL;
+    G_list = NULL;
+    pos = NULL;
+    num_G = 0;
+  } else {
+    dd_q0 = (double*)PyArray_DATA(py_dd_q0);
+    G_list = (double(*)[3])PyArray_DATA(py_G_list);
+    pos = (double(*)[3])PyArray_DATA(py_positions);
+    num_G = PyArray_DIMS(py_G_list)[0];
+  }
+  num_qpoints = PyArray_DIMS(py_qpoints)[0];
+  num_patom = PyArray_DIMS(py_p2s_map)[0];
+  num_satom = PyArray_DIMS(py_s2p_map)[0];
+
+  info = (int*)malloc(sizeof(int) * num_qpoints);
+  if (info == NULL && num_qpoints > 0) {
+    return PyErr_NoMemory();
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  num_failed = phs_get_phonons_at_qpoints(freqs,
+                                          eigvecs,
+                                          info,
+                                          qpoints,
+                                          num_qpoints,
+                                          num_patom,
+                                          num_satom,
+                                          fc,
+                                          gonze_fc,
+                                          svecs,
+                                          multi,
+                                          m,
+                                          s2p_map,
+                                          p2s_map,
+                                          rec_lat,
+                                          born,
+                                          dielectric,
+                                          nac_factor,
+                                          q_direction,
+                                          dd_q0,
+                                          G_list,
+                                          num_G,
+                                          pos,
+                                          lambda,
+                                          frequency_factor,
+                                          tolerance,
+                                          uplo[0]);
+  Py_END_ALLOW_THREADS
+
+  if (num_failed) {
+    for (i = 0; i < num_qpoints; i++) {
+      if (info[i]) {
+        break;
+      }
+    }
+    if (info[i] == PHS_ALLOC_ERROR) {
+      PyErr_NoMemory();
+    } else {
+      PyErr_Format(PyExc_RuntimeError,
+                   "zheevd failed at %d of %d q-points "
+                   "(first at q-point %d, info=%d).",
+                   num_failed, num_qpoints, i, info[i]);
+    }
+    free(info);
+    info = NULL;
+    return NULL;
+  }
+
+  free(info);
+  info = NULL;
+
+  Py_RETURN_NONE;
+}
+#endif
+
 /* Thermal properties */
 static PyObject * py_get_thermal_properties(PyObject *self, PyObject *args)
 {
@@ -1066,6 +1707,108 @@ static PyObject * py_get_thermal_properties(PyObject *self, PyObject *args)
   Py_RETURN_NONE;
 }
 
+static PyObject *
+py_get_projected_thermal_properties(PyObject *self, PyObject *args)
+{
+  PyArrayObject* py_thermal_props;
+  PyArrayObject* py_temperatures;
+  PyArrayObject* py_frequencies;
+  PyArrayObject* py_coef;
+  PyArrayObject* py_weights;
+
+  double cutoff_frequency;
+
+  double *temperatures;
+  double* freqs;
+  double* coef;
+  double *thermal_props;
+  int* w;
+  int num_qpoints;
+  int num_bands;
+  int num_coef;
+  int num_temp;
+
+  if (!PyArg_ParseTuple(args, "OOOOOd",
+                        &py_thermal_props,
+                        &py_temperatures,
+                        &py_frequencies,
+                        &py_coef,
+                        &py_weights,
+                        &cutoff_frequency)) {
+    return NULL;
+  }
+
+  thermal_props = (double*)PyArray_DATA(py_thermal_props);
+  temperatures = (double*)PyArray_DATA(py_temperatures);
+  num_temp = PyArray_DIMS(py_temperatures)[0];
+  freqs = (double*)PyArray_DATA(py_frequencies);
+  num_qpoints = PyArray_DIMS(py_frequencies)[0];
+  num_bands = PyArray_DIMS(py_frequencies)[1];
+  coef = (double*)PyArray_DATA(py_coef);
+  num_coef = PyArray_DIMS(py_coef)[1];
+  w = (int*)PyArray_DATA(py_weights);
+
+  Py_BEGIN_ALLOW_THREADS
+  get_projected_thermal_properties(thermal_props,
+                                   temperatures,
+                                   num_temp,
+                                   freqs,
+                                   coef,
+                                   w,
+                                   num_qpoints,
+                                   num_bands,
+                                   num_coef,
+                                   cutoff_frequency);
+  Py_END_ALLOW_THREADS
+
+  Py_RETURN_NONE;
+}
+
+static PyObject *
+py_get_thermal_displacement_matrices(PyObject *self, PyObject *args)
+{
+  PyArrayObject* py_disp_matrices;
+  PyArrayObject* py_Q2;
+  PyArrayObject* py_eigenvectors;
+  PyArrayObject* py_masses;
+
+  double *disp_matrices;
+  double *Q2;
+  double *eigvecs;
+  double *masses;
+  int num_modes;
+  int num_temp;
+  int num_atom;
+
+  if (!PyArg_ParseTuple(args, "OOOO",
+                        &py_disp_matrices,
+                        &py_Q2,
+                        &py_eigenvectors,
+                        &py_masses)) {
+    return NULL;
+  }
+
+  disp_matrices = (double*)PyArray_DATA(py_disp_matrices);
+  Q2 = (double*)PyArray_DATA(py_Q2);
+  num_modes = PyArray_DIMS(py_Q2)[0];
+  num_temp = PyArray_DIMS(py_Q2)[1];
+  eigvecs = (double*)PyArray_DATA(py_eigenvectors);
+  masses = (double*)PyArray_DATA(py_masses);
+  num_atom = PyArray_DIMS(py_masses)[0];
+
+  Py_BEGIN_ALLOW_THREADS
+  get_thermal_displacement_matrices(disp_matrices,
+                                    Q2,
+                                    eigvecs,
+                                    masses,
+                                    num_modes,
+                                    num_temp,
+                                    num_atom);
+  Py_END_ALLOW_THREADS
+
+  Py_RETURN_NONE;
+}
+
 static PyObject * py_distribute_fc2(PyObject *self, PyObject *args)
 {
   PyArrayObject* py_force_constants;
@@ -1506,6 +2249,132 @@ static double get_heat_capacity(const double temperature, const double f)
   return KB * val1 * val2 * val2;
 }
 
+/* thermal_props[num_temp, 3, num_coef] += */
+/*   sum_q w[q] sum_b coef[q, c, b] (F, S, Cv)(T, freqs[q, b]) */
+/* F includes zero point energy. At T = 0, only zero point energy is */
+/* counted. q-points are split into a fixed number of blocks whose sums */
+/* are added in order, so the result does not depend on number of threads. */
+static void get_projected_thermal_properties(double *thermal_props,
+                                             const double *temperatures,
+                                             const int num_temp,
+                                             const double *freqs,
+                                             const double *coef,
+                                             const int *weights,
+                                             const int num_qpoints,
+                                             const int num_bands,
+                                             const int num_coef,
+                                             const double cutoff_frequency)
+{
+  int i, j, k, l, b, m, num_blocks, block_size;
+  long size;
+  double f, t, sum;
+  double *tp, *tp_block, *mode_props;
+  const double *coef_q;
+
+  num_blocks = 64;
+  if (num_blocks > num_qpoints) {
+    num_blocks = num_qpoints;
+  }
+  if (num_blocks < 1) {
+    return;
+  }
+  block_size = (num_qpoints + num_blocks - 1) / num_blocks;
+  size = (long)num_temp * 3 * num_coef;
+
+  tp = (double*)malloc(sizeof(double) * size * num_blocks);
+  for (i = 0; i < size * num_blocks; i++) {
+    tp[i] = 0;
+  }
+
+#pragma omp parallel for \
+  private(i, j, k, l, b, f, t, sum, tp_block, mode_props, coef_q)
+  for (m = 0; m < num_blocks; m++) {
+    tp_block = tp + m * size;
+    mode_props = (double*)malloc(sizeof(double) * 3 * num_bands);
+    for (i = m * block_size;
+         i < (m + 1) * block_size && i < num_qpoints; i++) {
+      coef_q = coef + (long)i * num_coef * num_bands;
+      for (j = 0; j < num_temp; j++) {
+        t = temperatures[j];
+        for (b = 0; b < num_bands; b++) {
+          f = freqs[i * num_bands + b];
+          mode_props[b] = 0;
+          mode_props[num_bands + b] = 0;
+          mode_props[num_bands * 2 + b] = 0;
+          if (f > cutoff_frequency) {
+            if (t > 0) {
+              mode_props[b] = get_free_energy(t, f) + f / 2;
+              mode_props[num_bands + b] = get_entropy(t, f);
+              mode_props[num_bands * 2 + b] = get_heat_capacity(t, f);
+            } else {
+              mode_props[b] = f / 2;
+            }
+          }
+        }
+        for (l = 0; l < 3; l++) {
+          for (k = 0; k < num_coef; k++) {
+            sum = 0;
+            for (b = 0; b < num_bands; b++) {
+              sum += coef_q[k * num_bands + b] * mode_props[l * num_bands + b];
+            }
+            tp_block[(j * 3 + l) * num_coef + k] += sum * weights[i];
+          }
+        }
+      }
+    }
+    free(mode_props);
+    mode_props = NULL;
+  }
+
+  for (m = 0; m < num_blocks; m++) {
+    for (i = 0; i < size; i++) {
+      thermal_props[i] += tp[m * size + i];
+    }
+  }
+
+  free(tp);
+  tp = NULL;
+}
+
+/* disp_matrices[num_temp, num_atom, 3, 3] += */
+/*   sum_n Q2[n, t] Re(e_n(i, a) e_n(i, b)^*) / masses[i] */
+/* eigvecs[num_modes, num_atom * 3] are complex values stored as */
+/* (real, imag) pairs. Threads are distributed over atoms, so the */
+/* summation order over modes is kept. */
+static void get_thermal_displacement_matrices(double *disp_matrices,
+                                              const double *Q2,
+                                              const double *eigvecs,
+                                              const double *masses,
+                                              const int num_modes,
+                                              const int num_temp,
+                                              const int num_atom)
+{
+  int i, j, k, n, t;
+  double mat[9];
+  const double *v, *Q2_n;
+  double *disp_t;
+
+#pragma omp parallel for private(j, k, n, t, mat, v, Q2_n, disp_t)
+  for (i = 0; i < num_atom; i++) {
+    for (n = 0; n < num_modes; n++) {
+      v = eigvecs + ((long)n * num_atom + i) * 6;
+      for (j = 0; j < 3; j++) {
+        for (k = 0; k < 3; k++) {
+          mat[j * 3 + k] = (v[j * 2] * v[k * 2] +
+                            v[j * 2 + 1] * v[k * 2 + 1]) / masses[i];
+        }
+      }
+      Q2_n = Q2 + (long)n * num_temp;
+      for (t = 0; t < num_temp; t++) {
+        disp_t = disp_matrices + ((long)t * num_atom + i) * 9;
+        for (j = 0; j < 9; j++) {
+          disp_t[j] += Q2_n[t] * mat[j];
+        }
+      }
+    }
+  }
+}
+
 /* static double get_energy(double temperature, double f){ */
 /*   /\* temperature is defined by T (K) *\/ */
 /*   /\* 'f' must be given in eV. *\/ */
@@ -1672,6 +2541,76 @@ static void gsv_set_smallest_vectors(double (*smallest_vectors)[27][3],
   }
 }
 
+/* With initialize=1, only multiplicity[i][0] (number of shortest vectors) */
+/* and multiplicity[i][1] (address in smallest_vectors) are set. */
+/* smallest_vectors has to be allocated with the total number of them */
+/* before calling again with initialize=0. */
+static void
+gsv_set_smallest_vectors_compact(double (*smallest_vectors)[3],
+                                 int (*multiplicity)[2],
+                                 PHPYCONST double (*pos_to)[3],
+                                 const int num_pos_to,
+                                 PHPYCONST double (*pos_from)[3],
+                                 const int num_pos_from,
+                                 PHPYCONST int lattice_points[27][3],
+                                 PHPYCONST double reduced_basis[3][3],
+                                 PHPYCONST int trans_mat[3][3],
+                                 const int initialize,
+                                 const double symprec)
+{
+  int i, j, k, l, count, adrs;
+  double length_tmp, minimum, vec_xyz;
+  double length[27], vec[27][3];
+
+  adrs = 0;
+
+  for (i = 0; i < num_pos_to; i++) {
+    for (j = 0; j < num_pos_from; j++) {
+      for (k = 0; k < 27; k++) {
+        length[k] = 0;
+        for (l = 0; l < 3; l++) {
+          vec[k][l] = pos_to[i][l] - pos_from[j][l] + lattice_points[k][l];
+        }
+        for (l = 0; l < 3; l++) {
+          length_tmp = (reduced_basis[l][0] * vec[k][0] +
+                        reduced_basis[l][1] * vec[k][1] +
+                        reduced_basis[l][2] * vec[k][2]);
+          length[k] += length_tmp * length_tmp;
+        }
+        length[k] = sqrt(length[k]);
+      }
+
+      minimum = DBL_MAX;
+      for (k = 0; k < 27; k++) {
+        if (length[k] < minimum) {
+          minimum = length[k];
+        }
+      }
+
+      count = 0;
+      for (k = 0; k < 27; k++) {
+        if (length[k] - minimum < symprec) {
+          if (!initialize) {
+            for (l = 0; l < 3; l++) {
+              /* Transform to supercell coordinates */
+              vec_xyz = (trans_mat[l][0] * vec[k][0] +
+                         trans_mat[l][1] * vec[k][1] +
+                         trans_mat[l][2] * vec[k][2]);
+              smallest_vectors[adrs + count][l] = vec_xyz;
+            }
+          }
+          count++;
+        }
+      }
+      if (initialize) {
+        multiplicity[i * num_pos_from + j][0] = count;
+        multiplicity[i * num_pos_from + j][1] = adrs;
+      }
+      adrs += count;
+    }
+  }
+}
+
 static void distribute_fc2(double (*fc2)[3][3], /* shape[n_pos][n_pos] */
                            const int * atom_list,
                            const int len_atom_list,
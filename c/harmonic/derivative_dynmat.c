@@ -68,8 +68,8 @@ void get_derivative_dynmat_at_q(double *derivative_dynmat,
                                 const double *fc,
                                 const double *q,
                                 const double *lattice, /* column vector */
-                                const double *r,
-                                const int *multi,
+                                const double *r, /* svecs[num_svecs, 3] */
+                                const int *multi, /* [num_satom, num_patom, 2] */
                                 const double *mass,
                                 const int *s2p_map,
                                 const int *p2s_map,
@@ -78,7 +78,7 @@ void get_derivative_dynmat_at_q(double *derivative_dynmat,
                                 const double *dielectric,
                                 const double *q_direction)
 {
-  int i, j, k, l, m, n, adrs, adrsT, is_nac;
+  int i, j, k, l, m, n, adrs, adrsT, is_nac, m_pair, svecs_adrs;
   double coef[3], real_coef[3], imag_coef[3];
   double c, s, phase, mass_sqrt, fc_elem, factor, real_phase, imag_phase;
   double ddm_real[3][3][3], ddm_imag[3][3][3];
@@ -143,10 +143,12 @@ void get_derivative_dynmat_at_q(double *derivative_dynmat,
           real_coef[l] = 0;
           imag_coef[l] = 0;
         }
-        for (l = 0; l < multi[k * num_patom + i]; l++) {
+        m_pair = multi[(k * num_patom + i) * 2];
+        svecs_adrs = multi[(k * num_patom + i) * 2 + 1];
+        for (l = 0; l < m_pair; l++) {
           phase = 0;
           for (m = 0; m < 3; m++) {
-            phase += q[m] * r[k * num_patom * 81 + i * 81 + l * 3 + m];
+            phase += q[m] * r[(svecs_adrs + l) * 3 + m];
           }
           s = sin(phase * 2 * PI);
           c = cos(phase * 2 * PI);
@@ -158,7 +160,7 @@ void get_derivative_dynmat_at_q(double *derivative_dynmat,
             coef[m] = 0;
             for (n = 0; n < 3; n++) {
               coef[m] += 2 * PI *
-                lattice[m * 3 + n] * r[k * num_patom * 81 + i * 81 + l * 3 + n];
+                lattice[m * 3 + n] * r[(svecs_adrs + l) * 3 + n];
             }
           }
 
@@ -168,12 +170,12 @@ void get_derivative_dynmat_at_q(double *derivative_dynmat,
           }
         }
 
-        real_phase /= multi[k * num_patom + i];
-        imag_phase /= multi[k * num_patom + i];
+        real_phase /= m_pair;
+        imag_phase /= m_pair;
 
         for (l = 0; l < 3; l++) {
-          real_coef[l] /= multi[k * num_patom + i];
-          imag_coef[l] /= multi[k * num_patom + i];
+          real_coef[l] /= m_pair;
+          imag_coef[l] /= m_pair;
         }
 
         for (l = 0; l < 3; l++) {
@@ -235,6 +237,87 @@ void get_derivative_dynmat_at_q(double *derivative_dynmat,
   }
 }
 
+/* Derivatives of dynamical matrices at q-points. With directions, */
+/* derivatives along the directions are stored instead of those along */
+/* x, y, z. q_direction is used only for q-points at Gamma point. */
+void get_derivative_dynmat_at_qpoints(double *derivative_dynmats,
+                                      const int num_qpoints,
+                                      const int num_patom,
+                                      const int num_satom,
+                                      const double *fc,
+                                      const double *qpoints,
+                                      const double *lattice,
+                                      const double *r,
+                                      const int *multi,
+                                      const double *mass,
+                                      const int *s2p_map,
+                                      const int *p2s_map,
+                                      const double nac_factor,
+                                      const double *born,
+                                      const double *dielectric,
+                                      const double *q_direction,
+                                      const double *directions,
+                                      const int num_directions)
+{
+  int i, j, k, num_elem;
+  long adrs_shift, size;
+  const double *q, *q_dir;
+  double *ddm, *ddm_q;
+
+  size = (long)num_patom * num_patom * 18;
+  if (directions) {
+    num_elem = num_directions;
+  } else {
+    num_elem = 3;
+  }
+  adrs_shift = size * num_elem;
+
+#pragma omp parallel for private(j, k, q, q_dir, ddm, ddm_q)
+  for (i = 0; i < num_qpoints; i++) {
+    q = qpoints + i * 3;
+    if (q_direction &&
+        fabs(q[0]) < 1e-5 && fabs(q[1]) < 1e-5 && fabs(q[2]) < 1e-5) {
+      q_dir = q_direction;
+    } else {
+      q_dir = NULL;
+    }
+    ddm_q = derivative_dynmats + i * adrs_shift;
+    if (directions) {
+      ddm = (double*) malloc(sizeof(double) * size * 3);
+      for (j = 0; j < size * 3; j++) {
+        ddm[j] = 0;
+      }
+    } else {
+      ddm = ddm_q;
+    }
+    get_derivative_dynmat_at_q(ddm,
+                               num_patom,
+                               num_satom,
+                               fc,
+                               q,
+                               lattice,
+                               r,
+                               multi,
+                               mass,
+                               s2p_map,
+                               p2s_map,
+                               nac_factor,
+                               born,
+                               dielectric,
+                               q_dir);
+    if (directions) {
+      for (j = 0; j < num_directions; j++) {
+        for (k = 0; k < size; k++) {
+          ddm_q[j * size + k] = (directions[j * 3] * ddm[k] +
+                                 directions[j * 3 + 1] * ddm[size + k] +
+                                 directions[j * 3 + 2] * ddm[size * 2 + k]);
+        }
+      }
+      free(ddm);
+    }
+  }
+}
+
 /* D_nac = a * AB/C */
 /* dD_nac = a * D_nac * (A'/A + B'/B - C'/C) */
 static void get_derivative_nac(double *ddnac,
@@ -42,8 +42,8 @@ static void get_dynmat_ij(double *dynamical_matrix,
                           const int num_satom,
                           const double *fc,
                           const double q[3],
-                          PHPYCONST double (*svecs)[27][3],
-                          const int *multi,
+                          PHPYCONST double (*svecs)[3],
+                          PHPYCONST int (*multi)[2],
                           const double *mass,
                           const int *s2p_map,
                           const int *p2s_map,
@@ -56,13 +56,24 @@ static void get_dm(double dm_real[3][3],
                    const int num_satom,
                    const double *fc,
                    const double q[3],
-                   PHPYCONST double (*svecs)[27][3],
-                   const int *multi,
+                   PHPYCONST double (*svecs)[3],
+                   PHPYCONST int (*multi)[2],
                    const int *p2s_map,
                    PHPYCONST double (*charge_sum)[3][3],
                    const int i,
                    const int j,
                    const int k);
+static void get_dynmat_fc_pairs_i(double *dynamical_matrix,
+                                  const int num_patom,
+                                  PHPYCONST double (*fc_pairs)[3][3],
+                                  const int *pair_ptr,
+                                  const int *pair_satoms,
+                                  const double q[3],
+                                  PHPYCONST double (*svecs)[3],
+                                  PHPYCONST int (*multi)[2],
+                                  const double *mass,
+                                  const int *s2pp_map,
+                                  const int i);
 static double get_dielectric_part(const double q_cart[3],
                                   PHPYCONST double dielectric[3][3]);
 static void get_KK(double *dd_part, /* [natom, 3, natom, 3, (real,imag)] */
@@ -72,9 +83,43 @@ static void get_KK(double *dd_part, /* [natom, 3, natom, 3, (real,imag)] */
                    const double q_cart[3],
                    const double *q_direction_cart,
                    PHPYCONST double dielectric[3][3],
-                   PHPYCONST double (*pos)[3], /* [num_patom, 3] */
+                   PHPYCONST double (*atom_phases)[2], /* [num_G, natom, 2] */
                    const double lambda,
-                   const double tolerance);
+                   const double tolerance,
+                   const int with_openmp);
+static void get_KK_at_G(double KK[3][3],
+                        const double G[3],
+                        const double q_cart[3],
+                        const double *q_direction_cart,
+                        PHPYCONST double dielectric[3][3],
+                        const double L2,
+                        const double tolerance);
+static void add_KK_at_pair(double *dd_part,
+                           PHPYCONST double (*KK)[3][3], /* [num_G, 3, 3] */
+                           PHPYCONST double (*atom_phases)[2],
+                           const int num_G,
+                           const int num_patom,
+                           const int i,
+                           const int j);
+static double (*get_atom_phases(PHPYCONST double (*G_list)[3],
+                                const int num_G,
+                                PHPYCONST double (*pos)[3],
+                                const int num_patom))[2];
+static void get_dipole_dipole(double *dd, /* [natom, 3, natom, 3, (r,i)] */
+                              const double *dd_q0, /* [natom, 3, 3, (r,i)] */
+                              PHPYCONST double (*G_list)[3], /* [num_G, 3] */
+                              const int num_G,
+                              const int num_patom,
+                              const double q_cart[3],
+                              const double *q_direction_cart,
+                              PHPYCONST double (*born)[3][3],
+                              PHPYCONST double dielectric[3][3],
+                              PHPYCONST double (*atom_phases)[2],
+                              const double *mass,
+                              const double factor,
+                              const double lambda,
+                              const double tolerance,
+                              const int with_openmp);
 static void make_Hermitian(double *mat, const int num_band);
 static void multiply_borns(double *dd,
                            const double *dd_in,
@@ -86,8 +131,8 @@ int dym_get_dynamical_matrix_at_q(double *dynamical_matrix,
                                   const int num_satom,
                                   const double *fc,
                                   const double q[3],
-                                  PHPYCONST double (*svecs)[27][3],
-                                  const int *multi,
+                                  PHPYCONST double (*svecs)[3],
+                                  PHPYCONST int (*multi)[2],
                                   const double *mass,
                                   const int *s2p_map,
                                   const int *p2s_map,
@@ -138,6 +183,137 @@ int dym_get_dynamical_matrix_at_q(double *dynamical_matrix,
   return 0;
 }
 
+/* dynamical_matrices[num_qpoints, num_patom * 3, num_patom * 3, 2] */
+/* Parallelized over q-points. */
+int dym_get_dynamical_matrices_at_qpoints(double *dynamical_matrices,
+                                          PHPYCONST double (*qpoints)[3],
+                                          const int num_qpoints,
+                                          const int num_patom,
+                                          const int num_satom,
+                                          const double *fc,
+                                          PHPYCONST double (*svecs)[3],
+                                          PHPYCONST int (*multi)[2],
+                                          const double *mass,
+                                          const int *s2p_map,
+                                          const int *p2s_map)
+{
+  int i;
+  long adrs_shift;
+
+  adrs_shift = (long)num_patom * num_patom * 18;
+
+#pragma omp parallel for
+  for (i = 0; i < num_qpoints; i++) {
+    dym_get_dynamical_matrix_at_q(dynamical_matrices + i * adrs_shift,
+                                  num_patom,
+                                  num_satom,
+                                  fc,
+                                  qpoints[i],
+                                  svecs,
+                                  multi,
+                                  mass,
+                                  s2p_map,
+                                  p2s_map,
+                                  NULL,
+                                  0);
+  }
+
+  return 0;
+}
+
+/* fc_pairs[num_pairs, 3, 3]: Non-zero force constants blocks */
+/* pair_ptr[num_patom + 1]: fc_pairs[pair_ptr[i]:pair_ptr[i + 1]] have */
+/*   primitive atom i as the left index. */
+/* pair_satoms[num_pairs]: Supercell atom indices of the right index. */
+/* s2pp_map[num_satom]: Supercell atom to primitive atom index map */
+int dym_get_dynamical_matrix_at_q_fc_pairs(double *dynamical_matrix,
+                                           const int num_patom,
+                                           PHPYCONST double (*fc_pairs)[3][3],
+                                           const int *pair_ptr,
+                                           const int *pair_satoms,
+                                           const double q[3],
+                                           PHPYCONST double (*svecs)[3],
+                                           PHPYCONST int (*multi)[2],
+                                           const double *mass,
+                                           const int *s2pp_map,
+                                           const int with_openmp)
+{
+  int i;
+
+  for (i = 0; i < num_patom * num_patom * 18; i++) {
+    dynamical_matrix[i] = 0;
+  }
+
+  /* Rows of different i are written by different threads. */
+  if (with_openmp) {
+#pragma omp parallel for
+    for (i = 0; i < num_patom; i++) {
+      get_dynmat_fc_pairs_i(dynamical_matrix, num_patom, fc_pairs, pair_ptr,
+                            pair_satoms, q, svecs, multi, mass, s2pp_map, i);
+    }
+  } else {
+    for (i = 0; i < num_patom; i++) {
+      get_dynmat_fc_pairs_i(dynamical_matrix, num_patom, fc_pairs, pair_ptr,
+                            pair_satoms, q, svecs, multi, mass, s2pp_map, i);
+    }
+  }
+
+  make_Hermitian(dynamical_matrix, num_patom * 3);
+
+  return 0;
+}
+
+/* Parallelized over q-points unless num_qpoints == 1. */
+int dym_get_dynamical_matrices_at_qpoints_fc_pairs(
+  double *dynamical_matrices,
+  PHPYCONST double (*qpoints)[3],
+  const int num_qpoints,
+  const int num_patom,
+  PHPYCONST double (*fc_pairs)[3][3],
+  const int *pair_ptr,
+  const int *pair_satoms,
+  PHPYCONST double (*svecs)[3],
+  PHPYCONST int (*multi)[2],
+  const double *mass,
+  const int *s2pp_map)
+{
+  int i;
+  long adrs_shift;
+
+  if (num_qpoints == 1) {
+    return dym_get_dynamical_matrix_at_q_fc_pairs(dynamical_matrices,
+                                                  num_patom,
+                                                  fc_pairs,
+                                                  pair_ptr,
+                                                  pair_satoms,
+                                                  qpoints[0],
+                                                  svecs,
+                                                  multi,
+                                                  mass,
+                                                  s2pp_map,
+                                                  1);
+  }
+
+  adrs_shift = (long)num_patom * num_patom * 18;
+
+#pragma omp parallel for
+  for (i = 0; i < num_qpoints; i++) {
+    dym_get_dynamical_matrix_at_q_fc_pairs(dynamical_matrices + i * adrs_shift,
+                                           num_patom,
+                                           fc_pairs,
+                                           pair_ptr,
+                                           pair_satoms,
+                                           qpoints[i],
+                                           svecs,
+                                           multi,
+                                           mass,
+                                           s2pp_map,
+                                           0);
+  }
+
+  return 0;
+}
+
 void dym_get_dipole_dipole(double *dd, /* [natom, 3, natom, 3, (real,imag)] */
                            const double *dd_q0, /* [natom, 3, 3, (real,imag)] */
                            PHPYCONST double (*G_list)[3], /* [num_G, 3] */
@@ -148,54 +324,76 @@ void dym_get_dipole_dipole(double *dd, /* [natom, 3, natom, 3, (real,imag)] */
                            PHPYCONST double (*born)[3][3],
                            PHPYCONST double dielectric[3][3],
                            PHPYCONST double (*pos)[3], /* [num_patom, 3] */
+                           const double *mass, /* NULL: not mass weighted */
                            const double factor, /* 4pi/V*unit-conv */
                            const double lambda,
-                           const double tolerance)
+                           const double tolerance,
+                           const int with_openmp)
 {
-  int i, k, l, adrs, adrs_sum;
-  double *dd_tmp;
-
-  dd_tmp = NULL;
-  dd_tmp = (double*) malloc(sizeof(double) * num_patom * num_patom * 18);
+  double (*atom_phases)[2];
 
-  for (i = 0; i < num_patom * num_patom * 18; i++) {
-    dd[i] = 0;
-    dd_tmp[i] = 0;
-  }
+  atom_phases = get_atom_phases(G_list, num_G, pos, num_patom);
+  get_dipole_dipole(dd,
+                    dd_q0,
+                    G_list,
+                    num_G,
+                    num_patom,
+                    q_cart,
+                    q_direction_cart,
+                    born,
+                    dielectric,
+                    atom_phases,
+                    mass,
+                    factor,
+                    lambda,
+                    tolerance,
+                    with_openmp);
+  free(atom_phases);
+  atom_phases = NULL;
+}
 
-  get_KK(dd_tmp,
-         G_list,
-         num_G,
-         num_patom,
-         q_cart,
-         q_direction_cart,
-         dielectric,
-         pos,
-         lambda,
-         tolerance);
+/* Dipole-dipole terms at many q-points. exp(2pi i G.r) of atoms are */
+/* computed once and reused for all q-points. */
+void dym_get_dipole_dipoles_at_qpoints(
+  double *dd, /* [num_q, natom, 3, natom, 3, (real,imag)] */
+  PHPYCONST double (*q_cart)[3], /* [num_q, 3] */
+  const int num_qpoints,
+  const double *dd_q0, /* [natom, 3, 3, (real,imag)] */
+  PHPYCONST double (*G_list)[3], /* [num_G, 3] */
+  const int num_G,
+  const int num_patom,
+  PHPYCONST double (*born)[3][3],
+  PHPYCONST double dielectric[3][3],
+  PHPYCONST double (*pos)[3], /* [num_patom, 3] */
+  const double *mass, /* NULL: not mass weighted */
+  const double factor, /* 4pi/V*unit-conv */
+  const double lambda,
+  const double tolerance)
+{
+  int i;
+  long size;
+  double (*atom_phases)[2];
 
-  multiply_borns(dd, dd_tmp, num_patom, born);
+  size = (long)num_patom * num_patom * 18;
+  atom_phases = get_atom_phases(G_list, num_G, pos, num_patom);
 
-  for (i = 0; i < num_patom; i++) {
-    for (k = 0; k < 3; k++) {   /* alpha */
-      for (l = 0; l < 3; l++) { /* beta */
-        adrs = i * num_patom * 9 + k * num_patom * 3 + i * 3 + l;
-        adrs_sum = i * 9 + k * 3 + l;
-        dd[adrs * 2] -= dd_q0[adrs_sum * 2];
-        dd[adrs * 2 + 1] -= dd_q0[adrs_sum * 2 + 1];
-      }
+  if (num_qpoints > 1) {
+#pragma omp parallel for
+    for (i = 0; i < num_qpoints; i++) {
+      get_dipole_dipole(dd + i * size, dd_q0, G_list, num_G, num_patom,
+                        q_cart[i], NULL, born, dielectric, atom_phases, mass,
+                        factor, lambda, tolerance, 0);
+    }
+  } else {
+    for (i = 0; i < num_qpoints; i++) {
+      get_dipole_dipole(dd + i * size, dd_q0, G_list, num_G, num_patom,
+                        q_cart[i], NULL, born, dielectric, atom_phases, mass,
+                        factor, lambda, tolerance, 1);
     }
   }
 
-  for (i = 0; i < num_patom * num_patom * 18; i++) {
-    dd[i] *= factor;
-  }
-
-  /* This may not be necessary. */
-  /* make_Hermitian(dd, num_patom * 3); */
-
-  free(dd_tmp);
-  dd_tmp = NULL;
+  free(atom_phases);
+  atom_phases = NULL;
 }
 
 void dym_get_dipole_dipole_q0(double *dd_q0, /* [natom, 3, 3, (real,imag)] */
@@ -211,6 +409,7 @@ void dym_get_dipole_dipole_q0(double *dd_q0, /* [natom, 3, 3, (real,imag)] */
   int i, j, k, l, adrs_tmp, adrs, adrsT;
   double zero_vec[3];
   double *dd_tmp1, *dd_tmp2;
+  double (*atom_phases)[2];
 
   dd_tmp1 = NULL;
   dd_tmp1 = (double*) malloc(sizeof(double) * num_patom * num_patom * 18);
@@ -226,6 +425,7 @@ void dym_get_dipole_dipole_q0(double *dd_q0, /* [natom, 3, 3, (real,imag)] */
   zero_vec[1] = 0;
   zero_vec[2] = 0;
 
+  atom_phases = get_atom_phases(G_list, num_G, pos, num_patom);
   get_KK(dd_tmp1,
          G_list,
          num_G,
@@ -233,9 +433,12 @@ void dym_get_dipole_dipole_q0(double *dd_q0, /* [natom, 3, 3, (real,imag)] */
          zero_vec,
          NULL,
          dielectric,
-         pos,
+         atom_phases,
          lambda,
-         tolerance);
+         tolerance,
+         1);
+  free(atom_phases);
+  atom_phases = NULL;
 
   multiply_borns(dd_tmp2, dd_tmp1, num_patom, born);
 
@@ -332,21 +535,21 @@ void dym_get_charge_sum(double (*charge_sum)[3][3],
 
 /* fc[num_patom, num_satom, 3, 3] */
 /* dm[num_comm_points, num_patom * 3, num_patom *3] */
-/* comm_points[num_satom, num_patom, 27, 3] */
-/* shortest_vectors[num_satom, num_patom, 27, 3] */
-/* multiplicities[num_satom, num_patom] */
+/* comm_points[num_comm_points, 3] */
+/* svecs[num_svecs, 3] */
+/* multi[num_satom, num_patom, 2] as (multiplicity, address in svecs) */
 void dym_transform_dynmat_to_fc(double *fc,
                                 const double *dm,
                                 PHPYCONST double (*comm_points)[3],
-                                PHPYCONST double (*shortest_vectors)[27][3],
-                                const int *multiplicities,
+                                PHPYCONST double (*svecs)[3],
+                                PHPYCONST int (*multi)[2],
                                 const double *masses,
                                 const int *s2pp_map,
                                 const int *fc_index_map,
                                 const int num_patom,
                                 const int num_satom)
 {
-  int i, j, k, l, m, N, adrs, multi;
+  int i, j, k, l, m, N, adrs, m_pair, svecs_adrs;
   double coef, phase, cos_phase, sin_phase;
 
   N = num_satom / num_patom;
@@ -360,18 +563,18 @@ void dym_transform_dynmat_to_fc(double *fc,
       for (k = 0; k < N; k++) {
         cos_phase = 0;
         sin_phase = 0;
-        multi = multiplicities[j * num_patom + i];
-        for (l = 0; l < multi; l++) {
+        m_pair = multi[j * num_patom + i][0];
+        svecs_adrs = multi[j * num_patom + i][1];
+        for (l = 0; l < m_pair; l++) {
           phase = 0;
           for (m = 0; m < 3; m++) {
-            phase -= comm_points[k][m] *
-              shortest_vectors[j * num_patom + i][l][m];
+            phase -= comm_points[k][m] * svecs[svecs_adrs + l][m];
           }
           cos_phase += cos(phase * 2 * PI);
           sin_phase += sin(phase * 2 * PI);
         }
-        cos_phase /=  multi;
-        sin_phase /=  multi;
+        cos_phase /=  m_pair;
+        sin_phase /=  m_pair;
         for (l = 0; l < 3; l++) {
           for (m = 0; m < 3; m++) {
             adrs = k * num_patom * num_patom * 18 + i * num_patom * 18 +
@@ -391,8 +594,8 @@ static void get_dynmat_ij(double *dynamical_matrix,
                           const int num_satom,
                           const double *fc,
                           const double q[3],
-                          PHPYCONST double (*svecs)[27][3],
-                          const int *multi,
+                          PHPYCONST double (*svecs)[3],
+                          PHPYCONST int (*multi)[2],
                           const double *mass,
                           const int *s2p_map,
                           const int *p2s_map,
@@ -447,28 +650,34 @@ static void get_dm(double dm_real[3][3],
                    const int num_satom,
                    const double *fc,
                    const double q[3],
-                   PHPYCONST double (*svecs)[27][3],
-                   const int *multi,
+                   PHPYCONST double (*svecs)[3],
+                   PHPYCONST int (*multi)[2],
                    const int *p2s_map,
                    PHPYCONST double (*charge_sum)[3][3],
                    const int i,
                    const int j,
                    const int k)
 {
-  int l, m;
+  int l, m, i_pair, m_pair, svecs_adrs;
   double phase, cos_phase, sin_phase, fc_elem;
 
   cos_phase = 0;
   sin_phase = 0;
 
-  for (l = 0; l < multi[k * num_patom + i]; l++) {
+  i_pair = k * num_patom + i;
+  m_pair = multi[i_pair][0];
+  svecs_adrs = multi[i_pair][1];
+
+  for (l = 0; l < m_pair; l++) {
     phase = 0;
     for (m = 0; m < 3; m++) {
-      phase += q[m] * svecs[k * num_patom + i][l][m];
+      phase += q[m] * svecs[svecs_adrs + l][m];
     }
-    cos_phase += cos(phase * 2 * PI) / multi[k * num_patom + i];
-    sin_phase += sin(phase * 2 * PI) / multi[k * num_patom + i];
+    cos_phase += cos(phase * 2 * PI);
+    sin_phase += sin(phase * 2 * PI);
   }
+  cos_phase /= m_pair;
+  sin_phase /= m_pair;
 
   for (l = 0; l < 3; l++) {
     for (m = 0; m < 3; m++) {
@@ -484,6 +693,52 @@ static void get_dm(double dm_real[3][3],
   }
 }
 
+static void get_dynmat_fc_pairs_i(double *dynamical_matrix,
+                                  const int num_patom,
+                                  PHPYCONST double (*fc_pairs)[3][3],
+                                  const int *pair_ptr,
+                                  const int *pair_satoms,
+                                  const double q[3],
+                                  PHPYCONST double (*svecs)[3],
+                                  PHPYCONST int (*multi)[2],
+                                  const double *mass,
+                                  const int *s2pp_map,
+                                  const int i)
+{
+  int j, k, l, m, n, i_pair, m_pair, svecs_adrs, adrs;
+  double phase, cos_phase, sin_phase, mass_sqrt;
+
+  for (n = pair_ptr[i]; n < pair_ptr[i + 1]; n++) {
+    k = pair_satoms[n];
+    j = s2pp_map[k];
+    i_pair = k * num_patom + i;
+    m_pair = multi[i_pair][0];
+    svecs_adrs = multi[i_pair][1];
+
+    cos_phase = 0;
+    sin_phase = 0;
+    for (l = 0; l < m_pair; l++) {
+      phase = 0;
+      for (m = 0; m < 3; m++) {
+        phase += q[m] * svecs[svecs_adrs + l][m];
+      }
+      cos_phase += cos(phase * 2 * PI);
+      sin_phase += sin(phase * 2 * PI);
+    }
+    mass_sqrt = sqrt(mass[i] * mass[j]);
+    cos_phase /= m_pair * mass_sqrt;
+    sin_phase /= m_pair * mass_sqrt;
+
+    for (l = 0; l < 3; l++) {
+      for (m = 0; m < 3; m++) {
+        adrs = (i * 3 + l) * num_patom * 3 + j * 3 + m;
+        dynamical_matrix[adrs * 2] += fc_pairs[n][l][m] * cos_phase;
+        dynamical_matrix[adrs * 2 + 1] += fc_pairs[n][l][m] * sin_phase;
+      }
+    }
+  }
+}
+
 static double get_dielectric_part(const double q_cart[3],
                                   PHPYCONST double dielectric[3][3])
 {
@@ -506,6 +761,83 @@ static double get_dielectric_part(const double q_cart[3],
   return sum;
 }
 
+static void get_dipole_dipole(double *dd, /* [natom, 3, natom, 3, (r,i)] */
+                              const double *dd_q0, /* [natom, 3, 3, (r,i)] */
+                              PHPYCONST double (*G_list)[3], /* [num_G, 3] */
+                              const int num_G,
+                              const int num_patom,
+                              const double q_cart[3],
+                              const double *q_direction_cart,
+                              PHPYCONST double (*born)[3][3],
+                              PHPYCONST double dielectric[3][3],
+                              PHPYCONST double (*atom_phases)[2],
+                              const double *mass,
+                              const double factor,
+                              const double lambda,
+                              const double tolerance,
+                              const int with_openmp)
+{
+  int i, j, k, l, adrs, adrs_sum;
+  double coef;
+  double *dd_tmp;
+
+  dd_tmp = NULL;
+  dd_tmp = (double*) malloc(sizeof(double) * num_patom * num_patom * 18);
+
+  for (i = 0; i < num_patom * num_patom * 18; i++) {
+    dd[i] = 0;
+    dd_tmp[i] = 0;
+  }
+
+  get_KK(dd_tmp,
+         G_list,
+         num_G,
+         num_patom,
+         q_cart,
+         q_direction_cart,
+         dielectric,
+         atom_phases,
+         lambda,
+         tolerance,
+         with_openmp);
+
+  multiply_borns(dd, dd_tmp, num_patom, born);
+
+  for (i = 0; i < num_patom; i++) {
+    for (k = 0; k < 3; k++) {   /* alpha */
+      for (l = 0; l < 3; l++) { /* beta */
+        adrs = i * num_patom * 9 + k * num_patom * 3 + i * 3 + l;
+        adrs_sum = i * 9 + k * 3 + l;
+        dd[adrs * 2] -= dd_q0[adrs_sum * 2];
+        dd[adrs * 2 + 1] -= dd_q0[adrs_sum * 2 + 1];
+      }
+    }
+  }
+
+  for (i = 0; i < num_patom; i++) {
+    for (j = 0; j < num_patom; j++) {
+      if (mass) {
+        coef = factor / sqrt(mass[i] * mass[j]);
+      } else {
+        coef = factor;
+      }
+      for (k = 0; k < 3; k++) {
+        for (l = 0; l < 3; l++) {
+          adrs = i * num_patom * 9 + k * num_patom * 3 + j * 3 + l;
+          dd[adrs * 2] *= coef;
+          dd[adrs * 2 + 1] *= coef;
+        }
+      }
+    }
+  }
+
+  /* This may not be necessary. */
+  /* make_Hermitian(dd, num_patom * 3); */
+
+  free(dd_tmp);
+  dd_tmp = NULL;
+}
+
 static void get_KK(double *dd_part, /* [natom, 3, natom, 3, (real,imag)] */
                    PHPYCONST double (*G_list)[3], /* [num_G, 3] */
                    const int num_G,
@@ -513,73 +845,149 @@ static void get_KK(double *dd_part, /* [natom, 3, natom, 3, (real,imag)] */
                    const double q_cart[3],
                    const double *q_direction_cart,
                    PHPYCONST double dielectric[3][3],
-                   PHPYCONST double (*pos)[3], /* [num_patom, 3] */
+                   PHPYCONST double (*atom_phases)[2], /* [num_G, natom, 2] */
                    const double lambda,
-                   const double tolerance)
+                   const double tolerance,
+                   const int with_openmp)
 {
-  int i, j, k, l, g, adrs;
-  double q_K[3];
-  double norm, cos_phase, sin_phase, phase, dielectric_part, exp_damp, L2;
-  double KK[3][3];
+  int g, ij;
+  double L2;
+  double (*KK)[3][3];
 
   L2 = 4 * lambda * lambda;
+  KK = (double(*)[3][3]) malloc(sizeof(double[3][3]) * num_G);
 
   /* sum over K = G + q and over G (i.e. q=0) */
   /* q_direction has values for summation over K at Gamma point. */
   /* q_direction is NULL for summation over G */
-  for (g = 0; g < num_G; g++) {
-    norm = 0;
-    for (i = 0; i < 3; i++) {
-      q_K[i] = G_list[g][i] + q_cart[i];
-      norm += q_K[i] * q_K[i];
+  /* Sums over G are taken in the same order with and without OpenMP */
+  /* to obtain identical results by single and batched calculations. */
+  if (with_openmp) {
+#pragma omp parallel for
+    for (g = 0; g < num_G; g++) {
+      get_KK_at_G(KK[g], G_list[g], q_cart, q_direction_cart, dielectric,
+                  L2, tolerance);
+    }
+#pragma omp parallel for
+    for (ij = 0; ij < num_patom * num_patom; ij++) {
+      add_KK_at_pair(dd_part, KK, atom_phases, num_G, num_patom,
+                     ij / num_patom, ij % num_patom);
     }
+  } else {
+    for (g = 0; g < num_G; g++) {
+      get_KK_at_G(KK[g], G_list[g], q_cart, q_direction_cart, dielectric,
+                  L2, tolerance);
+    }
+    for (ij = 0; ij < num_patom * num_patom; ij++) {
+      add_KK_at_pair(dd_part, KK, atom_phases, num_G, num_patom,
+                     ij / num_patom, ij % num_patom);
+    }
+  }
 
-    if (sqrt(norm) < tolerance) {
-      if (!q_direction_cart) {
-        continue;
-      } else {
-        dielectric_part = get_dielectric_part(q_direction_cart, dielectric);
-        for (i = 0; i < 3; i++) {
-          for (j = 0; j < 3; j++) {
-            KK[i][j] =
-              q_direction_cart[i] * q_direction_cart[j] / dielectric_part;
-          }
+  free(KK);
+  KK = NULL;
+}
+
+static void get_KK_at_G(double KK[3][3],
+                        const double G[3],
+                        const double q_cart[3],
+                        const double *q_direction_cart,
+                        PHPYCONST double dielectric[3][3],
+                        const double L2,
+                        const double tolerance)
+{
+  int i, j;
+  double q_K[3];
+  double norm, dielectric_part, exp_damp;
+
+  norm = 0;
+  for (i = 0; i < 3; i++) {
+    q_K[i] = G[i] + q_cart[i];
+    norm += q_K[i] * q_K[i];
+  }
+
+  if (sqrt(norm) < tolerance) {
+    if (!q_direction_cart) {
+      for (i = 0; i < 3; i++) {
+        for (j = 0; j < 3; j++) {
+          KK[i][j] = 0;
         }
       }
     } else {
-      dielectric_part = get_dielectric_part(q_K, dielectric);
-      exp_damp = exp(-dielectric_part / L2);
+      dielectric_part = get_dielectric_part(q_direction_cart, dielectric);
       for (i = 0; i < 3; i++) {
         for (j = 0; j < 3; j++) {
-          KK[i][j] = q_K[i] * q_K[j] / dielectric_part * exp_damp;
+          KK[i][j] =
+            q_direction_cart[i] * q_direction_cart[j] / dielectric_part;
         }
       }
     }
+  } else {
+    dielectric_part = get_dielectric_part(q_K, dielectric);
+    exp_damp = exp(-dielectric_part / L2);
+    for (i = 0; i < 3; i++) {
+      for (j = 0; j < 3; j++) {
+        KK[i][j] = q_K[i] * q_K[j] / dielectric_part * exp_damp;
+      }
+    }
+  }
+}
 
-    for (i = 0; i < num_patom; i++) {
-      for (j = 0; j < num_patom; j++) {
-        phase = 0;
-        for (k = 0; k < 3; k++) {
-          /* For D-type dynamical matrix */
-          /* phase += (pos[i][k] - pos[j][k]) * q_K[k]; */
-          /* For C-type dynamical matrix */
-          phase += (pos[i][k] - pos[j][k]) * G_list[g][k];
-        }
-        phase *= 2 * PI;
-        cos_phase = cos(phase);
-        sin_phase = sin(phase);
-        for (k = 0; k < 3; k++) {
-          for (l = 0; l < 3; l++) {
-            adrs = i * num_patom * 9 + k * num_patom * 3 + j * 3 + l;
-            dd_part[adrs * 2] += KK[k][l] * cos_phase;
-            dd_part[adrs * 2 + 1] += KK[k][l] * sin_phase;
-          }
-        }
+/* exp(2pi i G.(r_i - r_j)) = exp(2pi i G.r_i) * conj(exp(2pi i G.r_j)) */
+/* For C-type dynamical matrix, q is not included in the phase. */
+static void add_KK_at_pair(double *dd_part,
+                           PHPYCONST double (*KK)[3][3], /* [num_G, 3, 3] */
+                           PHPYCONST double (*atom_phases)[2],
+                           const int num_G,
+                           const int num_patom,
+                           const int i,
+                           const int j)
+{
+  int g, k, l, adrs;
+  double cos_phase, sin_phase;
+  const double *phase_i, *phase_j;
+
+  for (g = 0; g < num_G; g++) {
+    phase_i = atom_phases[g * num_patom + i];
+    phase_j = atom_phases[g * num_patom + j];
+    cos_phase = phase_i[0] * phase_j[0] + phase_i[1] * phase_j[1];
+    sin_phase = phase_i[1] * phase_j[0] - phase_i[0] * phase_j[1];
+    for (k = 0; k < 3; k++) {
+      for (l = 0; l < 3; l++) {
+        adrs = i * num_patom * 9 + k * num_patom * 3 + j * 3 + l;
+        dd_part[adrs * 2] += KK[g][k][l] * cos_phase;
+        dd_part[adrs * 2 + 1] += KK[g][k][l] * sin_phase;
       }
     }
   }
 }
 
+/* Returns exp(2pi i G.r) [num_G, num_patom, (real, imag)] */
+static double (*get_atom_phases(PHPYCONST double (*G_list)[3],
+                                const int num_G,
+                                PHPYCONST double (*pos)[3],
+                                const int num_patom))[2]
+{
+  int g, i;
+  double phase;
+  double (*atom_phases)[2];
+
+  atom_phases = (double(*)[2]) malloc(sizeof(double[2]) * num_G * num_patom);
+
+#pragma omp parallel for private(i, phase)
+  for (g = 0; g < num_G; g++) {
+    for (i = 0; i < num_patom; i++) {
+      phase = 2 * PI * (pos[i][0] * G_list[g][0] +
+                        pos[i][1] * G_list[g][1] +
+                        pos[i][2] * G_list[g][2]);
+      atom_phases[g * num_patom + i][0] = cos(phase);
+      atom_phases[g * num_patom + i][1] = sin(phase);
+    }
+  }
+
+  return atom_phases;
+}
+
 static void make_Hermitian(double *mat, const int num_band)
 {
   int i, j, adrs, adrsT;
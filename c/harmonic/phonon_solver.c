@@ -0,0 +1,437 @@
+/* Copyright (C) 2019 Atsushi Togo */
+/* All rights reserved. */
+
+/* This file is part of phonopy. */
+
+/* Redistribution and use in source and binary forms, with or without */
+/* modification, are permitted provided that the following conditions */
+/* are met: */
+
+/* * Redistributions of source code must retain the above copyright */
+/*   notice, this list of conditions and the following disclaimer. */
+
+/* * Redistributions in binary form must reproduce the above copyright */
+/*   notice, this list of conditions and the following disclaimer in */
+/*   the documentation and/or other materials provided with the */
+/*   distribution. */
+
+/* * Neither the name of the phonopy project nor the names of its */
+/*   contributors may be used to endorse or promote products derived */
+/*   from this software without specific prior written permission. */
+
+/* THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS */
+/* "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT */
+/* LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS */
+/* FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE */
+/* COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, */
+/* INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, */
+/* BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; */
+/* LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER */
+/* CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT */
+/* LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN */
+/* ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE */
+/* POSSIBILITY OF SUCH DAMAGE. */
+
+#include <math.h>
+#include <stdlib.h>
+#include <dynmat.h>
+#include <phonon_solver.h>
+
+/* LAPACK routine with Fortran calling convention */
+extern void zheevd_(const char *jobz,
+                    const char *uplo,
+                    const int *n,
+                    double *a,
+                    const int *lda,
+                    double *w,
+                    double *work,
+                    const int *lwork,
+                    double *rwork,
+                    const int *lrwork,
+                    int *iwork,
+                    const int *liwork,
+                    int *info);
+
+static int get_phonons_at_q(double *freqs,
+                            double *dm,
+                            const int is_eigenvectors,
+                            const double q[3],
+                            const int num_patom,
+                            const int num_satom,
+                            const double *fc,
+                            const double *gonze_fc,
+                            PHPYCONST double (*svecs)[3],
+                            PHPYCONST int (*multi)[2],
+                            const double *mass,
+                            const int *s2p_map,
+                            const int *p2s_map,
+                            PHPYCONST double reciprocal_lattice[3][3],
+                            PHPYCONST double (*born)[3][3],
+                            PHPYCONST double dielectric[3][3],
+                            const double nac_factor,
+                            const double *q_direction,
+                            const double *dd_q0,
+                            PHPYCONST double (*G_list)[3],
+                            const int num_G,
+                            PHPYCONST double (*positions)[3],
+                            const double lambda,
+                            const double frequency_factor,
+                            const double tolerance,
+                            const char uplo);
+static int add_dipole_dipole(double *dm,
+                             const double q_cart[3],
+                             const double *q_dir_cart,
+                             const int num_patom,
+                             const double *mass,
+                             PHPYCONST double (*born)[3][3],
+                             PHPYCONST double dielectric[3][3],
+                             const double nac_factor,
+                             const double *dd_q0,
+                             PHPYCONST double (*G_list)[3],
+                             const int num_G,
+                             PHPYCONST double (*positions)[3],
+                             const double lambda,
+                             const double tolerance);
+static double get_dielectric_part(const double q_cart[3],
+                                  PHPYCONST double dielectric[3][3]);
+static double get_norm(const double v[3]);
+static void transpose_conjugate(double *a, const int n);
+
+/* Diagonalize Hermitian matrix in C order by zheevd. */
+/* Eigenvectors are stored as column vectors (same as numpy.linalg.eigh) */
+/* in 'a' when jobz == 'V'. */
+/* Returns info of zheevd, or PHS_ALLOC_ERROR when memory allocation */
+/* of the work arrays fails. */
+int phs_zheevd(double *a, /* [n, n, (real, imag)], overwritten */
+               double *w,
+               const int n,
+               const char jobz,
+               const char uplo)
+{
+  int lwork, lrwork, liwork, info;
+  double *work, *rwork;
+  int *iwork;
+
+  if (jobz == 'V') {
+    lwork = 2 * n + n * n;
+    lrwork = 1 + 5 * n + 2 * n * n;
+    liwork = 3 + 5 * n;
+  } else {
+    lwork = n + 1;
+    lrwork = n;
+    liwork = 1;
+  }
+
+  work = (double*)malloc(sizeof(double) * lwork * 2);
+  rwork = (double*)malloc(sizeof(double) * lrwork);
+  iwork = (int*)malloc(sizeof(int) * liwork);
+
+  if (work == NULL || rwork == NULL || iwork == NULL) {
+    info = PHS_ALLOC_ERROR;
+    goto end;
+  }
+
+  /* LAPACK sees the transpose of C-ordered 'a', i.e., its complex */
+  /* conjugate since 'a' is Hermitian. */
+  zheevd_(&jobz, &uplo, &n, a, &n, w,
+          work, &lwork, rwork, &lrwork, iwork, &liwork, &info);
+
+  if (jobz == 'V' && info == 0) {
+    transpose_conjugate(a, n);
+  }
+
+end:
+  free(work);
+  work = NULL;
+  free(rwork);
+  rwork = NULL;
+  free(iwork);
+  iwork = NULL;
+
+  return info;
+}
+
+/* Dynamical matrices are built and diagonalized q-point by q-point */
+/* in one OpenMP parallel region. */
+/* born == NULL: without NAC */
+/* gonze_fc == NULL: NAC by Wang et al. if born != NULL */
+/* gonze_fc != NULL: NAC by Gonze et al. */
+/* eigenvectors == NULL: only frequencies are computed */
+/* info[i] is set to the status of phs_zheevd at i-th q-point. */
+/* Returns the number of q-points where phonons were not obtained. */
+int phs_get_phonons_at_qpoints(double *frequencies, /* [num_q, num_band] */
+                               double *eigenvectors, /* [num_q, num_band,
+                                                        num_band, 2] */
+                               int *info, /* [num_q] */
+                               PHPYCONST double (*qpoints)[3],
+                               const int num_qpoints,
+                               const int num_patom,
+                               const int num_satom,
+                               const double *fc,
+                               const double *gonze_fc,
+                               PHPYCONST double (*svecs)[3],
+                               PHPYCONST int (*multi)[2],
+                               const double *mass,
+                               const int *s2p_map,
+                               const int *p2s_map,
+                               PHPYCONST double reciprocal_lattice[3][3],
+                               PHPYCONST double (*born)[3][3],
+                               PHPYCONST double dielectric[3][3],
+                               const double nac_factor,
+                               const double *q_direction,
+                               const double *dd_q0,
+                               PHPYCONST double (*G_list)[3],
+                               const int num_G,
+                               PHPYCONST double (*positions)[3],
+                               const double lambda,
+                               const double frequency_factor,
+                               const double tolerance,
+                               const char uplo)
+{
+  int i, num_band, num_failed;
+  long dm_size;
+  double *dm;
+
+  num_band = num_patom * 3;
+  dm_size = (long)num_band * num_band * 2;
+  num_failed = 0;
+
+#pragma omp parallel for private(dm) reduction(+:num_failed)
+  for (i = 0; i < num_qpoints; i++) {
+    if (eigenvectors) {
+      dm = eigenvectors + i * dm_size;
+    } else {
+      dm = (double*)malloc(sizeof(double) * dm_size);
+      if (dm == NULL) {
+        info[i] = PHS_ALLOC_ERROR;
+        num_failed++;
+        continue;
+      }
+    }
+
+    info[i] = get_phonons_at_q(frequencies + i * num_band,
+                               dm,
+                               eigenvectors != NULL,
+                               qpoints[i],
+                               num_patom,
+                               num_satom,
+                               fc,
+                               gonze_fc,
+                               svecs,
+                               multi,
+                               mass,
+                               s2p_map,
+                               p2s_map,
+                               reciprocal_lattice,
+                               born,
+                               dielectric,
+                               nac_factor,
+                               q_direction,
+                               dd_q0,
+                               G_list,
+                               num_G,
+                               positions,
+                               lambda,
+                               frequency_factor,
+                               tolerance,
+                               uplo);
+    if (info[i] != 0) {
+      num_failed++;
+    }
+
+    if (!eigenvectors) {
+      free(dm);
+      dm = NULL;
+    }
+  }
+
+  return num_failed;
+}
+
+static int get_phonons_at_q(double *freqs,
+                            double *dm,
+                            const int is_eigenvectors,
+                            const double q[3],
+                            const int num_patom,
+                            const int num_satom,
+                            const double *fc,
+                            const double *gonze_fc,
+                            PHPYCONST double (*svecs)[3],
+                            PHPYCONST int (*multi)[2],
+                            const double *mass,
+                            const int *s2p_map,
+                            const int *p2s_map,
+                            PHPYCONST double reciprocal_lattice[3][3],
+                            PHPYCONST double (*born)[3][3],
+                            PHPYCONST double dielectric[3][3],
+                            const double nac_factor,
+                            const double *q_direction,
+                            const double *dd_q0,
+                            PHPYCONST double (*G_list)[3],
+                            const int num_G,
+                            PHPYCONST double (*positions)[3],
+                            const double lambda,
+                            const double frequency_factor,
+                            const double tolerance,
+                            const char uplo)
+{
+  int i, j, num_band, is_nac, info;
+  double q_cart[3], q_dir_cart[3];
+  double *q_nac, *q_dir;
+  double (*charge_sum)[3][3];
+
+  num_band = num_patom * 3;
+
+  for (i = 0; i < 3; i++) {
+    q_cart[i] = 0;
+    q_dir_cart[i] = 0;
+    for (j = 0; j < 3; j++) {
+      q_cart[i] += reciprocal_lattice[i][j] * q[j];
+      if (q_direction) {
+        q_dir_cart[i] += reciprocal_lattice[i][j] * q_direction[j];
+      }
+    }
+  }
+
+  /* q_direction is used only at Gamma point. */
+  is_nac = 0;
+  q_nac = NULL;
+  q_dir = NULL;
+  if (born) {
+    if (get_norm(q_cart) < tolerance) {
+      if (q_direction && get_norm(q_dir_cart) > tolerance) {
+        is_nac = 1;
+        q_nac = q_dir_cart;
+        q_dir = q_dir_cart;
+      }
+    } else {
+      is_nac = 1;
+      q_nac = q_cart;
+    }
+  }
+
+  if (is_nac && !gonze_fc) { /* Wang et al. */
+    charge_sum = (double(*)[3][3])
+      malloc(sizeof(double[3][3]) * num_patom * num_patom);
+    if (charge_sum == NULL) {
+      return PHS_ALLOC_ERROR;
+    }
+    dym_get_charge_sum(charge_sum,
+                       num_patom,
+                       nac_factor / get_dielectric_part(q_nac, dielectric)
+                       * num_patom / num_satom,
+                       q_nac,
+                       born);
+    dym_get_dynamical_matrix_at_q(dm, num_patom, num_satom, fc, q,
+                                  svecs, multi, mass, s2p_map, p2s_map,
+                                  charge_sum, 0);
+    free(charge_sum);
+    charge_sum = NULL;
+  } else if (is_nac) { /* Gonze et al. */
+    dym_get_dynamical_matrix_at_q(dm, num_patom, num_satom, gonze_fc, q,
+                                  svecs, multi, mass, s2p_map, p2s_map,
+                                  NULL, 0);
+    if (add_dipole_dipole(dm, q_cart, q_dir, num_patom, mass, born,
+                          dielectric, nac_factor, dd_q0, G_list, num_G,
+                          positions, lambda, tolerance)) {
+      return PHS_ALLOC_ERROR;
+    }
+  } else {
+    dym_get_dynamical_matrix_at_q(dm, num_patom, num_satom, fc, q,
+                                  svecs, multi, mass, s2p_map, p2s_map,
+                                  NULL, 0);
+  }
+
+  info = phs_zheevd(dm, freqs, num_band, is_eigenvectors ? 'V' : 'N', uplo);
+  if (info != 0) {
+    return info;
+  }
+
+  for (i = 0; i < num_band; i++) {
+    if (freqs[i] < 0) {
+      freqs[i] = -sqrt(-freqs[i]) * frequency_factor;
+    } else {
+      freqs[i] = sqrt(freqs[i]) * frequency_factor;
+    }
+  }
+
+  return 0;
+}
+
+static int add_dipole_dipole(double *dm,
+                             const double q_cart[3],
+                             const double *q_dir_cart,
+                             const int num_patom,
+                             const double *mass,
+                             PHPYCONST double (*born)[3][3],
+                             PHPYCONST double dielectric[3][3],
+                             const double nac_factor,
+                             const double *dd_q0,
+                             PHPYCONST double (*G_list)[3],
+                             const int num_G,
+                             PHPYCONST double (*positions)[3],
+                             const double lambda,
+                             const double tolerance)
+{
+  int i;
+  double *dd;
+
+  dd = (double*)malloc(sizeof(double) * num_patom * num_patom * 18);
+  if (dd == NULL) {
+    return PHS_ALLOC_ERROR;
+  }
+  dym_get_dipole_dipole(dd, dd_q0, G_list, num_G, num_patom, q_cart,
+                        q_dir_cart, born, dielectric, positions, mass,
+                        nac_factor, lambda, tolerance, 0);
+
+  for (i = 0; i < num_patom * num_patom * 18; i++) {
+    dm[i] += dd[i];
+  }
+
+  free(dd);
+  dd = NULL;
+
+  return 0;
+}
+
+static double get_dielectric_part(const double q_cart[3],
+                                  PHPYCONST double dielectric[3][3])
+{
+  int i, j;
+  double sum;
+
+  sum = 0;
+  for (i = 0; i < 3; i++) {
+    for (j = 0; j < 3; j++) {
+      sum += q_cart[i] * dielectric[i][j] * q_cart[j];
+    }
+  }
+
+  return sum;
+}
+
+static double get_norm(const double v[3])
+{
+  return sqrt(v[0] * v[0] + v[1] * v[1] + v[2] * v[2]);
+}
+
+static void transpose_conjugate(double *a, const int n)
+{
+  int i, j, adrs, adrsT;
+  double re, im;
+
+  for (i = 0; i < n; i++) {
+    adrs = (i * n + i) * 2;
+    a[adrs + 1] = -a[adrs + 1];
+    for (j = i + 1; j < n; j++) {
+      adrs = (i * n + j) * 2;
+      adrsT = (j * n + i) * 2;
+      re = a[adrs];
+      im = a[adrs + 1];
+      a[adrs] = a[adrsT];
+      a[adrs + 1] = -a[adrsT + 1];
+      a[adrsT] = re;
+      a[adrsT + 1] = -im;
+    }
+  }
+}
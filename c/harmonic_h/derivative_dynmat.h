@@ -41,8 +41,8 @@ void get_derivative_dynmat_at_q(double *derivative_dynmat,
                                 const double *fc,
                                 const double *q,
                                 const double *lattice, /* column vector */
-                                const double *r,
-                                const int *multi,
+                                const double *r, /* svecs[num_svecs, 3] */
+                                const int *multi, /* [num_satom, num_patom, 2] */
                                 const double *mass,
                                 const int *s2p_map,
                                 const int *p2s_map,
@@ -50,5 +50,23 @@ void get_derivative_dynmat_at_q(double *derivative_dynmat,
                                 const double *born,
                                 const double *dielectric,
                                 const double *q_direction);
+void get_derivative_dynmat_at_qpoints(double *derivative_dynmats,
+                                      const int num_qpoints,
+                                      const int num_patom,
+                                      const int num_satom,
+                                      const double *fc,
+                                      const double *qpoints,
+                                      const double *lattice,
+                                      const double *r,
+                                      const int *multi,
+                                      const double *mass,
+                                      const int *s2p_map,
+                                      const int *p2s_map,
+                                      const double nac_factor,
+                                      const double *born,
+                                      const double *dielectric,
+                                      const double *q_direction,
+                                      const double *directions,
+                                      const int num_directions);
 
 #endif
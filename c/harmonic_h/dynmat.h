@@ -42,13 +42,47 @@ int dym_get_dynamical_matrix_at_q(double *dynamical_matrix,
                                   const int num_satom,
                                   const double *fc,
                                   const double q[3],
-                                  PHPYCONST double (*svecs)[27][3],
-                                  const int *multi,
+                                  PHPYCONST double (*svecs)[3],
+                                  PHPYCONST int (*multi)[2],
                                   const double *mass,
                                   const int *s2p_map,
                                   const int *p2s_map,
                                   PHPYCONST double (*charge_sum)[3][3],
                                   const int with_openmp);
+int dym_get_dynamical_matrices_at_qpoints(double *dynamical_matrices,
+                                          PHPYCONST double (*qpoints)[3],
+                                          const int num_qpoints,
+                                          const int num_patom,
+                                          const int num_satom,
+                                          const double *fc,
+                                          PHPYCONST double (*svecs)[3],
+                                          PHPYCONST int (*multi)[2],
+                                          const double *mass,
+                                          const int *s2p_map,
+                                          const int *p2s_map);
+int dym_get_dynamical_matrix_at_q_fc_pairs(double *dynamical_matrix,
+                                           const int num_patom,
+                                           PHPYCONST double (*fc_pairs)[3][3],
+                                           const int *pair_ptr,
+                                           const int *pair_satoms,
+                                           const double q[3],
+                                           PHPYCONST double (*svecs)[3],
+                                           PHPYCONST int (*multi)[2],
+                                           const double *mass,
+                                           const int *s2pp_map,
+                                           const int with_openmp);
+int dym_get_dynamical_matrices_at_qpoints_fc_pairs(
+  double *dynamical_matrices,
+  PHPYCONST double (*qpoints)[3],
+  const int num_qpoints,
+  const int num_patom,
+  PHPYCONST double (*fc_pairs)[3][3],
+  const int *pair_ptr,
+  const int *pair_satoms,
+  PHPYCONST double (*svecs)[3],
+  PHPYCONST int (*multi)[2],
+  const double *mass,
+  const int *s2pp_map);
 void dym_get_dipole_dipole(double *dd, /* [natom, 3, natom, 3, (real,imag)] */
                            const double *dd_q0, /* [natom, 3, 3, (real,imag)] */
                            PHPYCONST double (*G_list)[3], /* [num_G, 3] */
@@ -59,9 +93,26 @@ void dym_get_dipole_dipole(double *dd, /* [natom, 3, natom, 3, (real,imag)] */
                            PHPYCONST double (*born)[3][3],
                            PHPYCONST double dielectric[3][3],
                            PHPYCONST double (*pos)[3], /* [num_patom, 3] */
+                           const double *mass, /* NULL: not mass weighted */
                            const double factor, /* 4pi/V*unit-conv */
                            const double lambda,
-                           const double tolerance);
+                           const double tolerance,
+                           const int with_openmp);
+void dym_get_dipole_dipoles_at_qpoints(
+  double *dd, /* [num_q, natom, 3, natom, 3, (real,imag)] */
+  PHPYCONST double (*q_cart)[3], /* [num_q, 3] */
+  const int num_qpoints,
+  const double *dd_q0, /* [natom, 3, 3, (real,imag)] */
+  PHPYCONST double (*G_list)[3], /* [num_G, 3] */
+  const int num_G,
+  const int num_patom,
+  PHPYCONST double (*born)[3][3],
+  PHPYCONST double dielectric[3][3],
+  PHPYCONST double (*pos)[3], /* [num_patom, 3] */
+  const double *mass, /* NULL: not mass weighted */
+  const double factor, /* 4pi/V*unit-conv */
+  const double lambda,
+  const double tolerance);
 void dym_get_dipole_dipole_q0(double *dd_q0, /* [natom, 3, 3, (real,imag)] */
                               PHPYCONST double (*G_list)[3], /* [num_G, 3] */
                               const int num_G,
@@ -78,14 +129,14 @@ void dym_get_charge_sum(double (*charge_sum)[3][3],
                         PHPYCONST double (*born)[3][3]);
 /* fc[num_patom, num_satom, 3, 3] */
 /* dm[num_comm_points, num_patom * 3, num_patom *3] */
-/* comm_points[num_satom, num_patom, 27, 3] */
-/* shortest_vectors[num_satom, num_patom, 27, 3] */
-/* multiplicities[num_satom, num_patom] */
+/* comm_points[num_comm_points, 3] */
+/* svecs[num_svecs, 3] */
+/* multi[num_satom, num_patom, 2] as (multiplicity, address in svecs) */
 void dym_transform_dynmat_to_fc(double *fc,
                                 const double *dm,
                                 PHPYCONST double (*comm_points)[3],
-                                PHPYCONST double (*shortest_vectors)[27][3],
-                                const int *multiplicities,
+                                PHPYCONST double (*svecs)[3],
+                                PHPYCONST int (*multi)[2],
                                 const double *masses,
                                 const int *s2pp_map,
                                 const int *fc_index_map,
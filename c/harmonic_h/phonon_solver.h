@@ -0,0 +1,77 @@
+/* Copyright (C) 2019 Atsushi Togo */
+/* All rights reserved. */
+
+/* This file is part of phonopy. */
+
+/* Redistribution and use in source and binary forms, with or without */
+/* modification, are permitted provided that the following conditions */
+/* are met: */
+
+/* * Redistributions of source code must retain the above copyright */
+/*   notice, this list of conditions and the following disclaimer. */
+
+/* * Redistributions in binary form must reproduce the above copyright */
+/*   notice, this list of conditions and the following disclaimer in */
+/*   the documentation and/or other materials provided with the */
+/*   distribution. */
+
+/* * Neither the name of the phonopy project nor the names of its */
+/*   contributors may be used to endorse or promote products derived */
+/*   from this software without specific prior written permission. */
+
+/* THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS */
+/* "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT */
+/* LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS */
+/* FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE */
+/* COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, */
+/* INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, */
+/* BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; */
+/* LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER */
+/* CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT */
+/* LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN */
+/* ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE */
+/* POSSIBILITY OF SUCH DAMAGE. */
+
+#ifndef __phonon_solver_H__
+#define __phonon_solver_H__
+
+#include <dynmat.h>
+
+/* Returned instead of LAPACK info when memory allocation fails. */
+#define PHS_ALLOC_ERROR (-1000)
+
+int phs_zheevd(double *a, /* [n, n, (real, imag)], overwritten */
+               double *w,
+               const int n,
+               const char jobz,
+               const char uplo);
+int phs_get_phonons_at_qpoints(double *frequencies, /* [num_q, num_band] */
+                               double *eigenvectors, /* [num_q, num_band,
+                                                        num_band, 2] */
+                               int *info, /* [num_q] */
+                               PHPYCONST double (*qpoints)[3],
+                               const int num_qpoints,
+                               const int num_patom,
+                               const int num_satom,
+                               const double *fc,
+                               const double *gonze_fc,
+                               PHPYCONST double (*svecs)[3],
+                               PHPYCONST int (*multi)[2],
+                               const double *mass,
+                               const int *s2p_map,
+                               const int *p2s_map,
+                               PHPYCONST double reciprocal_lattice[3][3],
+                               PHPYCONST double (*born)[3][3],
+                               PHPYCONST double dielectric[3][3],
+                               const double nac_factor,
+                               const double *q_direction,
+                               const double *dd_q0,
+                               PHPYCONST double (*G_list)[3],
+                               const int num_G,
+                               PHPYCONST double (*positions)[3],
+                               const double lambda,
+                               const double frequency_factor,
+                               const double tolerance,
+                               const char uplo);
+
+#endif
@@ -124,11 +124,15 @@ class Phonopy(object):
         # set_force_constants or set_forces
         self._force_constants = None
         self._force_constants_decimals = force_constants_decimals
+        # Non-zero blocks of force constants are listed after cutoff.
+        self._use_fc_pair_list = False
 
         # set_dynamical_matrix
         self._dynamical_matrix = None
         self._nac_params = nac_params
         self._dynamical_matrix_decimals = dynamical_matrix_decimals
+        self._phase_factor_cache = None
+        self._Gonze_nac_cache = None
 
         # set_band_structure
         self._band_structure = None
@@ -332,6 +336,39 @@ class Phonopy(object):
         """Return DynamicalMatrix instance"""
         return self.dynamical_matrix
 
+    @property
+    def phase_factor_cache(self):
+        """PhaseFactorCache instance used by dynamical matrix
+
+        Phase factors of q-point sets stored in the cache are reused after
+        force constants or masses are updated.
+
+        """
+        return self._phase_factor_cache
+
+    @phase_factor_cache.setter
+    def phase_factor_cache(self, phase_factor_cache):
+        self._phase_factor_cache = phase_factor_cache
+        if self._dynamical_matrix is not None:
+            self._dynamical_matrix.phase_factor_cache = phase_factor_cache
+
+    @property
+    def Gonze_nac_cache(self):
+        """GonzeNACCache instance used by dynamical matrix with NAC
+
+        Datasets of NAC by Gonze et al. are read from and written to the
+        on-disk cache.
+
+        """
+        return self._Gonze_nac_cache
+
+    @Gonze_nac_cache.setter
+    def Gonze_nac_cache(self, Gonze_nac_cache):
+        self._Gonze_nac_cache = Gonze_nac_cache
+        if (self._dynamical_matrix is not None and
+            self._dynamical_matrix.is_nac()):
+            self._dynamical_matrix.Gonze_nac_cache = Gonze_nac_cache
+
     @property
     def nac_params(self):
         return self._nac_params
@@ -559,6 +596,7 @@ class Phonopy(object):
                     raise RuntimeError(msg)
 
         self._force_constants = force_constants
+        self._use_fc_pair_list = False
         if self._primitive.get_masses() is not None:
             self._set_dynamical_matrix()
 
@@ -574,6 +612,7 @@ class Phonopy(object):
                                self._primitive,
                                cutoff_radius,
                                symprec=self._symprec)
+        self._use_fc_pair_list = True
         if self._primitive.get_masses() is not None:
             self._set_dynamical_matrix()
 
@@ -699,6 +738,7 @@ class Phonopy(object):
                 fc_calculator=fc_calculator,
                 fc_calculator_options=fc_calculator_options,
                 decimals=self._force_constants_decimals)
+        self._use_fc_pair_list = False
 
         if show_drift and self._log_level:
             show_drift_force_constants(self._force_constants,
@@ -841,7 +881,8 @@ class Phonopy(object):
                            is_band_connection=False,
                            path_connections=None,
                            labels=None,
-                           is_legacy_plot=False):
+                           is_legacy_plot=False,
+                           precision='double'):
         """Run phonon band structure calculation.
 
         Parameters
@@ -870,6 +911,12 @@ class Phonopy(object):
             to (2 - np.array(path_connections)).sum().
         is_legacy_plot: bool, optional
             This makes the old style band structure plot. Default is False.
+        precision : str, optional
+            'double' or 'single'. With 'single', dynamical matrices are
+            built in double precision, but phonons are solved and stored in
+            single precision to save memory, followed by refinement in
+            double precision at q-points having near-degenerate or acoustic
+            modes. Default is 'double'.
 
         """
 
@@ -893,7 +940,9 @@ class Phonopy(object):
             path_connections=path_connections,
             labels=labels,
             is_legacy_plot=is_legacy_plot,
-            factor=self._factor)
+            factor=self._factor,
+            use_lapack_solver=self._use_lapack_solver,
+            precision=precision)
 
     def set_band_structure(self,
                            bands,
@@ -1067,7 +1116,10 @@ class Phonopy(object):
                   with_eigenvectors=False,
                   with_group_velocities=False,
                   is_gamma_center=False,
-                  use_iter_mesh=False):
+                  use_iter_mesh=False,
+                  precision='double',
+                  nprocs=1,
+                  chunk_size=None):
         """Initialize mesh sampling phonon calculation without starting to run.
 
         Phonon calculation starts explicitly with calling Mesh.run() or
@@ -1109,8 +1161,24 @@ class Phonopy(object):
         use_iter_mesh: bool
             Use IterMesh instead of Mesh class not to store phonon properties
             in its instance to save memory consumption. This is used with
-            ThermalDisplacements and ThermalDisplacementMatrices.
+            ThermalDisplacements, ThermalDisplacementMatrices, and
+            ThermalProperties without projection.
             Default is False.
+        precision : str, optional
+            'double' or 'single'. With 'single', dynamical matrices are
+            built in double precision, but phonons are solved and stored in
+            single precision to save memory, followed by refinement in
+            double precision at q-points having near-degenerate or acoustic
+            modes. Default is 'double'.
+        nprocs : int, optional
+            Number of processes among which ir-grid points are distributed.
+            Force constants are shared with the processes through shared
+            memory. This is not used with use_iter_mesh=True. Default is 1.
+        chunk_size : int, optional
+            With use_iter_mesh=True, IterMesh generates phonons at blocks of
+            up to chunk_size ir-grid points, which are solved at once.
+            Default is None, i.e., phonons at each ir-grid point are
+            generated.
 
         """
 
@@ -1147,14 +1215,17 @@ class Phonopy(object):
         if use_iter_mesh:
             self._mesh = IterMesh(
                 self._dynamical_matrix,
-                mesh,
+                mesh_nums,
                 shift=shift,
                 is_time_reversal=is_time_reversal,
                 is_mesh_symmetry=is_mesh_symmetry,
                 with_eigenvectors=with_eigenvectors,
-                is_gamma_center=is_gamma_center,
+                is_gamma_center=_is_gamma_center,
                 rotations=self._primitive_symmetry.get_pointgroup_operations(),
-                factor=self._factor)
+                factor=self._factor,
+                use_lapack_solver=self._use_lapack_solver,
+                precision=precision,
+                chunk_size=chunk_size)
         else:
             self._mesh = Mesh(
                 self._dynamical_matrix,
@@ -1167,7 +1238,9 @@ class Phonopy(object):
                 group_velocity=group_velocity,
                 rotations=self._primitive_symmetry.get_pointgroup_operations(),
                 factor=self._factor,
-                use_lapack_solver=self._use_lapack_solver)
+                use_lapack_solver=self._use_lapack_solver,
+                precision=precision,
+                nprocs=nprocs)
 
     def run_mesh(self,
                  mesh=100.0,
@@ -1176,7 +1249,9 @@ class Phonopy(object):
                  is_mesh_symmetry=True,
                  with_eigenvectors=False,
                  with_group_velocities=False,
-                 is_gamma_center=False):
+                 is_gamma_center=False,
+                 precision='double',
+                 nprocs=1):
         """Run mesh sampling phonon calculation.
 
         See the parameter details in Phonopy.init_mesh().
@@ -1189,7 +1264,9 @@ class Phonopy(object):
                        is_mesh_symmetry=is_mesh_symmetry,
                        with_eigenvectors=with_eigenvectors,
                        with_group_velocities=with_group_velocities,
-                       is_gamma_center=is_gamma_center)
+                       is_gamma_center=is_gamma_center,
+                       precision=precision,
+                       nprocs=nprocs)
         self._mesh.run()
 
     def set_mesh(self,
@@ -1329,8 +1406,19 @@ class Phonopy(object):
                 self._mesh.ir_grid_points,
                 self._mesh.grid_mapping_table)
 
-    def write_hdf5_mesh(self):
-        self._mesh.write_hdf5()
+    def write_hdf5_mesh(self,
+                        filename='mesh.hdf5',
+                        compression=None,
+                        eigenvector_precision=None):
+        """Write phonons on sampling mesh to hdf5 file
+
+        See the parameter details in MeshBase.write_hdf5. The file can be
+        read by phonopy.phonon.mesh.MeshHDF5Reader.
+
+        """
+        self._mesh.write_hdf5(filename=filename,
+                              compression=compression,
+                              eigenvector_precision=eigenvector_precision)
 
     def write_yaml_mesh(self):
         self._mesh.write_yaml()
@@ -1439,7 +1527,8 @@ class Phonopy(object):
                     with_eigenvectors=False,
                     with_group_velocities=False,
                     with_dynamical_matrices=False,
-                    nac_q_direction=None):
+                    nac_q_direction=None,
+                    precision='double'):
         """Phonon calculations on q-points.
 
         Parameters
@@ -1458,6 +1547,12 @@ class Phonopy(object):
             q=(0,0,0) is replaced by q=epsilon * nac_q_direction where epsilon
             is infinitsimal for non-analytical term correction. This is used,
             e.g., to observe LO-TO splitting,
+        precision : str, optional
+            'double' or 'single'. With 'single', dynamical matrices are
+            built in double precision, but phonons are solved and stored in
+            single precision to save memory, followed by refinement in
+            double precision at q-points having near-degenerate or acoustic
+            modes. Default is 'double'.
 
         """
 
@@ -1479,7 +1574,9 @@ class Phonopy(object):
             with_eigenvectors=with_eigenvectors,
             group_velocity=group_velocity,
             with_dynamical_matrices=with_dynamical_matrices,
-            factor=self._factor)
+            factor=self._factor,
+            use_lapack_solver=self._use_lapack_solver,
+            precision=precision)
 
     def set_qpoints_phonon(self,
                            q_points,
@@ -1692,6 +1789,10 @@ class Phonopy(object):
             This determines whether projected along Cartesian directions or
             not. Default is False, i.e., no projection.
 
+        When run_mesh was called without eigenvectors, phonons are solved
+        again and only the weights of the projection are stored in the
+        Mesh instance (see Mesh.run_projected_weights).
+
         """
 
         self._pdos = None
@@ -1700,7 +1801,8 @@ class Phonopy(object):
             msg = "run_mesh has to be done before PDOS calculation."
             raise RuntimeError(msg)
 
-        if not self._mesh.with_eigenvectors:
+        if (not self._mesh.with_eigenvectors and
+            not isinstance(self._mesh, Mesh)):
             msg = "run_mesh has to be called with with_eigenvectors=True."
             raise RuntimeError(msg)
 
@@ -1712,6 +1814,13 @@ class Phonopy(object):
             direction_cart = np.dot(direction, self._primitive.get_cell())
         else:
             direction_cart = None
+
+        # Without eigenvectors, only weights for the projection are stored.
+        if (not self._mesh.with_eigenvectors and
+            not self._mesh.has_projected_weights(
+                direction=direction_cart, xyz_projection=xyz_projection)):
+            self._mesh.run_projected_weights(direction=direction_cart,
+                                             xyz_projection=xyz_projection)
         self._pdos = PartialDos(self._mesh,
                                 sigma=sigma,
                                 use_tetrahedron_method=use_tetrahedron_method,
@@ -1751,7 +1860,7 @@ class Phonopy(object):
         self.run_mesh(mesh=mesh,
                       is_time_reversal=is_time_reversal,
                       is_mesh_symmetry=False,
-                      with_eigenvectors=True,
+                      with_eigenvectors=False,
                       is_gamma_center=is_gamma_center)
         self.run_projected_dos()
         if write_dat:
@@ -1877,6 +1986,11 @@ class Phonopy(object):
             Temperature points where thermal properties are calculated.
             When this is set, t_min, t_max, and t_step are ignored.
 
+        With mesh initialized by use_iter_mesh=True, phonons are generated
+        at blocks of ir-grid points and only running sums over q-points
+        are kept, which can be used for dense meshes whose frequencies do
+        not fit in memory. Projection is unavailable in this case.
+
         """
         if self._mesh is None:
             msg = ("run_mesh has to be done before"
@@ -2016,14 +2130,9 @@ class Phonopy(object):
         if self._mesh is None:
             msg = ("run_mesh has to be done.")
             raise RuntimeError(msg)
-        mesh_nums = self._mesh.mesh_numbers
-        ir_grid_points = self._mesh.ir_grid_points
         if not self._mesh.with_eigenvectors:
             msg = ("run_mesh has to be done with with_eigenvectors=True.")
             raise RuntimeError(msg)
-        if np.prod(mesh_nums) != len(ir_grid_points):
-            msg = ("run_mesh has to be done with is_mesh_symmetry=False.")
-            raise RuntimeError(msg)
 
         if direction is not None:
             projection_direction = np.dot(direction,
@@ -2032,11 +2141,13 @@ class Phonopy(object):
                 self._mesh,
                 projection_direction=projection_direction,
                 freq_min=freq_min,
-                freq_max=freq_max)
+                freq_max=freq_max,
+                symmetry=self._primitive_symmetry)
         else:
             td = ThermalDisplacements(self._mesh,
                                       freq_min=freq_min,
-                                      freq_max=freq_max)
+                                      freq_max=freq_max,
+                                      symmetry=self._primitive_symmetry)
 
         if temperatures is None:
             td.set_temperature_range(t_min, t_max, t_step)
@@ -2130,20 +2241,16 @@ class Phonopy(object):
         if self._mesh is None:
             msg = ("run_mesh has to be done.")
             raise RuntimeError(msg)
-        mesh_nums = self._mesh.mesh_numbers
-        ir_grid_points = self._mesh.ir_grid_points
         if not self._mesh.with_eigenvectors:
             msg = ("run_mesh has to be done with with_eigenvectors=True.")
             raise RuntimeError(msg)
-        if np.prod(mesh_nums) != len(ir_grid_points):
-            msg = ("run_mesh has to be done with is_mesh_symmetry=False.")
-            raise RuntimeError(msg)
 
         tdm = ThermalDisplacementMatrices(
             self._mesh,
             freq_min=freq_min,
             freq_max=freq_max,
-            lattice=self._primitive.get_cell().T)
+            lattice=self._primitive.get_cell().T,
+            symmetry=self._primitive_symmetry)
 
         if temperatures is None:
             tdm.set_temperature_range(t_min, t_max, t_step)
@@ -2671,6 +2778,9 @@ class Phonopy(object):
             nac_params = {'born': borns,
                           'dielectric': epsilon,
                           'factor': self._nac_params['factor']}
+            for key in ('G_cutoff', 'Lambda', 'accuracy'):
+                if key in self._nac_params:
+                    nac_params[key] = self._nac_params[key]
         else:
             nac_params = self._nac_params
 
@@ -2688,7 +2798,10 @@ class Phonopy(object):
             self._frequency_scale_factor,
             self._dynamical_matrix_decimals,
             symprec=self._symprec,
-            log_level=self._log_level)
+            log_level=self._log_level,
+            use_fc_pair_list=self._use_fc_pair_list,
+            phase_factor_cache=self._phase_factor_cache,
+            Gonze_nac_cache=self._Gonze_nac_cache)
         # DynamialMatrix instance transforms force constants in correct
         # type of numpy array.
         self._force_constants = self._dynamical_matrix.force_constants
@@ -2720,7 +2833,8 @@ class Phonopy(object):
             self._dynamical_matrix,
             q_length=self._gv_delta_q,
             symmetry=self._primitive_symmetry,
-            frequency_factor_to_THz=self._factor)
+            frequency_factor_to_THz=self._factor,
+            use_lapack_solver=self._use_lapack_solver)
 
     def _search_symmetry(self):
         self._symmetry = Symmetry(self._supercell,
@@ -2187,7 +2187,6 @@ class PhonopyConfParser(ConfParser):
         if 'tdisp' in params and params['tdisp']:
             self._settings.set_is_thermal_displacements(True)
             self._settings.set_is_eigenvectors(True)
-            self._settings.set_is_mesh_symmetry(False)
             # Exclusive conditions
             self._settings.set_is_thermal_properties(False)
             self._settings.set_is_thermal_displacement_matrices(False)
@@ -2198,7 +2197,6 @@ class PhonopyConfParser(ConfParser):
             'tdispmat_cif' in params):
             self._settings.set_is_thermal_displacement_matrices(True)
             self._settings.set_is_eigenvectors(True)
-            self._settings.set_is_mesh_symmetry(False)
             # Exclusive conditions
             self._settings.set_is_thermal_properties(False)
             self._settings.set_is_thermal_displacements(False)
@@ -34,7 +34,7 @@
 
 import numpy as np
 from phonopy.phonon.band_structure import estimate_band_connection
-from phonopy.phonon.degeneracy import rotate_eigenvectors
+from phonopy.phonon.degeneracy import rotate_eigenvectors_at_qpoints
 
 
 class GruneisenBase(object):
@@ -87,23 +87,20 @@ class GruneisenBase(object):
             band_order = range(self._dynmat.get_dimension())
             prev_eigvecs = None
 
-        edDe = []  # <e|dD|e>
-        eigvals = []
-        eigvecs = []
-        for i, q in enumerate(self._qpoints):
-            if self._is_band_connection and self._dynmat.is_nac():
-                self._dynmat.set_dynamical_matrix(
-                    q, q_direction=self._q_direction)
-            else:
-                self._dynmat.set_dynamical_matrix(q)
+        dms = self._get_dynamical_matrices(self._dynmat)
+        evals_all, evecs_all = np.linalg.eigh(dms)
+        evals_all = evals_all.real
+        dDs = (self._get_dynamical_matrices(self._dynmat_plus) -
+               self._get_dynamical_matrices(self._dynmat_minus))
+        evecs_all, edDe_all = rotate_eigenvectors_at_qpoints(
+            evals_all, evecs_all, dDs)
 
-            dm = self._dynmat.get_dynamical_matrix()
-            evals, evecs = np.linalg.eigh(dm)
-            evals_at_q = evals.real
-            dD = self._get_dD(q, self._dynmat_minus, self._dynmat_plus)
-            evecs_at_q, edDe_at_q = rotate_eigenvectors(evals_at_q, evecs, dD)
-
-            if self._is_band_connection:
+        if self._is_band_connection:
+            edDe = []  # <e|dD|e>
+            eigvals = []
+            eigvecs = []
+            for evals_at_q, evecs_at_q, edDe_at_q in zip(
+                    evals_all, evecs_all, edDe_all):
                 if prev_eigvecs is not None:
                     band_order = estimate_band_connection(
                         prev_eigvecs,
@@ -113,10 +110,10 @@ class GruneisenBase(object):
                 eigvecs.append(evecs_at_q[:, band_order])
                 edDe.append(edDe_at_q[band_order])
                 prev_eigvecs = evecs_at_q
-            else:
-                eigvals.append(evals_at_q)
-                eigvecs.append(evecs_at_q)
-                edDe.append(edDe_at_q)
+        else:
+            edDe = edDe_all
+            eigvals = evals_all
+            eigvecs = evecs_all
 
         edDe = np.array(edDe, dtype='double', order='C')
         self._eigenvalues = np.array(eigvals, dtype='double', order='C')
@@ -125,13 +122,9 @@ class GruneisenBase(object):
                                       dtype=("c%d" % (itemsize * 2)), order='C')
         self._gruneisen = -edDe / self._delta_strain / self._eigenvalues / 2
 
-    def _get_dD(self, q, d_a, d_b):
-        if (self._is_band_connection and d_a.is_nac() and d_b.is_nac()):
-            d_a.set_dynamical_matrix(q, q_direction=self._q_direction)
-            d_b.set_dynamical_matrix(q, q_direction=self._q_direction)
+    def _get_dynamical_matrices(self, dynmat):
+        if self._is_band_connection and dynmat.is_nac():
+            return np.array([dynmat.compute(q, q_direction=self._q_direction)
+                             for q in self._qpoints])
         else:
-            d_a.set_dynamical_matrix(q)
-            d_b.set_dynamical_matrix(q)
-        dm_a = d_a.get_dynamical_matrix()
-        dm_b = d_b.get_dynamical_matrix()
-        return (dm_b - dm_a)
+            return dynmat.run_batch(self._qpoints)
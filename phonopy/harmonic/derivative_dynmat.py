@@ -45,7 +45,7 @@ class DerivativeOfDynamicalMatrix(object):
     def __init__(self, dynamical_matrix):
         self._dynmat = dynamical_matrix
         (self._smallest_vectors,
-         self._multiplicity) = self._dynmat.get_shortest_vectors()
+         self._multiplicity) = self._dynmat.compact_shortest_vectors
         self._force_constants = self._dynmat.force_constants
         self._scell = self._dynmat.supercell
         self._pcell = self._dynmat.primitive
@@ -71,6 +71,63 @@ class DerivativeOfDynamicalMatrix(object):
         else:
             self._run_c(q, q_direction=q_direction)
 
+    def run_batch(self, qpoints, q_direction=None, directions=None,
+                  lang='C'):
+        """Calculate derivatives of dynamical matrices at many q-points
+
+        Derivatives are returned but not stored in the instance.
+
+        Parameters
+        ----------
+        qpoints : array_like
+            q-points in reduced coordinates.
+            dtype='double', shape=(qpoints, 3)
+        q_direction : array_like, optional
+            Direction of q used for NAC at q-points at Gamma point.
+            Default is None.
+        directions : array_like, optional
+            Cartesian directions along which derivatives are projected.
+            Default is None, i.e., derivatives along x, y, z are returned.
+            dtype='double', shape=(directions, 3)
+
+        Returns
+        -------
+        ndarray
+            Derivatives of dynamical matrices.
+            dtype='complex128',
+            shape=(qpoints, 3 or directions, bands, bands)
+
+        """
+
+        _qpoints = np.array(np.reshape(qpoints, (-1, 3)),
+                            dtype='double', order='C')
+        if directions is None:
+            _directions = None
+        else:
+            _directions = np.array(np.reshape(directions, (-1, 3)),
+                                   dtype='double', order='C')
+        if self._derivative_order is not None or lang != 'C':
+            return self._run_batch_py(_qpoints, q_direction, _directions)
+        try:
+            import phonopy._phonopy as phonoc
+        except ImportError:
+            return self._run_batch_py(_qpoints, q_direction, _directions)
+
+        num_band = len(self._p2s_map) * 3
+        if _directions is None:
+            num_elem = 3
+        else:
+            num_elem = len(_directions)
+        itemsize = self._force_constants.itemsize
+        ddms = np.zeros((len(_qpoints), num_elem, num_band, num_band),
+                        dtype=("c%d" % (itemsize * 2)))
+        args = self._get_c_args(q_direction)
+        phonoc.derivative_dynmats(ddms.view(dtype='double'),
+                                  self._force_constants,
+                                  _qpoints,
+                                  *(args + (_directions, )))
+        return ddms
+
     def set_derivative_order(self, order):
         if order == 1 or order == 2:
             self._derivative_order = order
@@ -83,14 +140,19 @@ class DerivativeOfDynamicalMatrix(object):
     def _run_c(self, q, q_direction=None):
         import phonopy._phonopy as phonoc
         num_patom = len(self._p2s_map)
-
-        mass = self._pcell.get_masses()
-        fc = self._force_constants
         itemsize = self._force_constants.itemsize
         ddm = np.zeros((3, num_patom * 3, num_patom * 3),
                        dtype=("c%d" % (itemsize * 2)))
-        vectors = self._smallest_vectors
-        multiplicity = self._multiplicity
+        phonoc.derivative_dynmat(ddm.view(dtype='double'),
+                                 self._force_constants,
+                                 np.array(q, dtype='double'),
+                                 *self._get_c_args(q_direction))
+        self._ddm = ddm
+
+    def _get_c_args(self, q_direction):
+        """Arguments of derivative_dynmat(s) following fc and q-point(s)"""
+
+        fc = self._force_constants
         if self._dynmat.is_nac():
             born = self._dynmat.get_born_effective_charges()
             dielectric = self._dynmat.get_dielectric_constant()
@@ -106,38 +168,36 @@ class DerivativeOfDynamicalMatrix(object):
             q_dir = None
 
         if fc.shape[0] == fc.shape[1]:  # full fc
-            phonoc.derivative_dynmat(ddm.view(dtype='double'),
-                                     fc,
-                                     np.array(q, dtype='double'),
-                                     np.array(self._pcell.get_cell().T,
-                                              dtype='double', order='C'),
-                                     vectors,
-                                     multiplicity,
-                                     mass,
-                                     self._s2p_map,
-                                     self._p2s_map,
-                                     nac_factor,
-                                     born,
-                                     dielectric,
-                                     q_dir)
+            s2p_map = self._s2p_map
+            p2s_map = self._p2s_map
         else:
-            phonoc.derivative_dynmat(ddm.view(dtype='double'),
-                                     fc,
-                                     np.array(q, dtype='double'),
-                                     np.array(self._pcell.get_cell().T,
-                                              dtype='double', order='C'),
-                                     vectors,
-                                     multiplicity,
-                                     mass,
-                                     self._s2pp_map,
-                                     np.arange(len(self._p2s_map),
-                                               dtype='intc'),
-                                     nac_factor,
-                                     born,
-                                     dielectric,
-                                     q_dir)
-
-        self._ddm = ddm
+            s2p_map = self._s2pp_map
+            p2s_map = np.arange(len(self._p2s_map), dtype='intc')
+
+        return (np.array(self._pcell.get_cell().T,
+                         dtype='double', order='C'),
+                self._smallest_vectors,
+                self._multiplicity,
+                self._pcell.get_masses(),
+                s2p_map,
+                p2s_map,
+                nac_factor,
+                born,
+                dielectric,
+                q_dir)
+
+    def _run_batch_py(self, qpoints, q_direction, directions):
+        ddms = []
+        for q in qpoints:
+            if q_direction is not None and (np.abs(q) < 1e-5).all():
+                self._run_py(q, q_direction=q_direction)
+            else:
+                self._run_py(q)
+            if directions is None:
+                ddms.append(self._ddm)
+            else:
+                ddms.append(np.tensordot(directions, self._ddm, axes=(1, 0)))
+        return np.array(ddms)
 
     def _run_py(self, q, q_direction=None):
         if self._dynmat.is_nac():
@@ -164,7 +224,10 @@ class DerivativeOfDynamicalMatrix(object):
                        dtype=("c%d" % (itemsize * 2)))
 
         for i, j in list(np.ndindex(num_patom, num_patom)):
-            s_i = self._p2s_map[i]
+            if fc.shape[0] == fc.shape[1]:  # full fc
+                i_fc = self._p2s_map[i]
+            else:
+                i_fc = i
             s_j = self._p2s_map[j]
             mass = np.sqrt(self._mass[i] * self._mass[j])
             ddm_local = np.zeros((num_elem, 3, 3),
@@ -174,8 +237,8 @@ class DerivativeOfDynamicalMatrix(object):
                 if s_j != self._s2p_map[k]:
                     continue
 
-                multi = multiplicity[k, i]
-                vecs_multi = vecs[k, i, :multi]
+                multi, adrs = multiplicity[k, i]
+                vecs_multi = vecs[adrs:(adrs + multi)]
                 phase_multi = np.exp([np.vdot(vec, q) * 2j * np.pi
                                       for vec in vecs_multi])
                 vecs_multi_cart = np.dot(vecs_multi, self._pcell.get_cell())
@@ -188,9 +251,9 @@ class DerivativeOfDynamicalMatrix(object):
                     coef = coef_order1
 
                 if self._dynmat.is_nac():
-                    fc_elem = fc[s_i, k] + fc_nac[i, j]
+                    fc_elem = fc[i_fc, k] + fc_nac[i, j]
                 else:
-                    fc_elem = fc[s_i, k]
+                    fc_elem = fc[i_fc, k]
 
                 for l in range(num_elem):
                     ddm_elem = fc_elem * (coef[:, l] * phase_multi).sum()
@@ -221,11 +284,8 @@ class DerivativeOfDynamicalMatrix(object):
         q = np.dot(rec_lat, q_direction)
 
         B = self._B(e, q)
-        for i in range(num_atom):
-            A_i = self._A(q, Z, i)
-            for j in range(num_atom):
-                A_j = self._A(q, Z, j)
-                nac_q[i, j] = np.outer(A_i, A_j) / B
+        A = np.dot(q, Z)
+        nac_q[:] = np.einsum('ik,jl->ijkl', A, A) / B
 
         num_satom = self._scell.get_number_of_atoms()
         N = num_satom // num_atom
@@ -245,31 +305,20 @@ class DerivativeOfDynamicalMatrix(object):
         q = np.dot(rec_lat, q_direction)
 
         B = self._B(e, q)
-        for xyz in range(3):
-            dB = self._dB(e, q, xyz)
-            for i in range(num_atom):
-                A_i = self._A(q, Z, i)
-                dA_i = self._dA(Z, i, xyz)
-                for j in range(num_atom):
-                    A_j = self._A(q, Z, j)
-                    dA_j = self._dA(Z, j, xyz)
-                    d_nac_q[xyz, i, j] = (
-                        (np.outer(dA_i, A_j) + np.outer(A_i, dA_j)) / B -
-                        np.outer(A_i, A_j) * dB / B ** 2)
+        A = np.dot(q, Z)
+        dA = Z  # dA[i, xyz] = d(A[i]) / d(q[xyz])
+        dB = np.array([self._dB(e, q, xyz) for xyz in range(3)])
+        d_nac_q[:] = ((np.einsum('ixk,jl->xijkl', dA, A) +
+                       np.einsum('ik,jxl->xijkl', A, dA)) / B -
+                      np.einsum('ik,jl,x->xijkl', A, A, dB) / B ** 2)
 
         num_satom = self._scell.get_number_of_atoms()
         N = num_satom // num_atom
         return d_nac_q * nac_factor / N
 
-    def _A(self, q, Z, atom_num):
-        return np.dot(q, Z[atom_num])
-
     def _B(self, epsilon, q):
         return np.dot(q, np.dot(epsilon, q))
 
-    def _dA(self, Z, atom_num, xyz):
-        return Z[atom_num, xyz, :]
-
     def _dB(self, epsilon, q, xyz):
         e = epsilon
         return np.dot(e[xyz], q) * 2
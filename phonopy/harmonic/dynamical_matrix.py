@@ -32,8 +32,14 @@
 # ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
+import os
 import sys
+import math
+import hashlib
+import warnings
+from collections import OrderedDict
 from phonopy.harmonic.dynmat_to_fc import DynmatToForceConstants
+from phonopy.harmonic.force_constants import get_force_constants_pair_list
 import numpy as np
 
 
@@ -44,7 +50,10 @@ def get_dynamical_matrix(fc2,
                          frequency_scale_factor=None,
                          decimals=None,
                          symprec=1e-5,
-                         log_level=0):
+                         log_level=0,
+                         use_fc_pair_list=False,
+                         phase_factor_cache=None,
+                         Gonze_nac_cache=None):
     if frequency_scale_factor is None:
         _fc2 = fc2
     else:
@@ -55,7 +64,9 @@ def get_dynamical_matrix(fc2,
             supercell,
             primitive,
             _fc2,
-            decimals=decimals)
+            decimals=decimals,
+            use_fc_pair_list=use_fc_pair_list,
+            phase_factor_cache=phase_factor_cache)
     else:
         dm = DynamicalMatrixNAC(
             supercell,
@@ -63,11 +74,289 @@ def get_dynamical_matrix(fc2,
             _fc2,
             decimals=decimals,
             symprec=symprec,
-            log_level=log_level)
+            log_level=log_level,
+            use_fc_pair_list=use_fc_pair_list,
+            phase_factor_cache=phase_factor_cache,
+            Gonze_nac_cache=Gonze_nac_cache)
         dm.set_nac_params(nac_params)
     return dm
 
 
+# Reciprocal lattice vectors in G-cutoff spheres of recently used
+# (reciprocal lattice, G-cutoff) pairs.
+_G_list_cache = OrderedDict()
+_G_list_cache_size = 8
+
+
+def get_G_list(rec_lat, G_cutoff):
+    """Return reciprocal lattice vectors inside G-cutoff sphere
+
+    Ranges of integer coordinates are bounded using the reciprocal metric
+    tensor, |n_i| <= G_cutoff * sqrt((M^-1)_ii) with M = B^T B, and only
+    the lattice points of the bounding box are enumerated plane by plane.
+    Results are cached per (reciprocal lattice, G-cutoff) and returned as
+    read-only arrays.
+
+    Parameters
+    ----------
+    rec_lat : array_like
+        Reciprocal basis vectors B as column vectors without 2pi.
+        shape=(3, 3)
+    G_cutoff : float
+        Cutoff radius of G-vectors without 2pi.
+
+    Returns
+    -------
+    ndarray
+        G-vectors in Cartesian coordinates.
+        dtype='double', shape=(G-vectors, 3)
+
+    """
+
+    _rec_lat = np.array(rec_lat, dtype='double', order='C')
+    key = (_rec_lat.tobytes(), float(G_cutoff))
+    if key in _G_list_cache:
+        G_list = _G_list_cache.pop(key)
+        _G_list_cache[key] = G_list  # most recently used
+        return G_list
+
+    metric = np.dot(_rec_lat.T, _rec_lat)
+    n_max = np.floor(
+        G_cutoff * np.sqrt(np.diag(np.linalg.inv(metric))) + 1e-8).astype(int)
+    # Grid points are ordered by (n_1, n_0, n_2) in C-order.
+    n0, n2 = np.meshgrid(np.arange(-n_max[0], n_max[0] + 1),
+                         np.arange(-n_max[2], n_max[2] + 1),
+                         indexing='ij')
+    n_plane = np.zeros((n0.size, 3), dtype='double')
+    n_plane[:, 0] = n0.ravel()
+    n_plane[:, 2] = n2.ravel()
+    G_planes = []
+    for n1 in range(-n_max[1], n_max[1] + 1):
+        n_plane[:, 1] = n1
+        G_vecs = np.dot(n_plane, _rec_lat.T)
+        G_norm2 = (G_vecs ** 2).sum(axis=1)
+        G_planes.append(G_vecs[G_norm2 < G_cutoff ** 2])
+    G_list = np.array(np.vstack(G_planes), dtype='double', order='C')
+    G_list.flags.writeable = False
+
+    _G_list_cache[key] = G_list
+    while len(_G_list_cache) > _G_list_cache_size:
+        _G_list_cache.popitem(last=False)
+    return G_list
+
+
+class PhaseFactorCache(object):
+    """Cache of phase factors of fixed q-point sets
+
+    Phase factors exp(2pi i q.r) averaged over equidistant shortest vectors
+    are stored for each q-point set and every (primitive atom, supercell
+    atom) pair. With them, dynamical matrices at all q-points of the set are
+    obtained by batched matrix products against force constants, i.e.,
+    force constants and masses can be changed without recomputing phase
+    factors. The least recently used q-point sets are evicted when the
+    memory budget is exceeded. A cache instance can be shared by dynamical
+    matrices of the same crystal structure.
+
+    Attributes
+    ----------
+    memory_budget : int
+        Maximum memory in bytes used to store phase factors.
+    memory_usage : int
+        Memory in bytes currently used to store phase factors.
+
+    """
+
+    def __init__(self, memory_budget=2 ** 28):
+        self._memory_budget = memory_budget
+        self._phase_factors = OrderedDict()
+        self._svecs = None
+        self._multi = None
+        self._s2pp_map = None
+        self._satoms = None
+
+    @property
+    def memory_budget(self):
+        return self._memory_budget
+
+    @property
+    def memory_usage(self):
+        return sum([v.nbytes for v in self._phase_factors.values()])
+
+    def clear(self):
+        self._phase_factors.clear()
+
+    def get_phase_factors(self, qpoints, svecs, multi, s2pp_map):
+        """Return phase factors at q-points
+
+        Parameters
+        ----------
+        qpoints : ndarray
+            q-points in reduced coordinates.
+            dtype='double', shape=(qpoints, 3)
+        svecs, multi : ndarray
+            Shortest vectors and multiplicities of Primitive.
+        s2pp_map : ndarray
+            Supercell atom index to primitive atom index.
+
+        Returns
+        -------
+        phase_factors : ndarray or None
+            None is returned when the phase factors do not fit in the memory
+            budget. Phase factors of supercell atoms
+            satoms[j, n] (see below) and primitive atom i are stored at
+            [i, j, q, n].
+            dtype='complex128'
+            shape=(prim atoms, prim atoms, qpoints, lattice points)
+        satoms : ndarray
+            Supercell atom indices grouped by primitive atom indices.
+            dtype='int_'
+            shape=(prim atoms, lattice points)
+
+        """
+
+        self._check_structure(svecs, multi, s2pp_map)
+        key = qpoints.tobytes()
+        if key in self._phase_factors:
+            phase_factors = self._phase_factors.pop(key)
+            self._phase_factors[key] = phase_factors  # most recently used
+            return phase_factors, self._satoms
+
+        num_patom = multi.shape[1]
+        nbytes = len(qpoints) * multi.shape[0] * num_patom * 16
+        if nbytes > self._memory_budget:
+            return None, self._satoms
+        while self.memory_usage + nbytes > self._memory_budget:
+            self._phase_factors.popitem(last=False)
+
+        phase_factors = self._run(qpoints, svecs, multi)
+        self._phase_factors[key] = phase_factors
+        return phase_factors, self._satoms
+
+    def _check_structure(self, svecs, multi, s2pp_map):
+        if (self._multi is None or
+            self._multi.shape != multi.shape or
+            not (self._multi == multi).all() or
+            not np.array_equal(self._svecs, svecs) or
+            not np.array_equal(self._s2pp_map, s2pp_map)):
+            self.clear()
+            self._svecs = svecs.copy()
+            self._multi = multi.copy()
+            self._s2pp_map = np.array(s2pp_map, dtype='intc')
+            num_patom = multi.shape[1]
+            self._satoms = np.argsort(s2pp_map, kind='mergesort').reshape(
+                num_patom, -1)
+
+    def _run(self, qpoints, svecs, multi):
+        num_satom, num_patom = multi.shape[:2]
+        # Vectors are stored in the order of (satom, patom) pairs.
+        phases = np.exp(2j * np.pi * np.dot(qpoints, svecs.T))
+        phases = np.add.reduceat(phases, multi[:, :, 1].ravel(), axis=1)
+        phases /= multi[:, :, 0].ravel()
+        phases = phases.reshape(len(qpoints), num_satom, num_patom)
+        # [q, j, n, i] -> [i, j, q, n]
+        return np.array(phases[:, self._satoms, :].transpose(3, 1, 0, 2),
+                        dtype='c16', order='C')
+
+
+def _inverse_erfc(y, tolerance=1e-12):
+    """Return x of erfc(x) = y for 0 < y < 1 by bisection"""
+    x_min, x_max = 0.0, 1.0
+    while math.erfc(x_max) > y:
+        x_max *= 2
+    while x_max - x_min > tolerance:
+        x = (x_min + x_max) / 2
+        if math.erfc(x) > y:
+            x_min = x
+        else:
+            x_max = x
+    return (x_min + x_max) / 2
+
+
+class GonzeNACCache(object):
+    """On-disk cache of datasets of NAC by Gonze et al.
+
+    Short-range force constants, dipole-dipole term at q=0 and G-vectors
+    are stored in npz files in a directory. The file names are hashes of
+    all the inputs used to build the dataset, i.e., force constants, Born
+    effective charges, dielectric constant, crystal structures, masses,
+    Lambda and G-cutoff. When the total size of the files exceeds
+    max_size, the least recently used files are removed.
+
+    Attributes
+    ----------
+    directory : str
+        Cache directory. It is created if it does not exist.
+    max_size : int
+        Maximum total size of cache files in bytes.
+
+    """
+
+    def __init__(self, directory, max_size=2 ** 30):
+        self._directory = directory
+        self._max_size = max_size
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    def get_key(self, arrays, values):
+        """Return hash of arrays and scalar values"""
+        sha1 = hashlib.sha1()
+        for array in arrays:
+            _array = np.ascontiguousarray(array)
+            sha1.update(("%s%s" % (_array.dtype.str,
+                                   _array.shape)).encode('utf-8'))
+            sha1.update(_array.tobytes())
+        for value in values:
+            sha1.update(repr(value).encode('utf-8'))
+        return sha1.hexdigest()
+
+    def load(self, key):
+        """Return dict of stored arrays or None if not found"""
+        filename = self._get_filename(key)
+        if not os.path.isfile(filename):
+            return None
+        try:
+            with np.load(filename) as data:
+                dataset = dict([(k, data[k]) for k in data.files])
+        except (IOError, OSError, ValueError):  # Broken file
+            return None
+        os.utime(filename, None)  # Recently used
+        return dataset
+
+    def save(self, key, **arrays):
+        filename = self._get_filename(key)
+        tmp_filename = "%s.%d.tmp" % (filename, os.getpid())
+        with open(tmp_filename, 'wb') as w:
+            np.savez(w, **arrays)
+        getattr(os, 'replace', os.rename)(tmp_filename, filename)
+        self._evict(filename)
+
+    def _get_filename(self, key):
+        return os.path.join(self._directory, "gonze-%s.npz" % key)
+
+    def _evict(self, keep):
+        files = []
+        for name in os.listdir(self._directory):
+            if name.startswith('gonze-') and name.endswith('.npz'):
+                filename = os.path.join(self._directory, name)
+                stat = os.stat(filename)
+                files.append((stat.st_mtime, stat.st_size, filename))
+        total_size = sum([f[1] for f in files])
+        for _, size, filename in sorted(files):
+            if total_size <= self._max_size:
+                break
+            if filename != keep:
+                os.remove(filename)
+                total_size -= size
+
+
 class DynamicalMatrix(object):
     """Dynamical matrix class
 
@@ -102,16 +391,31 @@ class DynamicalMatrix(object):
         dtype='complex128'
         shape=(primitive atoms * 3, primitive atoms * 3)
 
+    phase_factor_cache: PhaseFactorCache or None
+        When this is set, run_batch uses phase factors stored for the
+        q-point set.
+
+    With use_fc_pair_list=True, only non-zero force constants blocks are
+    summed up in the C implementation, which is efficient for short-ranged
+    force constants, e.g., after cutoff_force_constants. The pair list is
+    made when force constants are set, therefore force constants modified
+    in place afterwards are not reflected.
+
     """
 
     def __init__(self,
                  supercell,
                  primitive,
                  force_constants,
-                 decimals=None):
+                 decimals=None,
+                 use_fc_pair_list=False,
+                 phase_factor_cache=None):
         self._scell = supercell
         self._pcell = primitive
         self._decimals = decimals
+        self._use_fc_pair_list = use_fc_pair_list
+        self._fc_pair_list = None
+        self._phase_factor_cache = phase_factor_cache
         self._dynamical_matrix = None
         self._force_constants = None
         self._set_force_constants(force_constants)
@@ -126,10 +430,21 @@ class DynamicalMatrix(object):
             [p2p_map[self._s2p_map[i]] for i in range(len(self._s2p_map))],
             dtype='intc')
         (self._smallest_vectors,
-         self._multiplicity) = primitive.get_smallest_vectors()
+         self._multiplicity) = primitive.compact_smallest_vectors
         # Non analytical term correction
         self._nac = False
 
+    def __getstate__(self):
+        """Return state for pickling without phase factor cache
+
+        Phase factor cache can be large and may be shared with other
+        instances, therefore it is not pickled.
+
+        """
+        state = self.__dict__.copy()
+        state['_phase_factor_cache'] = None
+        return state
+
     def is_nac(self):
         return self._nac
 
@@ -161,8 +476,30 @@ class DynamicalMatrix(object):
         return self.force_constants
 
     def get_shortest_vectors(self):
+        """Return shortest vectors and multiplicities in padded storage
+
+        See Primitive.get_smallest_vectors.
+
+        """
+        return self._pcell.smallest_vectors
+
+    @property
+    def compact_shortest_vectors(self):
+        """Return shortest vectors and multiplicities in compact storage
+
+        See Primitive.compact_smallest_vectors.
+
+        """
         return self._smallest_vectors, self._multiplicity
 
+    @property
+    def phase_factor_cache(self):
+        return self._phase_factor_cache
+
+    @phase_factor_cache.setter
+    def phase_factor_cache(self, phase_factor_cache):
+        self._phase_factor_cache = phase_factor_cache
+
     @property
     def dynamical_matrix(self):
         dm = self._dynamical_matrix
@@ -181,12 +518,112 @@ class DynamicalMatrix(object):
     def set_dynamical_matrix(self, q):
         self._set_dynamical_matrix(q)
 
+    def compute(self, q):
+        """Return dynamical matrix at q without storing it
+
+        Unlike set_dynamical_matrix, the state of the instance is not
+        modified. Therefore this method can be called from multiple threads
+        sharing one instance, and C functions release the GIL while
+        computing.
+
+        Parameters
+        ----------
+        q : array_like
+            q-point in reduced coordinates.
+            dtype='double', shape=(3,)
+
+        Returns
+        -------
+        ndarray
+            Dynamical matrix.
+            dtype='complex128', shape=(bands, bands)
+
+        """
+
+        return self._round(self._get_dynamical_matrix(q))
+
+    def run_batch(self, qpoints):
+        """Calculate dynamical matrices at many q-points at once
+
+        Dynamical matrices are returned but not stored in the instance, i.e.,
+        ``dynamical_matrix`` attribute is unchanged.
+
+        Parameters
+        ----------
+        qpoints : array_like
+            q-points in reduced coordinates.
+            dtype='double', shape=(qpoints, 3)
+
+        Returns
+        -------
+        ndarray
+            Dynamical matrices at the q-points.
+            dtype='complex128', shape=(qpoints, bands, bands)
+
+        """
+
+        _qpoints = np.array(np.reshape(qpoints, (-1, 3)),
+                            dtype='double', order='C')
+        dms = None
+        if self._phase_factor_cache is not None:
+            dms = self._get_dynamical_matrices_by_phase_factors(_qpoints)
+        if dms is None:
+            try:
+                import phonopy._phonopy as phonoc
+                dms = self._get_c_dynamical_matrices(_qpoints)
+            except ImportError:
+                fc = self._force_constants
+                dms = [self._get_py_dynamical_matrix(q, fc) for q in _qpoints]
+                dms = np.array(dms, dtype=self._dtype_complex, order='C')
+
+        return self._round(dms)
+
+    def _round(self, dm):
+        if self._decimals is None:
+            return dm
+        else:
+            return dm.round(decimals=self._decimals)
+
+    def _get_dynamical_matrices_by_phase_factors(self, qpoints):
+        phase_factors, satoms = self._phase_factor_cache.get_phase_factors(
+            qpoints,
+            self._smallest_vectors,
+            self._multiplicity,
+            self._s2pp_map)
+        if phase_factors is None:
+            return None
+
+        fc = self._force_constants
+        num_patom = len(self._p2s_map)
+        num_lattice_points = satoms.shape[1]
+        if fc.shape[0] == fc.shape[1]:
+            patoms = self._p2s_map
+        else:
+            patoms = np.arange(num_patom)
+        # D[i, j, q, (a, b)] = sum_n phase[i, j, q, n] fc[i, j, n, (a, b)]
+        fc_ijn = fc[patoms[:, None, None], satoms[None, :, :]].reshape(
+            num_patom, num_patom, num_lattice_points, 9)
+        dms = np.matmul(phase_factors, fc_ijn).reshape(
+            num_patom, num_patom, len(qpoints), 3, 3)
+        dms = dms.transpose(2, 0, 3, 1, 4).reshape(
+            len(qpoints), num_patom * 3, num_patom * 3)
+        sqrt_mass = np.repeat(np.sqrt(self._pcell.get_masses()), 3)
+        dms /= np.outer(sqrt_mass, sqrt_mass)
+        dms = (dms + dms.conj().transpose(0, 2, 1)) / 2
+        return np.array(dms, dtype=self._dtype_complex, order='C')
+
     def _set_dynamical_matrix(self, q):
+        self._dynamical_matrix = self._get_dynamical_matrix(q)
+
+    def _get_dynamical_matrix(self, q, fc=None):
+        """Return dynamical matrix of fc (default self.force_constants)"""
+        if fc is None:
+            fc = self._force_constants
         try:
             import phonopy._phonopy as phonoc
-            self._set_c_dynamical_matrix(q)
+            return self._get_c_dynamical_matrix(q, fc)
         except ImportError:
-            self._set_py_dynamical_matrix(q)
+            return self._get_py_dynamical_matrix(q, fc)
 
     def _set_force_constants(self, fc):
         if (type(fc) is np.ndarray and
@@ -197,16 +634,20 @@ class DynamicalMatrix(object):
             self._force_constants = fc
         else:
             self._force_constants = np.array(fc, dtype='double', order='C')
+        self._fc_pair_list = self._make_fc_pair_list(self._force_constants)
 
-    def _set_c_dynamical_matrix(self, q):
+    def _get_c_dynamical_matrix(self, q, fc):
         import phonopy._phonopy as phonoc
 
-        fc = self._force_constants
+        if self._use_fc_pair_list:
+            return self._get_c_dynamical_matrices_fc_pairs(
+                np.array([q], dtype='double'), fc=fc)[0]
+
         vectors = self._smallest_vectors
         mass = self._pcell.get_masses()
         multiplicity = self._multiplicity
         size_prim = len(mass)
-        itemsize = self._force_constants.itemsize
+        itemsize = fc.itemsize
         dm = np.zeros((size_prim * 3, size_prim * 3),
                       dtype=("c%d" % (itemsize * 2)))
 
@@ -238,10 +679,70 @@ class DynamicalMatrix(object):
         #   dm_double = dm.view(dtype='double').reshape(size_prim * 3,
         #                                               size_prim * 3, 2)
         #   dm = dm_double[:, :, 0] + 1j * dm_double[:, :, 1]
-        self._dynamical_matrix = dm
+        return dm
 
-    def _set_py_dynamical_matrix(self, q):
-        fc = self._force_constants
+    def _get_c_dynamical_matrices(self, qpoints, fc=None):
+        import phonopy._phonopy as phonoc
+
+        if self._use_fc_pair_list:
+            return self._get_c_dynamical_matrices_fc_pairs(qpoints, fc=fc)
+
+        if fc is None:
+            fc = self._force_constants
+        mass = self._pcell.get_masses()
+        size_prim = len(mass)
+        dms = np.zeros((len(qpoints), size_prim * 3, size_prim * 3),
+                       dtype=self._dtype_complex, order='C')
+
+        if fc.shape[0] == fc.shape[1]:  # full FC
+            s2p_map = self._s2p_map
+            p2s_map = self._p2s_map
+        else:
+            s2p_map = self._s2pp_map
+            p2s_map = np.arange(len(self._p2s_map), dtype='intc')
+
+        phonoc.dynamical_matrices(dms.view(dtype='double'),
+                                  fc,
+                                  qpoints,
+                                  self._smallest_vectors,
+                                  self._multiplicity,
+                                  mass,
+                                  s2p_map,
+                                  p2s_map)
+        return dms
+
+    def _get_c_dynamical_matrices_fc_pairs(self, qpoints, fc=None):
+        import phonopy._phonopy as phonoc
+
+        pair_ptr, pair_satoms, fc_pairs = self._get_fc_pair_list(fc)
+        mass = np.array(self._pcell.get_masses(), dtype='double')
+        size_prim = len(mass)
+        dms = np.zeros((len(qpoints), size_prim * 3, size_prim * 3),
+                       dtype=self._dtype_complex, order='C')
+        phonoc.dynamical_matrices_fc_pairs(dms.view(dtype='double'),
+                                           fc_pairs,
+                                           pair_ptr,
+                                           pair_satoms,
+                                           qpoints,
+                                           self._smallest_vectors,
+                                           self._multiplicity,
+                                           mass,
+                                           self._s2pp_map)
+        return dms
+
+    def _make_fc_pair_list(self, fc):
+        if self._use_fc_pair_list and fc is not None:
+            return get_force_constants_pair_list(fc, self._pcell)
+        else:
+            return None
+
+    def _get_fc_pair_list(self, fc):
+        if fc is None or fc is self._force_constants:
+            return self._fc_pair_list
+        else:
+            return get_force_constants_pair_list(fc, self._pcell)
+
+    def _get_py_dynamical_matrix(self, q, fc):
         vecs = self._smallest_vectors
         multiplicity = self._multiplicity
         num_atom = len(self._p2s_map)
@@ -255,10 +756,9 @@ class DynamicalMatrix(object):
                 # Sum in lattice points
                 for k in range(self._scell.get_number_of_atoms()):
                     if s_j == self._s2p_map[k]:
-                        multi = multiplicity[k][i]
+                        multi, adrs = multiplicity[k][i]
                         phase = []
-                        for l in range(multi):
-                            vec = vecs[k][i][l]
+                        for vec in vecs[adrs:(adrs + multi)]:
                             phase.append(np.vdot(vec, q) * 2j * np.pi)
                         phase_factor = np.exp(phase).sum()
                         dm_local += fc[s_i, k] * phase_factor / sqrt_mm / multi
@@ -266,7 +766,7 @@ class DynamicalMatrix(object):
                 dm[(i*3):(i*3+3), (j*3):(j*3+3)] += dm_local
 
         # Impose Hermisian condition
-        self._dynamical_matrix = (dm + dm.conj().transpose()) / 2
+        return (dm + dm.conj().transpose()) / 2
 
 
 # Non analytical term correction (NAC)
@@ -280,13 +780,18 @@ class DynamicalMatrixNAC(DynamicalMatrix):
                  num_G_points=None,  # For Gonze NAC
                  decimals=None,
                  symprec=1e-5,
-                 log_level=0):
+                 log_level=0,
+                 use_fc_pair_list=False,
+                 phase_factor_cache=None,
+                 Gonze_nac_cache=None):
 
         DynamicalMatrix.__init__(self,
                                  supercell,
                                  primitive,
                                  force_constants,
-                                 decimals=decimals)
+                                 decimals=decimals,
+                                 use_fc_pair_list=use_fc_pair_list,
+                                 phase_factor_cache=phase_factor_cache)
 
         self._log_level = log_level
         self._symprec = symprec
@@ -294,6 +799,7 @@ class DynamicalMatrixNAC(DynamicalMatrix):
 
         # For the method by Gonze et al.
         self._Gonze_force_constants = None
+        self._Gonze_fc_pair_list = None
         if num_G_points is None:
             self._num_G_points = 300
         else:
@@ -301,7 +807,10 @@ class DynamicalMatrixNAC(DynamicalMatrix):
         self._G_list = None
         self._G_cutoff = None
         self._Lambda = None  # 4*Lambda**2 is stored.
+        self._Gonze_accuracy = None  # Lambda and G_cutoff are tuned if set.
         self._dd_q0 = None
+        self._Gonze_count = 0
+        self._Gonze_nac_cache = Gonze_nac_cache
 
         self._nac = True
         if nac_params is not None:
@@ -319,6 +828,9 @@ class DynamicalMatrixNAC(DynamicalMatrix):
     def get_nac_method(self):
         return self._method
 
+    def get_symprec(self):
+        return self._symprec
+
     def get_Gonze_nac_dataset(self):
         if self._method == 'gonze':
             return (self._Gonze_force_constants,
@@ -344,6 +856,20 @@ class DynamicalMatrixNAC(DynamicalMatrix):
             self._method = 'gonze'
 
         if self._method == 'gonze':
+            self._set_Gonze_force_constants_array(None)
+            self._Gonze_accuracy = None
+            if ('Lambda' in nac_params and
+                isinstance(nac_params['Lambda'], str) and
+                nac_params['Lambda'] == 'auto'):
+                # Lambda and G_cutoff are chosen in make_Gonze_nac_dataset.
+                if 'accuracy' in nac_params:
+                    self._Gonze_accuracy = nac_params['accuracy']
+                else:
+                    self._Gonze_accuracy = 1e-6
+                self._G_cutoff = None
+                self._Lambda = None
+                return
+
             if 'G_cutoff' in nac_params:
                 self._G_cutoff = nac_params['G_cutoff']
             else:
@@ -357,14 +883,167 @@ class DynamicalMatrixNAC(DynamicalMatrix):
                 self._Lambda = np.sqrt(- GeG / 4 / np.log(exp_cutoff))
 
     def make_Gonze_nac_dataset(self, verbose=False):
-        self._G_list = self._get_G_list(self._G_cutoff)
+        key = None
+        if self._Gonze_nac_cache is not None:
+            key = self._get_Gonze_nac_cache_key()
+            dataset = self._Gonze_nac_cache.load(key)
+            if dataset is not None:
+                self._G_cutoff = float(dataset['G_cutoff'])
+                self._Lambda = float(dataset['Lambda'])
+                self._G_list = dataset['G_list']
+                self._dd_q0 = dataset['dd_q0']
+                self._Gonze_count = 0
+                self._set_Gonze_force_constants_array(
+                    dataset['force_constants'])
+                if verbose:
+                    print("NAC by Gonze et al.: dataset is read from %s." %
+                          self._Gonze_nac_cache.directory)
+                return
+
         if verbose:
             print("NAC by Gonze et al., PRB 50, 13035(R) (1994), "
                   "PRB 55, 10355 (1997):")
+
+        if self._Lambda is None:
+            self.tune_Gonze_parameters(accuracy=self._Gonze_accuracy,
+                                       verbose=verbose)
+        else:
+            self._G_list = self._get_G_list(self._G_cutoff)
+            self._set_Gonze_nac_dataset()
+
+        if verbose:
             print("  G-cutoff distance: %5.2f" % self._G_cutoff)
             print("  Number of G-points: %d" % len(self._G_list))
             print("  Lambda: %6.2f" % self._Lambda)
 
+        if key is not None:
+            self._Gonze_nac_cache.save(
+                key,
+                force_constants=self._Gonze_force_constants,
+                dd_q0=self._dd_q0,
+                G_list=self._G_list,
+                G_cutoff=np.array(self._G_cutoff, dtype='double'),
+                Lambda=np.array(self._Lambda, dtype='double'))
+
+    def tune_Gonze_parameters(self, accuracy=1e-6, qpoints=None,
+                              verbose=False):
+        """Choose Lambda and G-cutoff of NAC by Gonze et al. automatically
+
+        Lambda and G-cutoff are parametrized by a tolerance t. G-cutoff is
+        the length of K=G+q where the Gaussian damping factor
+        exp(-K.eps.K / 4Lambda^2) falls below t. Lambda is the smallest value
+        with which the real space part of the Ewald sum,
+        erfc(2pi Lambda |r| / sqrt(eps_max)), falls below t at half the
+        width of the supercell, since this part is not summed but has to be
+        represented by supercell force constants. Smaller Lambda requires
+        fewer G-vectors.
+
+        Starting from t=accuracy, t is lowered by an order of magnitude
+        until dynamical matrices at the verification q-points agree with
+        those obtained with the next tighter t within the relative
+        accuracy. The dataset with the chosen parameters is set. When the
+        accuracy is not reached after twelve steps, RuntimeWarning is issued
+        and the parameters of the last step are used.
+
+        Parameters
+        ----------
+        accuracy : float, optional
+            Target relative accuracy of dynamical matrices. Default is 1e-6.
+        qpoints : array_like, optional
+            q-points in reduced coordinates where the parameters are
+            verified. Default is None, which uses three general q-points.
+            shape=(qpoints, 3)
+        verbose : bool, optional
+            Tuning steps are printed. Default is False.
+
+        Returns
+        -------
+        tuple
+            Chosen (G_cutoff, Lambda).
+
+        """
+
+        if qpoints is None:
+            qpoints = [[0.1, 0.2, 0.3], [0.37, 0.11, 0.05], [0.5, 0.25, 0]]
+
+        tolerance = accuracy
+        dataset, dms = self._run_Gonze_tuning_step(tolerance, qpoints)
+        if verbose:
+            print("  Lambda and G-cutoff are tuned for accuracy %.1e." %
+                  accuracy)
+        for i in range(12):
+            dataset_ref, dms_ref = self._run_Gonze_tuning_step(
+                tolerance * 0.1, qpoints)
+            diff = np.abs(dms - dms_ref).max() / np.abs(dms_ref).max()
+            if verbose:
+                print("  tolerance %.1e: G-cutoff %5.2f, Lambda %6.3f, "
+                      "%d G-points, difference %.1e" %
+                      (tolerance, dataset[0], dataset[1], len(dataset[2]),
+                       diff))
+            if diff < accuracy:
+                break
+            tolerance *= 0.1
+            dataset, dms = dataset_ref, dms_ref
+        else:
+            warnings.warn(
+                "Lambda and G-cutoff of NAC by Gonze et al. did not reach "
+                "the accuracy %.1e (difference %.1e). G-cutoff %.2f and "
+                "Lambda %.3f are used." %
+                (accuracy, diff, dataset[0], dataset[1]), RuntimeWarning)
+
+        (self._G_cutoff,
+         self._Lambda,
+         self._G_list,
+         self._dd_q0,
+         self._Gonze_force_constants) = dataset
+        self._Gonze_count = 0
+
+        return self._G_cutoff, self._Lambda
+
+    @property
+    def Gonze_accuracy(self):
+        """Target accuracy of tuning Lambda and G-cutoff, otherwise None"""
+        return self._Gonze_accuracy
+
+    @property
+    def Gonze_parameters(self):
+        """G-cutoff and Lambda in use, or None if they are not set yet"""
+        if self._Lambda is None:
+            return None
+        return self._G_cutoff, self._Lambda
+
+    def _run_Gonze_tuning_step(self, tolerance, qpoints):
+        self._G_cutoff, self._Lambda = self._get_Gonze_parameters(tolerance)
+        self._G_list = self._get_G_list(self._G_cutoff)
+        self._set_Gonze_nac_dataset()
+        dms = []
+        for q in qpoints:
+            dm = self._get_dynamical_matrix(q, fc=self._Gonze_force_constants)
+            dm += self._get_Gonze_dipole_dipole(q, None)
+            dms.append(dm)
+        dataset = (self._G_cutoff,
+                   self._Lambda,
+                   self._G_list,
+                   self._dd_q0,
+                   self._Gonze_force_constants)
+        return dataset, np.array(dms)
+
+    def _get_Gonze_parameters(self, tolerance):
+        """Return G_cutoff and Lambda for tolerance of Ewald sum
+
+        See tune_Gonze_parameters.
+
+        """
+
+        eps = np.linalg.eigvalsh((self._dielectric + self._dielectric.T) / 2)
+        rec_lat = np.linalg.inv(self._scell.get_cell())  # column vectors
+        half_width = 0.5 / np.linalg.norm(rec_lat, axis=0).max()
+        Lambda = (_inverse_erfc(tolerance) * np.sqrt(eps.max()) /
+                  (2 * np.pi * half_width))
+        G_cutoff = 2 * Lambda * np.sqrt(-np.log(tolerance) / eps.min())
+        return G_cutoff, Lambda
+
+    def _set_Gonze_nac_dataset(self):
         try:
             import phonopy._phonopy as phonoc
             self._set_c_dipole_dipole_q0()
@@ -373,10 +1052,51 @@ class DynamicalMatrixNAC(DynamicalMatrix):
                   "implemented.")
             sys.exit(1)
 
-        self._set_Gonze_force_constants()
         self._Gonze_count = 0
+        self._set_Gonze_force_constants()
+
+    @property
+    def Gonze_nac_cache(self):
+        return self._Gonze_nac_cache
+
+    @Gonze_nac_cache.setter
+    def Gonze_nac_cache(self, Gonze_nac_cache):
+        self._Gonze_nac_cache = Gonze_nac_cache
+
+    def _get_Gonze_nac_cache_key(self):
+        arrays = [self._force_constants,
+                  self._born,
+                  self._dielectric,
+                  self._pcell.get_cell(),
+                  self._pcell.get_scaled_positions(),
+                  self._pcell.get_masses(),
+                  self._scell.get_cell(),
+                  self._scell.get_scaled_positions(),
+                  self._p2s_map,
+                  self._s2p_map]
+        values = [self._G_cutoff,
+                  self._Lambda,
+                  self._Gonze_accuracy,
+                  self._unit_conversion,
+                  self._symprec]
+        return self._Gonze_nac_cache.get_key(arrays, values)
 
     def set_dynamical_matrix(self, q_red, q_direction=None):
+        self._dynamical_matrix = self._get_nac_dynamical_matrix(q_red,
+                                                                q_direction)
+
+    def compute(self, q_red, q_direction=None):
+        """Return dynamical matrix with NAC at q without storing it
+
+        See DynamicalMatrix.compute. For the method by Gonze et al., the
+        dataset is made at the first call unless make_Gonze_nac_dataset has
+        been called. Threads racing for it compute the same dataset.
+
+        """
+
+        return self._round(self._get_nac_dynamical_matrix(q_red, q_direction))
+
+    def _get_nac_dynamical_matrix(self, q_red, q_direction):
         rec_lat = np.linalg.inv(self._pcell.get_cell())  # column vectors
         if q_direction is None:
             q_norm = np.linalg.norm(np.dot(q_red, rec_lat.T))
@@ -384,17 +1104,56 @@ class DynamicalMatrixNAC(DynamicalMatrix):
             q_norm = np.linalg.norm(np.dot(q_direction, rec_lat.T))
 
         if q_norm < self._symprec:
-            self._set_dynamical_matrix(q_red)
-            return False
+            return self._get_dynamical_matrix(q_red)
 
         if self._method == 'wang':
-            self._set_Wang_dynamical_matrix(q_red, q_direction)
+            return self._get_Wang_dynamical_matrix(q_red, q_direction)
         else:
             if self._Gonze_force_constants is None:
                 self.make_Gonze_nac_dataset(self._log_level)
-            self._set_Gonze_dynamical_matrix(q_red, q_direction)
+            return self._get_Gonze_dynamical_matrix(q_red, q_direction)
+
+    def run_batch(self, qpoints, q_direction=None):
+        """Calculate dynamical matrices with NAC at many q-points
+
+        See DynamicalMatrix.run_batch. q_direction is used only for q-points
+        at Gamma point.
+
+        """
+
+        _qpoints = np.array(np.reshape(qpoints, (-1, 3)),
+                            dtype='double', order='C')
+        num_band = self.get_dimension()
+        dms = np.zeros((len(_qpoints), num_band, num_band),
+                       dtype=self._dtype_complex, order='C')
 
-    def _set_Wang_dynamical_matrix(self, q_red, q_direction):
+        # Dipole-dipole terms of Gonze-NAC are computed at once for
+        # q-points except for Gamma point.
+        indices = []
+        if self._method == 'gonze':
+            try:
+                import phonopy._phonopy as phonoc
+                rec_lat = np.linalg.inv(self._pcell.get_cell())
+                q_norms = np.linalg.norm(np.dot(_qpoints, rec_lat.T), axis=1)
+                indices = np.where(q_norms > self._symprec)[0]
+            except ImportError:
+                pass
+        if len(indices) > 0:
+            dms[indices] = self._round(
+                self._get_c_Gonze_dynamical_matrices(_qpoints[indices]))
+
+        is_done = np.zeros(len(_qpoints), dtype=bool)
+        is_done[indices] = True
+        for i, q in enumerate(_qpoints):
+            if is_done[i]:
+                continue
+            if q_direction is not None and (np.abs(q) < 1e-5).all():
+                dms[i] = self.compute(q, q_direction=q_direction)
+            else:
+                dms[i] = self.compute(q)
+        return dms
+
+    def _get_Wang_dynamical_matrix(self, q_red, q_direction):
         # Wang method (J. Phys.: Condens. Matter 22 (2010) 202201)
         rec_lat = np.linalg.inv(self._pcell.get_cell())  # column vectors
         if q_direction is None:
@@ -408,16 +1167,11 @@ class DynamicalMatrixNAC(DynamicalMatrix):
                                              self._unit_conversion)
         try:
             import phonopy._phonopy as phonoc
-            self._set_c_Wang_dynamical_matrix(q_red, q, constant)
+            return self._get_c_Wang_dynamical_matrix(q_red, q, constant)
         except ImportError:
-            num_atom = self._pcell.get_number_of_atoms()
-            fc_backup = self._force_constants.copy()
-            nac_q = self._get_charge_sum(num_atom, q, self._born) * constant
-            self._set_py_Wang_force_constants(self._force_constants, nac_q)
-            self._set_dynamical_matrix(q_red)
-            self._force_constants = fc_backup
-
-    def _set_c_Wang_dynamical_matrix(self, q_red, q, factor):
+            return self._get_py_Wang_dynamical_matrix(q_red, q, constant)
+
+    def _get_c_Wang_dynamical_matrix(self, q_red, q, factor):
         import phonopy._phonopy as phonoc
 
         fc = self._force_constants
@@ -455,33 +1209,102 @@ class DynamicalMatrixNAC(DynamicalMatrix):
                                         self._born,
                                         factor)
 
-        self._dynamical_matrix = dm
-
-    def _set_py_Wang_force_constants(self, fc, nac_q):
-        N = (self._scell.get_number_of_atoms() //
-             self._pcell.get_number_of_atoms())
-        for s1 in range(self._scell.get_number_of_atoms()):
-            # This if-statement is the trick.
-            # In contructing dynamical matrix in phonopy
-            # fc of left indices with s1 == self._s2p_map[ s1 ] are
-            # only used.
-            if s1 != self._s2p_map[s1]:
-                continue
-            p1 = self._s2pp_map[s1]
-            for s2 in range(self._scell.get_number_of_atoms()):
-                p2 = self._s2pp_map[s2]
-                fc[s1, s2] += nac_q[p1, p2] / N
+        return dm
+
+    def _get_py_Wang_dynamical_matrix(self, q_red, q, factor):
+        """Return D(q) of force constants plus NAC term of Wang et al.
+
+        Adding nac_q[p1, p2] / N to all the supercell force constants
+        between atoms p1 and p2 is equivalent to adding nac_q[p1, p2] times
+        the lattice sum of the phase factors averaged over N lattice points
+        to D(q). Therefore force constants are not modified.
+
+        """
 
-    def _set_Gonze_dynamical_matrix(self, q_red, q_direction):
+        num_atom = self._pcell.get_number_of_atoms()
+        nac_q = self._get_charge_sum(num_atom, q, self._born) * factor
+        sqrt_mass = np.sqrt(self._pcell.get_masses())
+        coef = (self._get_py_lattice_phase_sums(q_red) /
+                np.outer(sqrt_mass, sqrt_mass))
+        dm_nac = nac_q * coef[:, :, None, None]
+        dm_nac = dm_nac.transpose(0, 2, 1, 3).reshape(num_atom * 3,
+                                                      num_atom * 3)
+        dm = self._get_dynamical_matrix(q_red)
+        dm += (dm_nac + dm_nac.conj().T) / 2
+        return dm
+
+    def _get_py_lattice_phase_sums(self, q_red):
+        """Return phase factors summed over lattice points divided by N
+
+        Returns
+        -------
+        ndarray
+            Sum of exp(2pi i q.(r_j + l - r_i)) over lattice points l,
+            divided by the number of lattice points in supercell, where
+            shortest vectors and their multiplicities are considered as in
+            dynamical matrix.
+            dtype='complex128', shape=(num_patom, num_patom)
+
+        """
+
+        num_patom = len(self._p2s_map)
+        num_satom = len(self._s2p_map)
+        multi = self._multiplicity[:, :, 0]
+        adrs = self._multiplicity[:, :, 1]
+        phases = np.exp(2j * np.pi * np.dot(self._smallest_vectors, q_red))
+        phase_cumsum = np.concatenate(([0], np.cumsum(phases)))
+        # [num_satom, num_patom]
+        phase_sums = (phase_cumsum[adrs + multi] - phase_cumsum[adrs]) / multi
+        lattice_phase_sums = np.zeros((num_patom, num_patom),
+                                      dtype=self._dtype_complex)
+        for j in range(num_patom):
+            lattice_phase_sums[:, j] = phase_sums[self._s2pp_map == j].sum(
+                axis=0)
+        lattice_phase_sums *= float(num_patom) / num_satom
+        return lattice_phase_sums
+
+    def _get_Gonze_dynamical_matrix(self, q_red, q_direction):
         if self._log_level > 2:
             print("%d %s" % (self._Gonze_count + 1, q_red))
         self._Gonze_count += 1
-        fc = self._force_constants
-        self._force_constants = self._Gonze_force_constants
-        self._set_dynamical_matrix(q_red)
-        self._force_constants = fc
+        dm = self._get_dynamical_matrix(q_red,
+                                        fc=self._Gonze_force_constants)
         dm_dd = self._get_Gonze_dipole_dipole(q_red, q_direction)
-        self._dynamical_matrix += dm_dd
+        dm += dm_dd
+        return dm
+
+    def _get_c_Gonze_dynamical_matrices(self, qpoints):
+        import phonopy._phonopy as phonoc
+
+        if self._Gonze_force_constants is None:
+            self.make_Gonze_nac_dataset(self._log_level)
+        self._Gonze_count += len(qpoints)
+        dms = self._get_c_dynamical_matrices(
+            qpoints, fc=self._Gonze_force_constants)
+
+        pos = self._pcell.get_positions()
+        num_atom = len(pos)
+        rec_lat = np.linalg.inv(self._pcell.get_cell())  # column vectors
+        # q-point by q-point to give bitwise the same values as compute
+        q_cart = np.array([np.dot(q, rec_lat.T) for q in qpoints],
+                          dtype='double', order='C')
+        volume = self._pcell.get_volume()
+        dd = np.zeros((len(qpoints), num_atom * 3, num_atom * 3),
+                      dtype=self._dtype_complex, order='C')
+        phonoc.dipole_dipoles(dd.view(dtype='double'),
+                              self._dd_q0.view(dtype='double'),
+                              self._G_list,
+                              q_cart,
+                              self._born,
+                              self._dielectric,
+                              np.array(pos, dtype='double', order='C'),
+                              np.array(self._pcell.get_masses(),
+                                       dtype='double'),
+                              self._unit_conversion * 4.0 * np.pi / volume,
+                              self._Lambda,
+                              self._symprec)
+        dms += dd
+        return dms
 
     def _set_Gonze_force_constants(self):
         fc_shape = self._force_constants.shape
@@ -493,13 +1316,23 @@ class DynamicalMatrixNAC(DynamicalMatrix):
         for i, q_red in enumerate(d2f.commensurate_points):
             if self._log_level > 2:
                 print("%d/%d %s" % (i + 1, num_q, q_red))
-            self._set_dynamical_matrix(q_red)
+            dm = self._get_dynamical_matrix(q_red)
             dm_dd = self._get_Gonze_dipole_dipole(q_red, None)
-            self._dynamical_matrix -= dm_dd
-            dynmat.append(self._dynamical_matrix)
+            dm -= dm_dd
+            dynmat.append(dm)
         d2f.dynamical_matrices = dynmat
         d2f.run()
-        self._Gonze_force_constants = d2f.force_constants
+        self._set_Gonze_force_constants_array(d2f.force_constants)
+
+    def _set_Gonze_force_constants_array(self, fc):
+        self._Gonze_force_constants = fc
+        self._Gonze_fc_pair_list = self._make_fc_pair_list(fc)
+
+    def _get_fc_pair_list(self, fc):
+        if fc is not None and fc is self._Gonze_force_constants:
+            return self._Gonze_fc_pair_list
+        else:
+            return DynamicalMatrix._get_fc_pair_list(self, fc)
 
     def _get_Gonze_dipole_dipole(self, q_red, q_direction):
         rec_lat = np.linalg.inv(self._pcell.get_cell())  # column vectors
@@ -528,13 +1361,8 @@ class DynamicalMatrixNAC(DynamicalMatrix):
         #     for j in range(num_atom):
         #         C[i, :, j, :] *= phase_factor[j] / np.sqrt(mass[i] * mass[j])
 
-        # Mass weighted
-        mass = self._pcell.get_masses()
+        # C is mass weighted in C.
         num_atom = self._pcell.get_number_of_atoms()
-        for i in range(num_atom):
-            for j in range(num_atom):
-                C[i, :, j, :] *= 1.0 / np.sqrt(mass[i] * mass[j])
-
         C_dd = C.reshape(num_atom * 3, num_atom * 3)
 
         return C_dd
@@ -556,6 +1384,8 @@ class DynamicalMatrixNAC(DynamicalMatrix):
                              self._born,
                              self._dielectric,
                              np.array(pos, dtype='double', order='C'),
+                             np.array(self._pcell.get_masses(),
+                                      dtype='double'),
                              self._unit_conversion * 4.0 * np.pi / volume,
                              self._Lambda,
                              self._symprec)
@@ -629,31 +1459,14 @@ class DynamicalMatrixNAC(DynamicalMatrix):
 
         return C
 
-    def _get_G_list(self, G_cutoff, g_rad=100):
+    def _get_G_list(self, G_cutoff):
         rec_lat = np.linalg.inv(self._pcell.get_cell())  # column vectors
-        # g_rad must be greater than 0 for broadcasting.
-        n = g_rad * 2 + 1
-        G = np.zeros((n ** 3, 3), dtype='double', order='C')
-        pts = np.arange(-g_rad, g_rad + 1)
-        grid = np.meshgrid(pts, pts, pts)
-        for i in range(3):
-            G[:, i] = grid[i].ravel()
-        grid = None
-        del grid
-        G_vec_list = np.dot(G, rec_lat.T)
-        G = None
-        del G
-        G_norm2 = ((G_vec_list) ** 2).sum(axis=1)
-        return np.array(G_vec_list[G_norm2 < G_cutoff ** 2],
-                        dtype='double', order='C')
+        return get_G_list(rec_lat, G_cutoff)
 
     def _get_charge_sum(self, num_atom, q, born):
-        nac_q = np.zeros((num_atom, num_atom, 3, 3), dtype='double', order='C')
         A = np.dot(q, born)
-        for i in range(num_atom):
-            for j in range(num_atom):
-                nac_q[i, j] = np.outer(A[i], A[j])
-        return nac_q
+        return np.array(np.einsum('ia,jb->ijab', A, A),
+                        dtype='double', order='C')
 
     def _get_constant_factor(self, q, dielectric, volume, unit_conversion):
         return (unit_conversion * 4.0 * np.pi / volume /
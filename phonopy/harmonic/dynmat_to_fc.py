@@ -223,7 +223,7 @@ class DynmatToForceConstants(object):
         else:
             self._commensurate_points = commensurate_points
         (self._shortest_vectors,
-         self._multiplicity) = primitive.get_smallest_vectors()
+         self._multiplicity) = primitive.compact_smallest_vectors
         self._dynmat = None
         n_s = self._supercell.get_number_of_atoms()
         n_p = self._primitive.get_number_of_atoms()
@@ -352,8 +352,8 @@ class DynmatToForceConstants(object):
                     self._fc[p_i, s_j] = fc_elem
 
     def _sum_q(self, p_i, s_j, p_j):
-        multi = self._multiplicity[s_j, p_i]
-        pos = self._shortest_vectors[s_j, p_i, :multi]
+        multi, adrs = self._multiplicity[s_j, p_i]
+        pos = self._shortest_vectors[adrs:(adrs + multi)]
         sum_q = np.zeros((3, 3), dtype=self._dtype_complex, order='C')
         phases = -2j * np.pi * np.dot(self._commensurate_points, pos.T)
         phase_factors = np.exp(phases).sum(axis=1) / multi
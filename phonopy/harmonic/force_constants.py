@@ -120,16 +120,19 @@ def cutoff_force_constants(force_constants,
                            symprec=1e-5):
     fc_shape = force_constants.shape
     if fc_shape[0] == fc_shape[1]:
-        svecs, _ = get_smallest_vectors(supercell.get_cell(),
-                                        supercell.get_scaled_positions(),
-                                        supercell.get_scaled_positions(),
-                                        symprec=symprec)
+        svecs, multi = get_smallest_vectors(supercell.get_cell(),
+                                            supercell.get_scaled_positions(),
+                                            supercell.get_scaled_positions(),
+                                            symprec=symprec,
+                                            store_compact_svecs=True)
         min_distances = np.sqrt(np.sum(
-            np.dot(svecs[:, :, 0, :], supercell.get_cell()) ** 2, axis=-1))
+            np.dot(svecs[multi[:, :, 1]], supercell.get_cell()) ** 2,
+            axis=-1))
     else:
-        svecs, _ = primitive.get_smallest_vectors()
+        svecs, multi = primitive.compact_smallest_vectors
         min_distances = np.sqrt(np.sum(
-            np.dot(svecs[:, :, 0, :], primitive.get_cell()) ** 2, axis=-1))
+            np.dot(svecs[multi[:, :, 1]], primitive.get_cell()) ** 2,
+            axis=-1))
 
     for i in range(fc_shape[0]):
         for j in range(fc_shape[1]):
@@ -137,6 +140,58 @@ def cutoff_force_constants(force_constants,
                 force_constants[i, j] = 0.0
 
 
+def get_force_constants_pair_list(force_constants, primitive, tolerance=0):
+    """Collect non-zero force constants blocks as a pair list
+
+    Only the 3x3 blocks of (primitive atom, supercell atom) pairs having any
+    element larger than tolerance in absolute value are kept. This is useful
+    when force constants are short-ranged, e.g., after
+    cutoff_force_constants.
+
+    Parameters
+    ----------
+    force_constants : ndarray
+        Full or compact force constants.
+        dtype='double'
+        shape=(supercell atoms, supercell atoms, 3, 3) for full array
+        shape=(primitive atoms, supercell atoms, 3, 3) for compact array
+    primitive : Primitive
+        Primitive cell.
+    tolerance : float, optional
+        Blocks whose elements are all within this tolerance from zero are
+        dropped. Default is 0.
+
+    Returns
+    -------
+    pair_ptr : ndarray
+        Blocks of primitive atom i are fc_pairs[pair_ptr[i]:pair_ptr[i + 1]].
+        dtype='intc'
+        shape=(primitive atoms + 1,)
+    pair_satoms : ndarray
+        Supercell atom indices of blocks.
+        dtype='intc'
+        shape=(num_pairs,)
+    fc_pairs : ndarray
+        Force constants blocks.
+        dtype='double'
+        shape=(num_pairs, 3, 3)
+
+    """
+
+    fc_shape = force_constants.shape
+    if fc_shape[0] == fc_shape[1]:
+        fc_p = force_constants[primitive.p2s_map]
+    else:
+        fc_p = force_constants
+    is_nonzero = (np.abs(fc_p) > tolerance).any(axis=(2, 3))
+    pair_ptr = np.zeros(len(fc_p) + 1, dtype='intc')
+    pair_ptr[1:] = np.cumsum(is_nonzero.sum(axis=1))
+    pair_patoms, pair_satoms = np.nonzero(is_nonzero)
+    fc_pairs = np.array(fc_p[pair_patoms, pair_satoms],
+                        dtype='double', order='C')
+    return pair_ptr, np.array(pair_satoms, dtype='intc'), fc_pairs
+
+
 def symmetrize_force_constants(force_constants, level=1):
     """Symmetry force constants by translational and permutation symmetries
 
@@ -496,7 +551,7 @@ def rotational_invariance(force_constants,
     fc = force_constants
     p2s = primitive.get_primitive_to_supercell_map()
 
-    smallest_vectors, multiplicity = primitive.get_smallest_vectors()
+    smallest_vectors, multiplicity = primitive.compact_smallest_vectors
 
     abc = "xyz"
 
@@ -504,8 +559,8 @@ def rotational_invariance(force_constants,
         for i in range(3):
             mat = np.zeros((3, 3), dtype='double')
             for s in range(supercell.get_number_of_atoms()):
-                m = multiplicity[s, pi]
-                vecs = smallest_vectors[s, pi, :m]
+                m, adrs = multiplicity[s, pi]
+                vecs = smallest_vectors[adrs:(adrs + m)]
                 v = np.dot(vecs.sum(axis=0) / m, primitive.get_cell())
                 for j in range(3):
                     for k in range(3):
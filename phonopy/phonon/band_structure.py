@@ -35,6 +35,7 @@
 import warnings
 import numpy as np
 from phonopy.units import VaspToTHz
+from phonopy.phonon.solver import get_phonons_at_qpoints, get_phonon_dtypes
 
 
 def estimate_band_connection(prev_eigvecs, eigvecs, prev_band_order):
@@ -321,7 +322,9 @@ class BandStructure(object):
                  path_connections=None,
                  labels=None,
                  is_legacy_plot=False,
-                 factor=VaspToTHz):
+                 factor=VaspToTHz,
+                 use_lapack_solver=False,
+                 precision='double'):
         """
 
         Parameters
@@ -351,6 +354,12 @@ class BandStructure(object):
             to (2 - np.array(path_connections)).sum().
         is_legacy_plot: bool, optional
             This makes the old style band structure plot. Default is False.
+        use_lapack_solver : bool, optional
+            Dynamical matrices are built and diagonalized by the C/LAPACK
+            phonon solver if it is compiled. Default is False.
+        precision : str, optional
+            'double' or 'single'. With 'single', phonons are solved and
+            stored in single precision. Default is 'double'.
 
         """
 
@@ -363,6 +372,8 @@ class BandStructure(object):
         if is_band_connection:
             self._with_eigenvectors = True
         self._group_velocity = group_velocity
+        self._use_lapack_solver = use_lapack_solver
+        self._dtypes = get_phonon_dtypes(precision)
 
         self._paths = [np.array(path) for path in paths]
         self._is_legacy_plot = is_legacy_plot
@@ -662,13 +673,35 @@ class BandStructure(object):
         self._set_frequencies()
 
     def _solve_dm_on_path(self, path):
-        is_nac = self._dynamical_matrix.is_nac()
         distances_on_path = []
         eigvals_on_path = []
         eigvecs_on_path = []
         gv_on_path = []
 
-        if self._group_velocity is not None:
+        # Eigenvectors are also used for group velocities.
+        is_gv_reusable = (self._group_velocity is not None and
+                          self._is_phonons_reusable(path))
+        with_eigenvectors = self._with_eigenvectors or is_gv_reusable
+
+        if self._use_lapack_solver or self._dtypes[0] != 'double':
+            eigvals_all, eigvecs_all = self._solve_phonons_on_path(
+                path, with_eigenvectors)
+        else:
+            dms = self._get_dynamical_matrices_on_path(path)
+            if with_eigenvectors:
+                eigvals_all, eigvecs_all = np.linalg.eigh(dms)
+            else:
+                eigvals_all = np.linalg.eigvalsh(dms)
+            eigvals_all = eigvals_all.real
+
+        if is_gv_reusable:
+            self._group_velocity.set_q_points(
+                path,
+                frequencies=(np.sqrt(abs(eigvals_all)) * np.sign(eigvals_all)
+                             * self._factor),
+                eigenvectors=eigvecs_all)
+            gv = self._group_velocity.get_group_velocity()
+        elif self._group_velocity is not None:
             self._group_velocity.set_q_points(path)
             gv = self._group_velocity.get_group_velocity()
 
@@ -676,21 +709,9 @@ class BandStructure(object):
             self._shift_point(q)
             distances_on_path.append(self._distance)
 
-            if is_nac:
-                q_direction = None
-                if (np.abs(q) < 0.0001).all():  # For Gamma point
-                    q_direction = path[0] - path[-1]
-                self._dynamical_matrix.set_dynamical_matrix(
-                    q, q_direction=q_direction)
-            else:
-                self._dynamical_matrix.set_dynamical_matrix(q)
-            dm = self._dynamical_matrix.get_dynamical_matrix()
-
+            eigvals = eigvals_all[i]
             if self._with_eigenvectors:
-                eigvals, eigvecs = np.linalg.eigh(dm)
-                eigvals = eigvals.real
-            else:
-                eigvals = np.linalg.eigvalsh(dm).real
+                eigvecs = eigvecs_all[i]
 
             if self._is_band_connection:
                 if i == 0:
@@ -714,6 +735,40 @@ class BandStructure(object):
 
         return distances_on_path, eigvals_on_path, eigvecs_on_path, gv_on_path
 
+    def _is_phonons_reusable(self, path):
+        # At Gamma point with NAC, phonons are solved with q-direction along
+        # the path but group velocities are not. So they are solved again
+        # for group velocities.
+        if self._dtypes[0] != 'double':
+            return False
+        if self._dynamical_matrix.is_nac():
+            return not (np.abs(path) < 0.0001).all(axis=1).any()
+        return True
+
+    def _solve_phonons_on_path(self, path, with_eigenvectors):
+        num_band = self._cell.get_number_of_atoms() * 3
+        freqs = np.zeros((len(path), num_band), dtype=self._dtypes[0])
+        if with_eigenvectors:
+            eigvecs = np.zeros((len(path), num_band, num_band),
+                               dtype=self._dtypes[1])
+        else:
+            eigvecs = None
+        get_phonons_at_qpoints(freqs,
+                               eigvecs,
+                               self._dynamical_matrix,
+                               np.array(path, dtype='double'),
+                               1.0,
+                               nac_q_direction=(path[0] - path[-1]))
+        return freqs ** 2 * np.sign(freqs), eigvecs
+
+    def _get_dynamical_matrices_on_path(self, path):
+        if self._dynamical_matrix.is_nac():
+            # q-direction is used only at Gamma point.
+            return self._dynamical_matrix.run_batch(
+                path, q_direction=(path[0] - path[-1]))
+        else:
+            return self._dynamical_matrix.run_batch(path)
+
     def _set_frequencies(self):
         frequencies = []
         for eigs_path in self._eigenvalues:
@@ -86,6 +86,111 @@ def rotate_eigenvectors(eigvals, eigvecs, dD):
     return rot_eigvecs, eigvals_dD
 
 
+def rotate_eigenvectors_at_qpoints(eigvals, eigvecs, dDs, cutoff=1e-4):
+    """Rotate eigenvectors in degenerate subspaces at many q-points
+
+    This is the batched version of rotate_eigenvectors. Degenerate sets of
+    all q-points are collected and grouped by their sizes, and eigenvalue
+    problems of the perturbation in the subspaces of the same size are
+    solved by one call of numpy.linalg.eigh.
+
+    Parameters
+    ----------
+    eigvals : ndarray
+        Values used to find degeneracy, e.g., eigenvalues or frequencies.
+        dtype='double', shape=(qpoints, bands)
+    eigvecs : ndarray
+        Eigenvectors at q-points.
+        dtype='complex128', shape=(qpoints, bands, bands)
+    dDs : ndarray
+        Perturbations to dynamical matrices at q-points.
+        dtype='complex128', shape=(qpoints, bands, bands)
+    cutoff : float, optional
+        Values closer than this are considered degenerate. Default is 1e-4.
+
+    Returns
+    -------
+    rot_eigvecs : ndarray
+        Rotated eigenvectors.
+        dtype='complex128', shape=(qpoints, bands, bands)
+    eigvals_dD : ndarray
+        Diagonal elements of perturbations in rotated eigenvector basis.
+        dtype='double', shape=(qpoints, bands)
+
+    """
+
+    # <e_i|dD|e_j> at all q-points
+    edDe = np.matmul(np.swapaxes(eigvecs, 1, 2).conj(),
+                     np.matmul(dDs, eigvecs))
+    eigvals_dD = np.diagonal(edDe, axis1=1, axis2=2).real.copy()
+    rot_eigvecs = eigvecs.copy()
+    for q_indices, band_indices in get_degenerate_blocks(eigvals, cutoff):
+        if band_indices.shape[1] == 1:
+            continue
+        q_idx = q_indices[:, None]
+        dD_part = edDe[q_idx[:, :, None],
+                       band_indices[:, :, None],
+                       band_indices[:, None, :]]
+        eigvals_dD_part, eigvecs_dD = np.linalg.eigh(dD_part)
+        eigvals_dD[q_idx, band_indices] = eigvals_dD_part
+        eigsets = np.swapaxes(eigvecs[q_idx, :, band_indices], 1, 2)
+        rot_eigvecs[q_idx, :, band_indices] = np.swapaxes(
+            np.matmul(eigsets, eigvecs_dD), 1, 2)
+    return rot_eigvecs, eigvals_dD
+
+
+def get_degenerate_blocks(eigvals, cutoff=1e-4):
+    """Return degenerate sets at many q-points grouped by their sizes
+
+    Degenerate sets are those given by degenerate_sets. For values in
+    ascending order, which is the usual case, they are found at once for
+    all q-points.
+
+    Parameters
+    ----------
+    eigvals : array_like
+        Values used to find degeneracy, e.g., eigenvalues or frequencies.
+        dtype='double', shape=(qpoints, bands)
+    cutoff : float, optional
+        Values closer than this are considered degenerate. Default is 1e-4.
+
+    Returns
+    -------
+    list of tuple
+        (q_indices, band_indices) for each size of degenerate sets.
+        q_indices: dtype=int, shape=(sets,)
+        band_indices: dtype=int, shape=(sets, size)
+
+    """
+
+    _eigvals = np.array(eigvals, dtype='double')
+    num_band = _eigvals.shape[1]
+    diffs = np.diff(_eigvals, axis=1)
+    is_sorted = (diffs >= 0).all(axis=1)
+    q_sorted = np.where(is_sorted)[0]
+    is_start = np.ones((len(q_sorted), num_band), dtype=bool)
+    is_start[:, 1:] = diffs[q_sorted] >= cutoff
+    starts = np.flatnonzero(is_start)
+    sizes = np.diff(np.append(starts, is_start.size))
+
+    blocks = {}
+    for size in np.unique(sizes):
+        starts_size = starts[sizes == size]
+        blocks[int(size)] = [
+            list(q_sorted[starts_size // num_band]),
+            list(starts_size[:, None] % num_band + np.arange(size))]
+    for i in np.where(~is_sorted)[0]:
+        for deg in degenerate_sets(_eigvals[i], cutoff=cutoff):
+            if len(deg) not in blocks:
+                blocks[len(deg)] = [[], []]
+            blocks[len(deg)][0].append(i)
+            blocks[len(deg)][1].append(deg)
+
+    return [(np.array(blocks[size][0], dtype=int),
+             np.array(blocks[size][1], dtype=int).reshape(-1, size))
+            for size in sorted(blocks)]
+
+
 def _get_dD(q, ddm, perturbation):
     ddm.run(q)
     ddm_vals = ddm.get_derivative_of_dynamical_matrix()
@@ -44,6 +44,70 @@ def get_pdos_indices(symmetry):
             for i in symmetry.get_independent_atoms()]
 
 
+def get_projected_weights(eigenvectors,
+                          direction=None,
+                          xyz_projection=False,
+                          dtype='double'):
+    """Return weights of modes for projected DOS
+
+    Parameters
+    ----------
+    eigenvectors : ndarray or h5py.Dataset
+        Phonon eigenvectors. They are read block by block of q-points.
+        shape=(qpoints, bands, bands)
+    direction : array_like, optional
+        Projection direction in Cartesian coordinates. Default is None.
+    xyz_projection : bool, optional
+        Project onto x, y, z of each atom. Default is False, i.e., onto
+        atoms.
+    dtype : str, optional
+        dtype of returned array. Default is 'double'.
+
+    Returns
+    -------
+    ndarray
+        Squared norms of projected eigenvectors.
+        shape=(qpoints, atoms or bands, bands)
+
+    """
+
+    num_qpoints, num_comp, num_band = eigenvectors.shape
+    if xyz_projection:
+        num_proj = num_comp
+    else:
+        num_proj = num_comp // 3
+    weights = np.zeros((num_qpoints, num_proj, num_band), dtype=dtype)
+    chunk_size = max(1, 2 ** 22 // (num_comp * num_band))
+    for i in range(0, num_qpoints, chunk_size):
+        j = min(i + chunk_size, num_qpoints)
+        weights[i:j] = _get_projected_weights(np.array(eigenvectors[i:j]),
+                                              direction,
+                                              xyz_projection)
+    return weights
+
+
+def _get_projected_weights(eigenvectors, direction, xyz_projection):
+    if xyz_projection:
+        return np.abs(eigenvectors) ** 2
+
+    num_atom = eigenvectors.shape[1] // 3
+    i_x = np.arange(num_atom, dtype='int') * 3
+    i_y = np.arange(num_atom, dtype='int') * 3 + 1
+    i_z = np.arange(num_atom, dtype='int') * 3 + 2
+    if direction is None:
+        eigvecs2 = np.abs(eigenvectors[:, i_x, :]) ** 2
+        eigvecs2 += np.abs(eigenvectors[:, i_y, :]) ** 2
+        eigvecs2 += np.abs(eigenvectors[:, i_z, :]) ** 2
+    else:
+        d = np.array(direction, dtype='double')
+        d /= np.linalg.norm(direction)
+        proj_eigvecs = eigenvectors[:, i_x, :] * d[0]
+        proj_eigvecs += eigenvectors[:, i_y, :] * d[1]
+        proj_eigvecs += eigenvectors[:, i_z, :] * d[2]
+        eigvecs2 = np.abs(proj_eigvecs) ** 2
+    return eigvecs2
+
+
 def write_total_dos(frequency_points,
                     total_dos,
                     comment=None,
@@ -167,6 +231,15 @@ class NormalDistribution(object):
         return 1.0 / np.sqrt(2 * np.pi) / self._sigma * \
             np.exp(-x**2 / 2.0 / self._sigma**2)
 
+    def get_grid_spacing(self, tolerance):
+        """Largest grid spacing for linear interpolation within tolerance
+
+        The interpolation error is at most h^2 / 8 * max|f''|, where
+        max|f''| = f(0) / sigma^2, and this is bounded by tolerance * f(0).
+
+        """
+        return self._sigma * np.sqrt(8 * tolerance)
+
 
 class CauchyDistribution(object):
     def __init__(self, gamma):
@@ -175,6 +248,123 @@ class CauchyDistribution(object):
     def calc(self, x):
         return self._gamma / np.pi / (x**2 + self._gamma**2)
 
+    def get_grid_spacing(self, tolerance):
+        """Largest grid spacing for linear interpolation within tolerance
+
+        See NormalDistribution.get_grid_spacing. max|f''| = 2 f(0) / gamma^2.
+
+        """
+        return self._gamma * np.sqrt(4 * tolerance)
+
+
+def run_smearing_method_dos(frequency_points,
+                            frequencies,
+                            weights,
+                            smearing_function,
+                            coef=None,
+                            tolerance=1e-6,
+                            max_grid_size=2 ** 24):
+    """DOS by smearing method computed by convolution with FFT
+
+    Frequencies multiplied by weights are distributed to the two nearest
+    points of a fine uniform grid by linear interpolation. This histogram
+    is convolved with the smearing function sampled on the grid by FFT.
+    The frequency points are chosen as a subset of the grid points.
+
+    The difference from the direct sum over frequencies is at most
+    tolerance times the largest possible value of DOS, i.e., the peak
+    height of the smearing function times the sum of the weights of all
+    modes, apart from rounding errors.
+
+    Parameters
+    ----------
+    frequency_points : ndarray
+        Equally spaced sampling frequencies.
+        dtype='double', shape=(frequency_points,)
+    frequencies : ndarray
+        Phonon frequencies on mesh.
+        shape=(qpoints, bands)
+    weights : ndarray
+        Weights of q-points.
+        shape=(qpoints,)
+    smearing_function : NormalDistribution or CauchyDistribution
+        Smearing function.
+    coef : ndarray, optional
+        Weights of modes for projected DOS. Default is None.
+        shape=(qpoints, projections, bands)
+    tolerance : float, optional
+        See above. Default is 1e-6.
+    max_grid_size : int, optional
+        When the fine grid is larger than this, None is returned.
+
+    Returns
+    -------
+    ndarray or None
+        DOS. None is returned when frequency points are not equally spaced
+        or the fine grid is too large.
+        shape=(frequency_points,) or (projections, frequency_points) with
+        coef.
+
+    """
+
+    f_points = np.array(frequency_points, dtype='double')
+    _frequencies = np.array(frequencies, dtype='double')
+    h_max = smearing_function.get_grid_spacing(tolerance)
+    if len(f_points) > 1:
+        f_delta = (f_points[-1] - f_points[0]) / (len(f_points) - 1)
+        if (f_delta <= 0 or
+            (np.abs(np.diff(f_points) - f_delta) > 1e-8 * f_delta).any()):
+            return None
+        num_sub = int(np.ceil(f_delta / h_max))
+        h = f_delta / num_sub
+    else:
+        num_sub = 1
+        h = h_max
+
+    num_left = max(0, int(np.ceil((f_points[0] - _frequencies.min()) / h)))
+    origin = f_points[0] - num_left * h
+    f_max = max(_frequencies.max(), f_points[-1])
+    num_grid = int(np.ceil((f_max - origin) / h)) + 2
+    if num_grid > max_grid_size:
+        return None
+
+    # Histogram by linear interpolation to the neighboring grid points
+    x = (_frequencies - origin) / h
+    i_left = np.floor(x).astype(int)
+    t = x - i_left
+    w = np.array(weights, dtype='double') / np.sum(weights)
+    if coef is None:
+        num_proj = 1
+    else:
+        num_proj = coef.shape[1]
+    hist = np.zeros((num_proj, num_grid), dtype='double')
+    for i in range(num_proj):
+        # Only one (qpoints, bands) array of mode weights at a time
+        if coef is None:
+            w_q = np.broadcast_to(w[:, None], _frequencies.shape)
+        else:
+            w_q = w[:, None] * coef[:, i]
+        hist[i] += np.bincount(i_left.ravel(), weights=(w_q * (1 - t)).ravel(),
+                               minlength=num_grid)[:num_grid]
+        hist[i] += np.bincount(i_left.ravel() + 1, weights=(w_q * t).ravel(),
+                               minlength=num_grid)[:num_grid]
+
+    # Linear convolution by FFT with zero padding
+    size = 1
+    while size < 2 * num_grid:
+        size *= 2
+    kernel = np.zeros(size, dtype='double')
+    kernel[:num_grid] = smearing_function.calc(np.arange(num_grid) * h)
+    kernel[size - num_grid + 1:] = smearing_function.calc(
+        -np.arange(num_grid - 1, 0, -1) * h)
+    dos = np.fft.irfft(np.fft.rfft(hist, size) * np.fft.rfft(kernel),
+                       size)[:, num_left + np.arange(len(f_points)) * num_sub]
+
+    if coef is None:
+        return dos[0]
+    else:
+        return dos
+
 
 def run_tetrahedron_method_dos(mesh,
                                frequency_points,
@@ -197,11 +387,15 @@ def run_tetrahedron_method_dos(mesh,
         _coef = np.array(coef, dtype='double', order='C')
     arr_shape = frequencies.shape + (len(frequency_points), _coef.shape[1])
     dos = np.zeros(arr_shape, dtype='double')
+    if frequencies.dtype == np.dtype('double'):
+        _frequencies = frequencies
+    else:
+        _frequencies = np.array(frequencies, dtype='double', order='C')
 
     phonoc.tetrahedron_method_dos(dos,
                                   mesh,
                                   frequency_points,
-                                  frequencies,
+                                  _frequencies,
                                   _coef,
                                   grid_address,
                                   grid_mapping_table,
@@ -215,9 +409,13 @@ def run_tetrahedron_method_dos(mesh,
 class Dos(object):
     def __init__(self, mesh_object, sigma=None, use_tetrahedron_method=False):
         self._mesh_object = mesh_object
-        self._frequencies = mesh_object.frequencies
+        self._frequencies = np.asarray(mesh_object.frequencies)
         self._weights = mesh_object.weights
         if use_tetrahedron_method and sigma is None:
+            if not hasattr(mesh_object, 'dynamical_matrix'):
+                msg = ("Tetrahedron method requires Mesh. Use smearing "
+                       "method by giving sigma.")
+                raise RuntimeError(msg)
             self._tetrahedron_mesh = TetrahedronMesh(
                 mesh_object.dynamical_matrix.primitive,
                 self._frequencies,
@@ -230,6 +428,7 @@ class Dos(object):
 
         self._frequency_points = None
         self._sigma = sigma
+        self._smearing_tolerance = 1e-6
         self.set_draw_area()
         self.set_smearing_function('Normal')
 
@@ -251,6 +450,14 @@ class Dos(object):
     def set_sigma(self, sigma):
         self._sigma = sigma
 
+    def set_smearing_tolerance(self, tolerance):
+        """
+        DOS by smearing method is computed by convolution on a fine grid.
+        The error is at most tolerance times the largest possible DOS value.
+        With tolerance=None, DOS is summed directly at each frequency point.
+        """
+        self._smearing_tolerance = tolerance
+
     def set_draw_area(self,
                       freq_min=None,
                       freq_max=None,
@@ -281,6 +488,17 @@ class Dos(object):
                                            f_delta)
 
 
+    def _run_smearing_method_dos(self, coef=None):
+        if self._smearing_tolerance is None:
+            return None
+        return run_smearing_method_dos(self._frequency_points,
+                                       self._frequencies,
+                                       self._weights,
+                                       self._smearing_function,
+                                       coef=coef,
+                                       tolerance=self._smearing_tolerance)
+
+
 class TotalDos(Dos):
     def __init__(self, mesh_object, sigma=None, use_tetrahedron_method=False):
         Dos.__init__(self,
@@ -294,8 +512,11 @@ class TotalDos(Dos):
 
     def run(self):
         if self._tetrahedron_mesh is None:
-            self._dos = np.array([self._get_density_of_states_at_freq(f)
-                                  for f in self._frequency_points])
+            self._dos = self._run_smearing_method_dos()
+            if self._dos is None:
+                self._dos = np.array(
+                    [self._get_density_of_states_at_freq(f)
+                     for f in self._frequency_points])
         else:
             if self._openmp_thm:
                 self._run_tetrahedron_method_dos()
@@ -416,24 +637,14 @@ class PartialDos(Dos):
         self._eigenvectors = self._mesh_object.eigenvectors
         self._partial_dos = None
 
-        if xyz_projection:
-            self._eigvecs2 = np.abs(self._eigenvectors) ** 2
+        if self._eigenvectors is None:
+            self._eigvecs2 = self._get_projected_weights_of_mesh(
+                direction, xyz_projection)
         else:
-            num_atom = self._frequencies.shape[1] // 3
-            i_x = np.arange(num_atom, dtype='int') * 3
-            i_y = np.arange(num_atom, dtype='int') * 3 + 1
-            i_z = np.arange(num_atom, dtype='int') * 3 + 2
-            if direction is None:
-                self._eigvecs2 = np.abs(self._eigenvectors[:, i_x, :]) ** 2
-                self._eigvecs2 += np.abs(self._eigenvectors[:, i_y, :]) ** 2
-                self._eigvecs2 += np.abs(self._eigenvectors[:, i_z, :]) ** 2
-            else:
-                d = np.array(direction, dtype='double')
-                d /= np.linalg.norm(direction)
-                proj_eigvecs = self._eigenvectors[:, i_x, :] * d[0]
-                proj_eigvecs += self._eigenvectors[:, i_y, :] * d[1]
-                proj_eigvecs += self._eigenvectors[:, i_z, :] * d[2]
-                self._eigvecs2 = np.abs(proj_eigvecs) ** 2
+            self._eigvecs2 = get_projected_weights(
+                self._eigenvectors,
+                direction=direction,
+                xyz_projection=xyz_projection)
 
         self._openmp_thm = True
 
@@ -441,6 +652,20 @@ class PartialDos(Dos):
     def partial_dos(self):
         return self._partial_dos
 
+    def _get_projected_weights_of_mesh(self, direction, xyz_projection):
+        """Weights stored by Mesh.run_projected_weights"""
+
+        weights = getattr(self._mesh_object, 'projected_weights', None)
+        if weights is None:
+            msg = ("Eigenvectors or projected weights of mesh are required. "
+                   "See Mesh.run_projected_weights.")
+            raise RuntimeError(msg)
+        if not self._mesh_object.has_projected_weights(
+                direction=direction, xyz_projection=xyz_projection):
+            msg = "Projection of weights stored in mesh is different."
+            raise RuntimeError(msg)
+        return weights
+
     @property
     def projected_dos(self):
         return self._partial_dos
@@ -504,6 +729,10 @@ class PartialDos(Dos):
                           filename=filename)
 
     def _run_smearing_method(self):
+        self._partial_dos = self._run_smearing_method_dos(coef=self._eigvecs2)
+        if self._partial_dos is not None:
+            return
+
         num_pdos = self._eigvecs2.shape[1]
         num_freqs = len(self._frequency_points)
         self._partial_dos = np.zeros((num_pdos, num_freqs), dtype='double')
@@ -32,13 +32,13 @@
 # ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
-import warnings
-import textwrap
 import numpy as np
 from phonopy.units import VaspToTHz
 from phonopy.harmonic.derivative_dynmat import DerivativeOfDynamicalMatrix
 from phonopy.harmonic.force_constants import similarity_transformation
-from phonopy.phonon.degeneracy import degenerate_sets
+from phonopy.phonon.degeneracy import rotate_eigenvectors_at_qpoints
+from phonopy.phonon.solver import get_phonons_at_qpoints
+from phonopy.structure.symmetry import get_little_group_of_q
 
 
 def get_group_velocity(q,  # q-point
@@ -92,12 +92,17 @@ class GroupVelocity(object):
                  q_length=None,
                  symmetry=None,
                  frequency_factor_to_THz=VaspToTHz,
-                 cutoff_frequency=1e-4):
+                 cutoff_frequency=1e-4,
+                 use_lapack_solver=False):
         """
         q_points is a list of sets of q-point and q-direction:
         [[q-point, q-direction], [q-point, q-direction], ...]
 
         q_length is used such as D(q + q_length) - D(q - q_length).
+
+        With use_lapack_solver=True, frequencies and eigenvectors are
+        obtained by the C/LAPACK phonon solver for each block of q-points
+        whose derivatives of dynamical matrices are computed together.
         """
         self._dynmat = dynamical_matrix
         primitive = dynamical_matrix.get_primitive()
@@ -112,8 +117,16 @@ class GroupVelocity(object):
         else:
             self._ddm = None
         self._symmetry = symmetry
+        if symmetry is None:
+            self._reciprocal_rotations_cart = None
+        else:
+            self._reciprocal_rotations_cart = np.array(
+                [similarity_transformation(self._reciprocal_lattice, r)
+                 for r in symmetry.get_reciprocal_operations()],
+                dtype='double', order='C')
         self._factor = frequency_factor_to_THz
         self._cutoff_frequency = cutoff_frequency
+        self._use_lapack_solver = use_lapack_solver
 
         self._directions = np.array([[1, 2, 3],
                                      [1, 0, 0],
@@ -125,7 +138,31 @@ class GroupVelocity(object):
         self._group_velocity = None
         self._perturbation = None
 
-    def set_q_points(self, q_points, perturbation=None):
+    def set_q_points(self, q_points, perturbation=None, frequencies=None,
+                     eigenvectors=None):
+        """Calculate group velocities at q-points
+
+        Parameters
+        ----------
+        q_points : array_like
+            q-points in reduced coordinates.
+            shape=(q_points, 3)
+        perturbation : array_like, optional
+            Direction in reduced coordinates used to resolve degeneracy.
+            With this, group velocities are not symmetrized. Default is None.
+        frequencies : ndarray, optional
+            Phonon frequencies at q_points obtained from the same dynamical
+            matrix and with the same frequency conversion factor. Given with
+            eigenvectors, dynamical matrices at q_points are not solved
+            again. Default is None.
+            dtype='double', shape=(q_points, bands)
+        eigenvectors : ndarray, optional
+            Phonon eigenvectors at q_points corresponding to frequencies.
+            Default is None.
+            dtype='complex128', shape=(q_points, bands, bands)
+
+        """
+
         self._q_points = q_points
         self._perturbation = perturbation
         if perturbation is None:
@@ -134,7 +171,7 @@ class GroupVelocity(object):
             self._directions[0] = np.dot(
                 self._reciprocal_lattice, perturbation)
         self._directions[0] /= np.linalg.norm(self._directions[0])
-        self._set_group_velocity()
+        self._set_group_velocity(frequencies, eigenvectors)
 
     def set_q_length(self, q_length):
         self._q_length = q_length
@@ -145,56 +182,89 @@ class GroupVelocity(object):
     def get_group_velocity(self):
         return self._group_velocity
 
-    def _set_group_velocity(self):
-        gv = [self._set_group_velocity_at_q(q) for q in self._q_points]
-        self._group_velocity = np.array(gv)
-
-    def _set_group_velocity_at_q(self, q):
-        self._dynmat.set_dynamical_matrix(q)
-        dm = self._dynmat.get_dynamical_matrix()
-        eigvals, eigvecs = np.linalg.eigh(dm)
-        eigvals = eigvals.real
-        freqs = np.sqrt(abs(eigvals)) * np.sign(eigvals) * self._factor
-        gv = np.zeros((len(freqs), 3), dtype='double')
-        deg_sets = degenerate_sets(freqs)
-
-        ddms = self._get_dD(np.array(q))
-        pos = 0
-        for deg in deg_sets:
-            gv[pos:pos+len(deg)] = self._perturb_D(ddms, eigvecs[:, deg])
-            pos += len(deg)
-
-        for i, f in enumerate(freqs):
-            if f > self._cutoff_frequency:
-                gv[i, :] *= self._factor ** 2 / f / 2
+    def _set_group_velocity(self, frequencies=None, eigenvectors=None):
+        # Derivatives of dynamical matrices are computed for a block of
+        # q-points at once so that memory usage is bounded.
+        num_band = self._dynmat.get_primitive().get_number_of_atoms() * 3
+        chunk_size = max(
+            1, 2 ** 22 // (len(self._directions) * num_band ** 2))
+        gv = []
+        for i in range(0, len(self._q_points), chunk_size):
+            q_points = self._q_points[i:(i + chunk_size)]
+            if frequencies is None or eigenvectors is None:
+                freqs, eigvecs = self._solve_phonons(q_points)
             else:
-                gv[i, :] = 0
-
-        if self._perturbation is None:
-            return self._symmetrize_group_velocity(gv, q)
+                freqs = frequencies[i:(i + chunk_size)]
+                eigvecs = eigenvectors[i:(i + chunk_size)]
+            ddms = np.array(self._get_dDs(q_points))
+            gv.append(self._get_group_velocities(freqs, eigvecs, ddms))
+        gv = np.concatenate(gv)
+        if self._perturbation is None and self._symmetry is not None:
+            self._group_velocity = self._symmetrize_group_velocities(
+                gv, self._q_points)
         else:
-            return gv
+            self._group_velocity = gv
+
+    def _solve_phonons(self, q_points):
+        if self._use_lapack_solver:
+            num_band = self._dynmat.get_dimension()
+            freqs = np.zeros((len(q_points), num_band), dtype='double')
+            dtype = "c%d" % (np.dtype('double').itemsize * 2)
+            eigvecs = np.zeros((len(q_points), num_band, num_band),
+                               dtype=dtype)
+            get_phonons_at_qpoints(freqs,
+                                   eigvecs,
+                                   self._dynmat,
+                                   np.array(q_points, dtype='double'),
+                                   self._factor)
+            return freqs, eigvecs
+
+        eigvals, eigvecs = np.linalg.eigh(self._dynmat.run_batch(q_points))
+        eigvals = eigvals.real
+        freqs = np.sqrt(abs(eigvals)) * np.sign(eigvals) * self._factor
+        return freqs, eigvecs
 
-    def _symmetrize_group_velocity(self, gv, q):
-        rotations = []
-        for r in self._symmetry.get_reciprocal_operations():
-            q_in_BZ = q - np.rint(q)
-            diff = q_in_BZ - np.dot(r, q_in_BZ)
-            if (np.abs(diff) < self._symmetry.get_symmetry_tolerance()).all():
-                rotations.append(r)
+    def _get_group_velocities(self, freqs, eigvecs, ddms):
+        """Group velocities from derivatives of dynamical matrices
 
-        gv_sym = np.zeros_like(gv)
-        for r in rotations:
-            r_cart = similarity_transformation(self._reciprocal_lattice, r)
-            gv_sym += np.dot(r_cart, gv.T).T
+        Degeneracy is resolved by the derivative along the first direction,
+        and the group velocities are the diagonal elements of the
+        derivatives along the other directions in the rotated eigenvector
+        basis.
 
-        return gv_sym / len(rotations)
+        """
 
-    def _get_dD(self, q):
+        rot_eigvecs, _ = rotate_eigenvectors_at_qpoints(
+            freqs, np.array(eigvecs), ddms[:, 0])
+        # <e|dD|e> for x, y, z
+        gv = np.einsum('qbj,qkbj->qjk',
+                       rot_eigvecs.conj(),
+                       np.matmul(ddms[:, 1:], rot_eigvecs[:, None])).real
+        freqs = np.array(freqs, dtype='double')
+        factors = np.zeros_like(freqs)
+        is_positive = freqs > self._cutoff_frequency
+        factors[is_positive] = self._factor ** 2 / freqs[is_positive] / 2
+        return gv * factors[:, :, None]
+
+    def _symmetrize_group_velocities(self, gvs, q_points):
+        """Average group velocities over little groups of q-points"""
+
+        little_groups = get_little_group_of_q(
+            q_points,
+            self._symmetry.get_reciprocal_operations(),
+            symprec=self._symmetry.get_symmetry_tolerance())
+        # Sum of Cartesian rotations in little group for each q-point
+        r_sums = np.dot(little_groups.astype('double'),
+                        self._reciprocal_rotations_cart.reshape(-1, 9))
+        r_sums = r_sums.reshape(-1, 3, 3)
+        gvs_sym = np.einsum('qij,qbj->qbi', r_sums, gvs)
+        return gvs_sym / little_groups.sum(axis=1)[:, None, None]
+
+    def _get_dDs(self, q_points):
         if self._q_length is None:
-            return self._get_dD_analytical(q)
+            return self._ddm.run_batch(q_points, directions=self._directions)
         else:
-            return self._get_dD_FD(q)
+            return [self._get_dD_FD(np.array(q)) for q in q_points]
 
     def _get_dD_FD(self, q): # finite difference
         ddm = []
@@ -203,27 +273,3 @@ class GroupVelocity(object):
             ddm.append(delta_dynamical_matrix(q, dq, self._dynmat) /
                        self._q_length / 2)
         return np.array(ddm)
-
-    def _get_dD_analytical(self, q):
-        self._ddm.run(q)
-        ddm = self._ddm.get_derivative_of_dynamical_matrix()
-        dtype = "c%d" % (np.dtype('double').itemsize * 2)
-        ddm_dirs = np.zeros((len(self._directions),) + ddm.shape[1:],
-                            dtype=dtype)
-        for i, dq in enumerate(self._directions):
-            for j in range(3):
-                ddm_dirs[i] += dq[j] * ddm[j]
-        return ddm_dirs
-
-    def _perturb_D(self, ddms, eigsets):
-        eigvals, eigvecs = np.linalg.eigh(
-            np.dot(eigsets.T.conj(), np.dot(ddms[0], eigsets)))
-
-        gv = []
-        rot_eigsets = np.dot(eigsets, eigvecs)
-        for ddm in ddms[1:]:
-            gv.append(
-                np.diag(np.dot(rot_eigsets.T.conj(),
-                               np.dot(ddm, rot_eigsets))).real)
-
-        return np.transpose(gv)
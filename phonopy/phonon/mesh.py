@@ -36,6 +36,10 @@ import numpy as np
 from phonopy.units import VaspToTHz
 from phonopy.structure.grid_points import GridPoints
 from phonopy.structure.symmetry import get_lattice_vector_equivalence
+from phonopy.phonon.dos import get_projected_weights
+from phonopy.phonon.solver import (get_phonons_at_qpoints,
+                                   get_phonons_at_qpoints_in_processes,
+                                   get_phonon_dtypes)
 
 
 def length2mesh(length, lattice, rotations=None):
@@ -109,9 +113,16 @@ class MeshBase(object):
         Index mapping table from all grid points to ir-grid points.
         dtype='intc'
         shape=(prod(mesh_numbers),)
+    mesh_rotations: ndarray
+        Rotation matrices in real space used to reduce grid points.
+        dtype='intc'
+        shape=(rotations, 3, 3)
     dynamical_matrix: DynamicalMatrix
         Dynamical matrix instance to compute dynamical matrix at q-points.
 
+    With precision='single', phonons are solved and stored in single
+    precision, though dynamical matrices are built in double precision.
+
     """
     def __init__(self,
                  dynamical_matrix,
@@ -122,10 +133,12 @@ class MeshBase(object):
                  with_eigenvectors=False,
                  is_gamma_center=False,
                  rotations=None,  # Point group operations in real space
-                 factor=VaspToTHz):
+                 factor=VaspToTHz,
+                 precision='double'):
         self._mesh = np.array(mesh, dtype='intc')
         self._with_eigenvectors = with_eigenvectors
         self._factor = factor
+        self._dtypes = get_phonon_dtypes(precision)
         self._cell = dynamical_matrix.get_primitive()
         self._dynamical_matrix = dynamical_matrix
 
@@ -143,6 +156,7 @@ class MeshBase(object):
 
         self._frequencies = None
         self._eigenvectors = None
+        self._chunk_size = None
 
         self._q_count = 0
 
@@ -188,6 +202,10 @@ class MeshBase(object):
     def get_grid_mapping_table(self):
         return self.grid_mapping_table
 
+    @property
+    def mesh_rotations(self):
+        return self._gp.mesh_rotations
+
     @property
     def dynamical_matrix(self):
         return self._dynamical_matrix
@@ -199,6 +217,105 @@ class MeshBase(object):
     def with_eigenvectors(self):
         return self._with_eigenvectors
 
+    def iter_chunks(self, chunk_size=None):
+        """Generate phonons at blocks of ir-grid points
+
+        Parameters
+        ----------
+        chunk_size : int, optional
+            Maximum number of ir-grid points in a block. Default is None,
+            where chunk_size of IterMesh is used if it is set. Otherwise it
+            is chosen to keep eigenvectors of a block below 64 MB.
+
+        Yields
+        ------
+        qpoints : ndarray
+            dtype='double', shape=(qpoints in block, 3)
+        weights : ndarray
+            dtype='intc', shape=(qpoints in block,)
+        frequencies : ndarray
+            shape=(qpoints in block, bands)
+        eigenvectors : ndarray or None
+            None unless with_eigenvectors=True.
+            shape=(qpoints in block, bands, bands)
+
+        """
+
+        if chunk_size is None:
+            chunk_size = self._chunk_size
+        if chunk_size is None:
+            num_band = self._cell.get_number_of_atoms() * 3
+            chunk_size = max(1, 2 ** 22 // num_band ** 2)
+        num_qpoints = len(self._qpoints)
+        for i in range(0, num_qpoints, chunk_size):
+            j = min(i + chunk_size, num_qpoints)
+            frequencies, eigenvectors = self._get_phonons_in_range(i, j)
+            yield (self._qpoints[i:j],
+                   self._weights[i:j],
+                   frequencies,
+                   eigenvectors)
+
+    def write_hdf5(self,
+                   filename='mesh.hdf5',
+                   compression=None,
+                   eigenvector_precision=None):
+        """Write phonons on sampling mesh to hdf5 file
+
+        Phonons are written block by block of ir-grid points as they are
+        generated by iter_chunks, so IterMesh does not hold phonons of all
+        ir-grid points. Datasets are chunked along ir-grid points, so that
+        the file can be read partially, e.g., by MeshHDF5Reader.
+
+        Parameters
+        ----------
+        filename : str, optional
+            Default is 'mesh.hdf5'.
+        compression : str, optional
+            Compression filter of h5py, e.g., 'gzip' or 'lzf'. Default is
+            None, i.e., no compression.
+        eigenvector_precision : str, optional
+            'single' or 'double'. Eigenvectors are written in complex64
+            with 'single'. Default is None, i.e., the precision of the
+            mesh.
+
+        """
+        import h5py
+
+        num_band = self._cell.get_number_of_atoms() * 3
+        num_qpoints = len(self._qpoints)
+        group_velocities = getattr(self, 'group_velocities', None)
+        if eigenvector_precision is None:
+            dtype_eigvec = self._dtypes[1]
+        else:
+            dtype_eigvec = get_phonon_dtypes(eigenvector_precision)[1]
+
+        with h5py.File(filename, 'w') as w:
+            w.create_dataset('mesh', data=self._mesh)
+            w.create_dataset('qpoint', data=self._qpoints)
+            w.create_dataset('weight', data=self._weights)
+            datasets = {'frequency': _create_hdf5_dataset(
+                w, 'frequency', (num_qpoints, num_band), self._dtypes[0],
+                compression)}
+            if self._with_eigenvectors:
+                datasets['eigenvector'] = _create_hdf5_dataset(
+                    w, 'eigenvector', (num_qpoints, num_band, num_band),
+                    dtype_eigvec, compression)
+            if group_velocities is not None:
+                datasets['group_velocity'] = _create_hdf5_dataset(
+                    w, 'group_velocity', (num_qpoints, num_band, 3),
+                    'double', compression)
+
+            i = 0
+            for _, _, freqs, eigvecs in self.iter_chunks():
+                j = i + len(freqs)
+                datasets['frequency'][i:j] = freqs
+                if 'eigenvector' in datasets:
+                    datasets['eigenvector'][i:j] = eigvecs.astype(
+                        dtype_eigvec)
+                if 'group_velocity' in datasets:
+                    datasets['group_velocity'][i:j] = group_velocities[i:j]
+                i = j
+
 
 class Mesh(MeshBase):
     """Class for phonons on mesh grid
@@ -211,12 +328,12 @@ class Mesh(MeshBase):
     frequencies: ndarray
         Phonon frequencies at ir-grid points. Imaginary frequenies are
         represented by negative real numbers.
-        dtype='double'
+        dtype='double' or 'single' (see precision)
         shape=(ir-grid points, bands)
     eigenvectors: ndarray
         Phonon eigenvectors at ir-grid points. See the data structure at
         np.linalg.eigh.
-        dtype='complex128'
+        dtype='complex128' or 'complex64' (see precision)
         shape=(ir-grid points, bands, bands)
     group_velocities: ndarray
         Phonon group velocities at ir-grid points.
@@ -224,6 +341,9 @@ class Mesh(MeshBase):
         shape=(ir-grid points, bands, 3)
     More attributes from MeshBase should be watched.
 
+    With nprocs > 1, ir-grid points are sharded over a process pool (see
+    get_phonons_at_qpoints_in_processes).
+
     """
     def __init__(self,
                  dynamical_matrix,
@@ -236,7 +356,9 @@ class Mesh(MeshBase):
                  group_velocity=None,
                  rotations=None,  # Point group operations in real space
                  factor=VaspToTHz,
-                 use_lapack_solver=False):
+                 use_lapack_solver=False,
+                 precision='double',
+                 nprocs=1):
         MeshBase.__init__(self,
                           dynamical_matrix,
                           mesh,
@@ -246,11 +368,15 @@ class Mesh(MeshBase):
                           with_eigenvectors=with_eigenvectors,
                           is_gamma_center=is_gamma_center,
                           rotations=rotations,
-                          factor=factor)
+                          factor=factor,
+                          precision=precision)
 
         self._group_velocity = group_velocity
         self._group_velocities = None
         self._use_lapack_solver = use_lapack_solver
+        self._nprocs = nprocs
+        self._projected_weights = None
+        self._projection = None
 
     def __iter__(self):
         if self._frequencies is None:
@@ -273,9 +399,15 @@ class Mesh(MeshBase):
                 return self._frequencies[i], self._eigenvectors[i]
 
     def run(self):
-        self._set_phonon()
-        if self._group_velocity is not None:
-            self._set_group_velocities(self._group_velocity)
+        if (self._group_velocity is not None and
+            not self._with_eigenvectors and
+            self._nprocs == 1 and
+            self._dtypes[0] == 'double'):
+            self._set_phonon_and_group_velocities(self._group_velocity)
+        else:
+            self._set_phonon()
+            if self._group_velocity is not None:
+                self._set_group_velocities(self._group_velocity)
 
     @property
     def frequencies(self):
@@ -313,17 +445,85 @@ class Mesh(MeshBase):
     def get_group_velocities(self):
         return self.group_velocities
 
-    def write_hdf5(self):
-        import h5py
-        with h5py.File('mesh.hdf5', 'w') as w:
-            w.create_dataset('mesh', data=self._mesh)
-            w.create_dataset('qpoint', data=self._qpoints)
-            w.create_dataset('weight', data=self._weights)
-            w.create_dataset('frequency', data=self._frequencies)
-            if self._eigenvectors is not None:
-                w.create_dataset('eigenvector', data=self._eigenvectors)
-            if self._group_velocities is not None:
-                w.create_dataset('group_velocity', data=self._group_velocities)
+    @property
+    def projected_weights(self):
+        """Weights of modes for projected DOS
+
+        Stored by run_projected_weights. See get_projected_weights in
+        phonopy.phonon.dos.
+
+        """
+        return self._projected_weights
+
+    def has_projected_weights(self, direction=None, xyz_projection=False):
+        """Return whether projected weights for the projection are stored"""
+
+        if self._projected_weights is None:
+            return False
+        _direction, _xyz_projection = self._projection
+        if xyz_projection or _xyz_projection:
+            return xyz_projection == _xyz_projection
+        if direction is None or _direction is None:
+            return direction is None and _direction is None
+        return np.allclose(np.array(direction) / np.linalg.norm(direction),
+                           _direction)
+
+    def run_projected_weights(self,
+                              direction=None,
+                              xyz_projection=False,
+                              dtype='single'):
+        """Solve phonons and store weights for projected DOS
+
+        Eigenvectors are solved for blocks of ir-grid points and only the
+        squared norms of their projections are kept, which are much
+        smaller than eigenvectors. Frequencies are stored as well.
+
+        Parameters
+        ----------
+        direction : array_like, optional
+            Projection direction in Cartesian coordinates. Default is None.
+        xyz_projection : bool, optional
+            Project onto x, y, z of each atom. Default is False.
+        dtype : str, optional
+            dtype of stored weights. Default is 'single'.
+
+        """
+
+        num_band = self._cell.get_number_of_atoms() * 3
+        num_qpoints = len(self._qpoints)
+        chunk_size = self._chunk_size
+        if chunk_size is None:
+            chunk_size = max(1, 2 ** 22 // num_band ** 2)
+        if xyz_projection:
+            num_proj = num_band
+        else:
+            num_proj = num_band // 3
+
+        self._frequencies = np.zeros((num_qpoints, num_band),
+                                     dtype=self._dtypes[0])
+        self._projected_weights = np.zeros(
+            (num_qpoints, num_proj, num_band), dtype=dtype)
+        for i in range(0, num_qpoints, chunk_size):
+            j = min(i + chunk_size, num_qpoints)
+            eigenvectors = np.zeros((j - i, num_band, num_band),
+                                    dtype=self._dtypes[1], order='C')
+            get_phonons_at_qpoints(self._frequencies[i:j],
+                                   eigenvectors,
+                                   self._dynamical_matrix,
+                                   self._qpoints[i:j],
+                                   self._factor,
+                                   use_lapack_solver=self._use_lapack_solver)
+            self._projected_weights[i:j] = get_projected_weights(
+                eigenvectors,
+                direction=direction,
+                xyz_projection=xyz_projection,
+                dtype=dtype)
+        if direction is None:
+            self._projection = (None, xyz_projection)
+        else:
+            self._projection = (
+                np.array(direction) / np.linalg.norm(direction),
+                xyz_projection)
 
     def write_yaml(self):
         natom = self._cell.get_number_of_atoms()
@@ -378,39 +578,81 @@ class Mesh(MeshBase):
         num_band = self._cell.get_number_of_atoms() * 3
         num_qpoints = len(self._qpoints)
 
-        self._frequencies = np.zeros((num_qpoints, num_band), dtype='double')
-        if self._with_eigenvectors or self._use_lapack_solver:
-            dtype = "c%d" % (np.dtype('double').itemsize * 2)
+        self._frequencies = np.zeros((num_qpoints, num_band),
+                                     dtype=self._dtypes[0])
+        if self._with_eigenvectors:
             self._eigenvectors = np.zeros(
-                (num_qpoints, num_band, num_band,), dtype=dtype, order='C')
-
-        if self._use_lapack_solver:
-            from phono3py.phonon.solver import get_phonons_at_qpoints
+                (num_qpoints, num_band, num_band,), dtype=self._dtypes[1],
+                order='C')
+
+        if self._nprocs > 1:
+            get_phonons_at_qpoints_in_processes(
+                self._frequencies,
+                self._eigenvectors,
+                self._dynamical_matrix,
+                self._qpoints,
+                self._nprocs,
+                self._factor,
+                use_lapack_solver=self._use_lapack_solver)
+        else:
             get_phonons_at_qpoints(self._frequencies,
                                    self._eigenvectors,
                                    self._dynamical_matrix,
                                    self._qpoints,
                                    self._factor,
-                                   nac_q_direction=None,
-                                   lapack_zheev_uplo='L')
+                                   use_lapack_solver=self._use_lapack_solver)
+
+    def _get_phonons_in_range(self, i, j):
+        if self._frequencies is None:
+            self.run()
+        if self._eigenvectors is None:
+            return self._frequencies[i:j], None
         else:
-            for i, q in enumerate(self._qpoints):
-                self._dynamical_matrix.set_dynamical_matrix(q)
-                dm = self._dynamical_matrix.get_dynamical_matrix()
-                if self._with_eigenvectors:
-                    eigvals, self._eigenvectors[i] = np.linalg.eigh(dm)
-                    eigenvalues = eigvals.real
-                else:
-                    eigenvalues = np.linalg.eigvalsh(dm).real
-                self._frequencies[i] = np.array(np.sqrt(abs(eigenvalues)) *
-                                                np.sign(eigenvalues),
-                                                dtype='double',
-                                                order='C') * self._factor
+            return self._frequencies[i:j], self._eigenvectors[i:j]
 
     def _set_group_velocities(self, group_velocity):
-        group_velocity.set_q_points(self._qpoints)
+        if (self._eigenvectors is not None and
+            self._dtypes[0] == 'double'):
+            group_velocity.set_q_points(self._qpoints,
+                                        frequencies=self._frequencies,
+                                        eigenvectors=self._eigenvectors)
+        else:
+            group_velocity.set_q_points(self._qpoints)
         self._group_velocities = group_velocity.get_group_velocity()
 
+    def _set_phonon_and_group_velocities(self, group_velocity):
+        """Solve phonons and group velocities block by block
+
+        Eigenvectors are required for group velocities but not stored.
+        They are solved for blocks of ir-grid points and discarded after
+        group velocities of the block are obtained.
+
+        """
+
+        num_band = self._cell.get_number_of_atoms() * 3
+        num_qpoints = len(self._qpoints)
+        chunk_size = self._chunk_size
+        if chunk_size is None:
+            chunk_size = max(1, 2 ** 22 // num_band ** 2)
+
+        self._frequencies = np.zeros((num_qpoints, num_band), dtype='double')
+        self._group_velocities = np.zeros((num_qpoints, num_band, 3),
+                                          dtype='double')
+        for i in range(0, num_qpoints, chunk_size):
+            j = min(i + chunk_size, num_qpoints)
+            eigenvectors = np.zeros((j - i, num_band, num_band),
+                                    dtype=self._dtypes[1], order='C')
+            get_phonons_at_qpoints(self._frequencies[i:j],
+                                   eigenvectors,
+                                   self._dynamical_matrix,
+                                   self._qpoints[i:j],
+                                   self._factor,
+                                   use_lapack_solver=self._use_lapack_solver)
+            group_velocity.set_q_points(self._qpoints[i:j],
+                                        frequencies=self._frequencies[i:j],
+                                        eigenvectors=eigenvectors)
+            self._group_velocities[i:j] = group_velocity.get_group_velocity()
+
 
 class IterMesh(MeshBase):
     """Generator class for phonons on mesh grid
@@ -419,6 +661,12 @@ class IterMesh(MeshBase):
     stored, instead generated by iterator. This may be used for
     saving memory space even with very dense samplig mesh.
 
+    By default, (frequencies, eigenvectors) at each ir-grid point are
+    generated. With chunk_size, (qpoints, weights, frequencies,
+    eigenvectors) of blocks of up to chunk_size ir-grid points are
+    generated, where phonons of each block are solved at once (see
+    MeshBase.iter_chunks).
+
     Attributes
     ----------
     Attributes from MeshBase should be watched.
@@ -433,7 +681,10 @@ class IterMesh(MeshBase):
                  with_eigenvectors=False,
                  is_gamma_center=False,
                  rotations=None,  # Point group operations in real space
-                 factor=VaspToTHz):
+                 factor=VaspToTHz,
+                 use_lapack_solver=False,
+                 precision='double',
+                 chunk_size=None):
         MeshBase.__init__(self,
                           dynamical_matrix,
                           mesh,
@@ -443,7 +694,11 @@ class IterMesh(MeshBase):
                           with_eigenvectors=with_eigenvectors,
                           is_gamma_center=is_gamma_center,
                           rotations=rotations,
-                          factor=factor)
+                          factor=factor,
+                          precision=precision)
+        self._use_lapack_solver = use_lapack_solver
+        self._chunk_size = chunk_size
+        self._chunks = None
 
     def __iter__(self):
         return self
@@ -452,21 +707,151 @@ class IterMesh(MeshBase):
         return self.__next__()
 
     def __next__(self):
+        if self._chunk_size is not None:
+            if self._chunks is None:
+                self._chunks = self.iter_chunks(self._chunk_size)
+            try:
+                return next(self._chunks)
+            except StopIteration:
+                self._chunks = None
+                raise
+
         if self._q_count == len(self._qpoints):
             self._q_count = 0
             raise StopIteration
         else:
-            q = self._qpoints[self._q_count]
-            self._dynamical_matrix.set_dynamical_matrix(q)
-            dm = self._dynamical_matrix.get_dynamical_matrix()
-            if self._with_eigenvectors:
-                eigvals, eigenvectors = np.linalg.eigh(dm)
-                eigenvalues = eigvals.real
-            else:
-                eigenvalues = np.linalg.eigvalsh(dm).real
-            frequencies = np.array(np.sqrt(abs(eigenvalues)) *
-                                   np.sign(eigenvalues),
-                                   dtype='double',
-                                   order='C') * self._factor
+            i = self._q_count
+            frequencies, eigenvectors = self._get_phonons_in_range(i, i + 1)
             self._q_count += 1
-            return frequencies, eigenvectors
+            if eigenvectors is None:
+                return frequencies[0], None
+            else:
+                return frequencies[0], eigenvectors[0]
+
+    @property
+    def chunk_size(self):
+        return self._chunk_size
+
+    def _get_phonons_in_range(self, i, j):
+        num_band = self._cell.get_number_of_atoms() * 3
+        frequencies = np.zeros((j - i, num_band), dtype=self._dtypes[0])
+        if self._with_eigenvectors:
+            eigenvectors = np.zeros((j - i, num_band, num_band),
+                                    dtype=self._dtypes[1], order='C')
+        else:
+            eigenvectors = None
+        get_phonons_at_qpoints(frequencies,
+                               eigenvectors,
+                               self._dynamical_matrix,
+                               self._qpoints[i:j],
+                               self._factor,
+                               use_lapack_solver=self._use_lapack_solver)
+        return frequencies, eigenvectors
+
+
+class MeshHDF5Reader(object):
+    """Phonons on sampling mesh read lazily from hdf5 file
+
+    The file written by Mesh.write_hdf5 or IterMesh.write_hdf5 is opened
+    and frequencies, eigenvectors, and group velocities are given as
+    h5py datasets. Therefore only the data accessed by slicing, e.g.,
+    eigenvectors[i], is read from the file. This can be used in place
+    of Mesh for TotalDos and PartialDos with smearing method and for
+    ThermalProperties. The file is closed by close() or at the exit of
+    a with statement.
+
+    Attributes
+    ----------
+    mesh_numbers: ndarray
+        dtype='intc', shape=(3,)
+    qpoints: ndarray
+        dtype='double', shape=(ir-grid points, 3)
+    weights: ndarray
+        dtype='intc', shape=(ir-grid points,)
+    frequencies: h5py.Dataset
+        shape=(ir-grid points, bands)
+    eigenvectors: h5py.Dataset or None
+        shape=(ir-grid points, bands, bands)
+    group_velocities: h5py.Dataset or None
+        shape=(ir-grid points, bands, 3)
+
+    """
+    def __init__(self, filename='mesh.hdf5'):
+        import h5py
+
+        self._file = h5py.File(filename, 'r')
+        self._mesh = np.array(self._file['mesh'], dtype='intc')
+        self._qpoints = np.array(self._file['qpoint'], dtype='double')
+        self._weights = np.array(self._file['weight'], dtype='intc')
+        self._frequencies = self._file['frequency']
+        self._eigenvectors = self._file.get('eigenvector')
+        self._group_velocities = self._file.get('group_velocity')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def mesh_numbers(self):
+        return self._mesh
+
+    @property
+    def qpoints(self):
+        return self._qpoints
+
+    @property
+    def weights(self):
+        return self._weights
+
+    @property
+    def frequencies(self):
+        return self._frequencies
+
+    @property
+    def eigenvectors(self):
+        return self._eigenvectors
+
+    @property
+    def group_velocities(self):
+        return self._group_velocities
+
+    @property
+    def with_eigenvectors(self):
+        return self._eigenvectors is not None
+
+    def iter_chunks(self, chunk_size=None):
+        """Read phonons at blocks of ir-grid points
+
+        See MeshBase.iter_chunks.
+
+        """
+
+        num_qpoints, num_band = self._frequencies.shape
+        if chunk_size is None:
+            chunk_size = max(1, 2 ** 22 // num_band ** 2)
+        for i in range(0, num_qpoints, chunk_size):
+            j = min(i + chunk_size, num_qpoints)
+            if self._eigenvectors is None:
+                eigenvectors = None
+            else:
+                eigenvectors = self._eigenvectors[i:j]
+            yield (self._qpoints[i:j],
+                   self._weights[i:j],
+                   self._frequencies[i:j],
+                   eigenvectors)
+
+
+def _create_hdf5_dataset(w, name, shape, dtype, compression):
+    """Create dataset chunked along the first axis by about 1 MB"""
+    size = np.prod(shape[1:]) * np.dtype(dtype).itemsize
+    chunks = (int(max(1, min(shape[0], 2 ** 20 // size))),) + shape[1:]
+    return w.create_dataset(name,
+                            shape,
+                            dtype=dtype,
+                            chunks=chunks,
+                            compression=compression)
@@ -34,6 +34,7 @@
 
 import numpy as np
 from phonopy.units import VaspToTHz
+from phonopy.phonon.solver import get_phonons_at_qpoints, get_phonon_dtypes
 
 
 class QpointsPhonon(object):
@@ -44,14 +45,18 @@ class QpointsPhonon(object):
     frequencies: ndarray
         Phonon frequencies at ir-grid points. Imaginary frequenies are
         represented by negative real numbers.
-        dtype='double'
+        dtype='double' or 'single' (see precision)
         shape=(qpoints, bands)
     eigenvectors: ndarray
         Phonon eigenvectors at ir-grid points. See the data structure at
         np.linalg.eigh.
-        dtype='complex128'
+        dtype='complex128' or 'complex64' (see precision)
         shape=(qpoints, bands, bands)
 
+    With precision='single', frequencies and eigenvectors are solved and
+    stored in single precision. Dynamical matrices are always built and
+    stored in double precision.
+
     """
 
     def __init__(self,
@@ -61,7 +66,9 @@ class QpointsPhonon(object):
                  with_eigenvectors=False,
                  group_velocity=None,
                  with_dynamical_matrices=False,
-                 factor=VaspToTHz):
+                 factor=VaspToTHz,
+                 use_lapack_solver=False,
+                 precision='double'):
         primitive = dynamical_matrix.get_primitive()
         self._natom = primitive.get_number_of_atoms()
         self._masses = primitive.get_masses()
@@ -76,6 +83,8 @@ class QpointsPhonon(object):
         self._group_velocity = group_velocity
         self._with_dynamical_matrices = with_dynamical_matrices
         self._factor = factor
+        self._use_lapack_solver = use_lapack_solver
+        self._dtypes = get_phonon_dtypes(precision)
 
         self._group_velocities = None
         self._eigenvectors = None
@@ -166,48 +175,91 @@ class QpointsPhonon(object):
             w.write("\n")
 
     def _run(self):
+        if self._with_dynamical_matrices:
+            self._run_with_dynamical_matrices()
+            eigenvectors = self._eigenvectors
+        else:
+            eigenvectors = self._solve_phonons()
+
         if self._group_velocity is not None:
-            self._group_velocity.set_q_points(
+            self._set_group_velocities(self._group_velocity, eigenvectors)
+
+    def _set_group_velocities(self, group_velocity, eigenvectors):
+        if eigenvectors is not None and self._is_phonons_reusable():
+            group_velocity.set_q_points(
+                self._qpoints,
+                perturbation=self._nac_q_direction,
+                frequencies=self._frequencies,
+                eigenvectors=eigenvectors)
+        else:
+            group_velocity.set_q_points(
                 self._qpoints, perturbation=self._nac_q_direction)
-            self._group_velocities = self._group_velocity.get_group_velocity()
+        self._group_velocities = group_velocity.get_group_velocity()
 
-        if self._with_dynamical_matrices:
-            dynamical_matrices = []
+    def _is_phonons_reusable(self):
+        # At Gamma point, phonons are solved with nac_q_direction but group
+        # velocities are not. So they are solved again for group velocities.
+        return (self._dtypes[0] == 'double' and
+                (self._nac_q_direction is None or
+                 not self._dynamical_matrix.is_nac()))
 
+    def _run_with_dynamical_matrices(self):
+        dynamical_matrices = []
         self._frequencies = []
         if self._with_eigenvectors:
             self._eigenvectors = []
 
-        for q in self._qpoints:
-            dm = self._get_dynamical_matrix(q)
-            if self._with_dynamical_matrices:
-                dynamical_matrices.append(dm)
+        num_qpoints = len(self._qpoints)
+        num_band = self._natom * 3
+        num_chunk = max(1, 2 ** 22 // num_band ** 2)
+        for i in range(0, num_qpoints, num_chunk):
+            dms = self._get_dynamical_matrices(
+                self._qpoints[i:min(i + num_chunk, num_qpoints)])
+            dynamical_matrices += list(dms)
             if self._with_eigenvectors:
-                eigvals, eigvecs = np.linalg.eigh(dm)
-                self._eigenvectors.append(eigvecs)
+                eigvals, eigvecs = np.linalg.eigh(dms)
+                self._eigenvectors += list(eigvecs)
             else:
-                eigvals = np.linalg.eigvalsh(dm)
+                eigvals = np.linalg.eigvalsh(dms)
             eigvals = eigvals.real
-            self._frequencies.append(np.sqrt(np.abs(eigvals)) *
-                                     np.sign(eigvals) * self._factor)
+            self._frequencies += list(np.sqrt(np.abs(eigvals)) *
+                                      np.sign(eigvals) * self._factor)
 
         self._frequencies = np.array(self._frequencies,
-                                     dtype='double', order='C')
-        dtype = "c%d" % (np.dtype('double').itemsize * 2)
+                                     dtype=self._dtypes[0], order='C')
         if self._with_eigenvectors:
             self._eigenvectors = np.array(self._eigenvectors,
-                                          dtype=dtype, order='C')
-        if self._with_dynamical_matrices:
-            self._dynamical_matrices = np.array(dynamical_matrices,
-                                                dtype=dtype, order='C')
-
-    def _get_dynamical_matrix(self, q):
-        if (self._dynamical_matrix.is_nac() and
-            self._nac_q_direction is not None and
-            (np.abs(q) < 1e-5).all()):
-            self._dynamical_matrix.set_dynamical_matrix(
-                q,
-                q_direction=self._nac_q_direction)
+                                          dtype=self._dtypes[1], order='C')
+        dtype = "c%d" % (np.dtype('double').itemsize * 2)
+        self._dynamical_matrices = np.array(dynamical_matrices,
+                                            dtype=dtype, order='C')
+
+    def _solve_phonons(self):
+        num_band = self._natom * 3
+        self._frequencies = np.zeros((len(self._qpoints), num_band),
+                                     dtype=self._dtypes[0])
+        # Eigenvectors are also used for group velocities.
+        eigenvectors = None
+        if (self._with_eigenvectors or
+            (self._group_velocity is not None and
+             self._is_phonons_reusable())):
+            eigenvectors = np.zeros(
+                (len(self._qpoints), num_band, num_band),
+                dtype=self._dtypes[1])
+        if self._with_eigenvectors:
+            self._eigenvectors = eigenvectors
+        get_phonons_at_qpoints(self._frequencies,
+                               eigenvectors,
+                               self._dynamical_matrix,
+                               np.array(self._qpoints, dtype='double'),
+                               self._factor,
+                               nac_q_direction=self._nac_q_direction,
+                               use_lapack_solver=self._use_lapack_solver)
+        return eigenvectors
+
+    def _get_dynamical_matrices(self, qpoints):
+        if self._dynamical_matrix.is_nac():
+            return self._dynamical_matrix.run_batch(
+                qpoints, q_direction=self._nac_q_direction)
         else:
-            self._dynamical_matrix.set_dynamical_matrix(q)
-        return self._dynamical_matrix.get_dynamical_matrix()
+            return self._dynamical_matrix.run_batch(qpoints)
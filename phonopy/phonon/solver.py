@@ -0,0 +1,510 @@
+# Copyright (C) 2019 Atsushi Togo
+# All rights reserved.
+#
+# This file is part of phonopy.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in
+#   the documentation and/or other materials provided with the
+#   distribution.
+#
+# * Neither the name of the phonopy project nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import io
+import pickle
+import numpy as np
+from phonopy.units import VaspToTHz
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+# Set in worker processes of get_phonons_at_qpoints_in_processes
+_worker_data = {}
+
+
+def is_native_solver_available():
+    """Return whether phonopy's C/LAPACK phonon solver is compiled"""
+    try:
+        import phonopy._phonopy as phonoc
+    except ImportError:
+        return False
+    return hasattr(phonoc, 'phonons_at_qpoints')
+
+
+def get_phonon_dtypes(precision='double'):
+    """Return dtypes of frequencies and eigenvectors
+
+    Parameters
+    ----------
+    precision : str, optional
+        'double' or 'single'. Default is 'double'.
+
+    Returns
+    -------
+    tuple
+        (dtype of frequencies, dtype of eigenvectors)
+
+    """
+
+    if precision not in ('double', 'single'):
+        raise ValueError("precision has to be 'double' or 'single'.")
+    return precision, "c%d" % (np.dtype(precision).itemsize * 2)
+
+
+def get_phonons_at_qpoints(frequencies,
+                           eigenvectors,
+                           dynamical_matrix,
+                           qpoints,
+                           frequency_conversion_factor=VaspToTHz,
+                           nac_q_direction=None,
+                           use_lapack_solver=True,
+                           lapack_zheev_uplo='L'):
+    """Solve phonons at q-points
+
+    With use_lapack_solver=True, dynamical matrices are built and
+    diagonalized q-point by q-point in an OpenMP parallel region of the
+    C/LAPACK implementation. Otherwise, or when it is not compiled, or when
+    dynamical matrix elements are rounded (``decimals``), numpy.linalg.eigh
+    is applied to stacks of dynamical matrices.
+
+    When frequencies are given as a single precision array, dynamical
+    matrices are built in double precision and diagonalized in single
+    precision. Then eigenvalues are refined in double precision (see
+    _run_py_mixed).
+
+    Parameters
+    ----------
+    frequencies : ndarray
+        Phonon frequencies are stored in this array.
+        dtype='double' or 'single', shape=(qpoints, bands)
+    eigenvectors : ndarray or None
+        Phonon eigenvectors are stored in this array as column vectors as
+        numpy.linalg.eigh does. With None, eigenvectors are not calculated.
+        dtype='complex128' or 'complex64', shape=(qpoints, bands, bands)
+    dynamical_matrix : DynamicalMatrix or DynamicalMatrixNAC
+        Dynamical matrix calculator.
+    qpoints : array_like
+        q-points in reduced coordinates.
+        dtype='double', shape=(qpoints, 3)
+    frequency_conversion_factor : float, optional
+        Frequency unit conversion factor. Default is VaspToTHz.
+    nac_q_direction : array_like, optional
+        q-direction in reduced coordinates used for NAC at Gamma point.
+        Default is None.
+    use_lapack_solver : bool, optional
+        Use C/LAPACK implementation if available. Default is True.
+    lapack_zheev_uplo : str, optional
+        'L' or 'U' to be passed to LAPACK zheevd. Default is 'L'.
+
+    Raises
+    ------
+    RuntimeError
+        When LAPACK zheevd fails at any q-point in the C/LAPACK
+        implementation.
+
+    """
+
+    if frequencies.dtype == np.dtype('single'):
+        _run_py_mixed(frequencies,
+                      eigenvectors,
+                      dynamical_matrix,
+                      qpoints,
+                      frequency_conversion_factor,
+                      nac_q_direction)
+    elif (use_lapack_solver and
+          is_native_solver_available() and
+          dynamical_matrix.get_decimals() is None):
+        _run_c(frequencies,
+               eigenvectors,
+               dynamical_matrix,
+               qpoints,
+               frequency_conversion_factor,
+               nac_q_direction,
+               lapack_zheev_uplo)
+    else:
+        _run_py(frequencies,
+                eigenvectors,
+                dynamical_matrix,
+                qpoints,
+                frequency_conversion_factor,
+                nac_q_direction)
+
+
+def get_phonons_at_qpoints_in_processes(frequencies,
+                                        eigenvectors,
+                                        dynamical_matrix,
+                                        qpoints,
+                                        nprocs,
+                                        frequency_conversion_factor=VaspToTHz,
+                                        nac_q_direction=None,
+                                        use_lapack_solver=True):
+    """Solve phonons at q-points sharded over a process pool
+
+    Force constants and shortest vectors are placed in shared memory. The
+    dynamical matrix is pickled with references to them instead of their
+    data, and worker processes rebuild it from the shared memory. Workers
+    solve chunks of q-points by
+    get_phonons_at_qpoints and write results into shared memory, which are
+    finally copied to frequencies and eigenvectors. When
+    multiprocessing.shared_memory is unavailable (Python < 3.8), phonons
+    are solved in the calling process.
+
+    Parameters
+    ----------
+    nprocs : int
+        Number of worker processes.
+
+    See get_phonons_at_qpoints for the other parameters.
+
+    """
+
+    if shared_memory is None or nprocs < 2 or len(qpoints) < 2:
+        get_phonons_at_qpoints(frequencies,
+                               eigenvectors,
+                               dynamical_matrix,
+                               qpoints,
+                               frequency_conversion_factor,
+                               nac_q_direction=nac_q_direction,
+                               use_lapack_solver=use_lapack_solver)
+        return
+
+    import multiprocessing
+
+    dm = dynamical_matrix
+    if (dm.is_nac() and
+        dm.get_nac_method() == 'gonze' and
+        dm.get_Gonze_nac_dataset()[0] is None):
+        dm.make_Gonze_nac_dataset()
+
+    blocks = []
+    try:
+        shared = {}
+        arrays = [dm.force_constants] + list(dm.compact_shortest_vectors)
+        if dm.is_nac() and dm.get_nac_method() == 'gonze':
+            arrays.append(dm.get_Gonze_nac_dataset()[0])
+        for array in arrays:
+            shared[id(array)] = _to_shared_memory(array, blocks)
+        f = io.BytesIO()
+        _SharedArrayPickler(f, shared).dump(dm)
+        _qpoints = np.array(qpoints, dtype='double', order='C')
+        outputs = [_to_shared_memory(_qpoints, blocks),
+                   _to_shared_memory(frequencies, blocks)]
+        if eigenvectors is not None:
+            outputs.append(_to_shared_memory(eigenvectors, blocks))
+
+        ranges = [(r[0], r[-1] + 1) for r in
+                  np.array_split(np.arange(len(_qpoints)),
+                                 min(len(_qpoints), nprocs * 4))]
+        pool = multiprocessing.Pool(
+            processes=nprocs,
+            initializer=_init_worker,
+            initargs=(f.getvalue(),
+                      outputs,
+                      frequency_conversion_factor,
+                      nac_q_direction,
+                      use_lapack_solver))
+        try:
+            pool.map(_run_worker, ranges)
+        finally:
+            pool.close()
+            pool.join()
+
+        frequencies[:] = _from_shared_memory(outputs[1], blocks)
+        if eigenvectors is not None:
+            eigenvectors[:] = _from_shared_memory(outputs[2], blocks)
+    finally:
+        for shm in blocks:
+            shm.close()
+            try:
+                shm.unlink()
+            except OSError:  # Unlinked already
+                pass
+
+
+class _SharedArrayPickler(pickle.Pickler):
+    """Pickler storing specified arrays as references to shared memory
+
+    shared : dict
+        Specs of shared memory blocks (see _to_shared_memory) with ids of
+        arrays as keys.
+
+    """
+
+    def __init__(self, f, shared):
+        pickle.Pickler.__init__(self, f, pickle.HIGHEST_PROTOCOL)
+        self._shared = shared
+
+    def persistent_id(self, obj):
+        if isinstance(obj, np.ndarray):
+            return self._shared.get(id(obj))
+        return None
+
+
+class _SharedArrayUnpickler(pickle.Unpickler):
+    """Unpickler attaching arrays referenced by _SharedArrayPickler"""
+
+    def __init__(self, f, blocks):
+        pickle.Unpickler.__init__(self, f)
+        self._blocks = blocks
+
+    def persistent_load(self, pid):
+        return _from_shared_memory(pid, self._blocks)
+
+
+def _to_shared_memory(array, blocks):
+    shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    blocks.append(shm)
+    shared_array = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    shared_array[...] = array
+    return shm.name, array.shape, array.dtype.str
+
+
+def _from_shared_memory(spec, blocks):
+    shm = shared_memory.SharedMemory(name=spec[0])
+    blocks.append(shm)
+    return np.ndarray(spec[1], dtype=spec[2], buffer=shm.buf)
+
+
+def _init_worker(pickled_dynamical_matrix,
+                 outputs,
+                 frequency_conversion_factor,
+                 nac_q_direction,
+                 use_lapack_solver):
+    blocks = []
+    dm = _SharedArrayUnpickler(io.BytesIO(pickled_dynamical_matrix),
+                               blocks).load()
+    _worker_data.update(
+        blocks=blocks,
+        dynamical_matrix=dm,
+        outputs=[_from_shared_memory(spec, blocks) for spec in outputs],
+        frequency_conversion_factor=frequency_conversion_factor,
+        nac_q_direction=nac_q_direction,
+        use_lapack_solver=use_lapack_solver)
+
+
+def _run_worker(qpoint_range):
+    i, j = qpoint_range
+    outputs = _worker_data['outputs']
+    if len(outputs) > 2:
+        eigenvectors = outputs[2][i:j]
+    else:
+        eigenvectors = None
+    get_phonons_at_qpoints(
+        outputs[1][i:j],
+        eigenvectors,
+        _worker_data['dynamical_matrix'],
+        outputs[0][i:j],
+        _worker_data['frequency_conversion_factor'],
+        nac_q_direction=_worker_data['nac_q_direction'],
+        use_lapack_solver=_worker_data['use_lapack_solver'])
+
+
+def _run_c(frequencies,
+           eigenvectors,
+           dynamical_matrix,
+           qpoints,
+           frequency_conversion_factor,
+           nac_q_direction,
+           lapack_zheev_uplo):
+    import phonopy._phonopy as phonoc
+
+    dm = dynamical_matrix
+    primitive = dm.primitive
+    fc = dm.force_constants
+    svecs, multiplicity = dm.compact_shortest_vectors
+    masses = np.array(primitive.masses, dtype='double')
+    if fc.shape[0] == fc.shape[1]:  # full fc
+        s2p_map = np.array(primitive.s2p_map, dtype='intc')
+        p2s_map = np.array(primitive.p2s_map, dtype='intc')
+    else:
+        p2p_map = primitive.p2p_map
+        s2p_map = np.array([p2p_map[i] for i in primitive.s2p_map],
+                           dtype='intc')
+        p2s_map = np.arange(len(primitive.p2s_map), dtype='intc')
+    rec_lat = np.array(np.linalg.inv(primitive.get_cell()),
+                       dtype='double', order='C')
+
+    gonze_fc = None
+    born = None
+    dielectric = None
+    nac_factor = 0
+    q_dir = None
+    dd_q0 = None
+    G_list = None
+    positions = None
+    Lambda = 0
+    tolerance = 1e-5
+    if dm.is_nac():
+        born = dm.get_born_effective_charges()
+        dielectric = dm.get_dielectric_constant()
+        nac_factor = dm.get_nac_factor()
+        tolerance = dm.get_symprec()
+        if nac_q_direction is not None:
+            q_dir = np.array(nac_q_direction, dtype='double', order='C')
+        if dm.get_nac_method() == 'gonze':
+            if dm.get_Gonze_nac_dataset()[0] is None:
+                dm.make_Gonze_nac_dataset()
+            (gonze_fc,
+             dd_q0,
+             G_cutoff,
+             G_list,
+             Lambda) = dm.get_Gonze_nac_dataset()
+            positions = np.array(primitive.get_positions(),
+                                 dtype='double', order='C')
+
+    if eigenvectors is None:
+        eigvecs = None
+    else:
+        eigvecs = eigenvectors.view(dtype='double')
+
+    phonoc.phonons_at_qpoints(
+        frequencies,
+        eigvecs,
+        np.array(qpoints, dtype='double', order='C'),
+        fc,
+        gonze_fc,
+        svecs,
+        multiplicity,
+        masses,
+        s2p_map,
+        p2s_map,
+        rec_lat,
+        born,
+        dielectric,
+        nac_factor,
+        q_dir,
+        None if dd_q0 is None else dd_q0.view(dtype='double'),
+        G_list,
+        positions,
+        Lambda,
+        frequency_conversion_factor,
+        tolerance,
+        lapack_zheev_uplo)
+
+
+def _run_py(frequencies,
+            eigenvectors,
+            dynamical_matrix,
+            qpoints,
+            frequency_conversion_factor,
+            nac_q_direction):
+    num_qpoints = len(qpoints)
+    num_band = frequencies.shape[1]
+    num_chunk = max(1, 2 ** 22 // num_band ** 2)
+    for i in range(0, num_qpoints, num_chunk):
+        j = min(i + num_chunk, num_qpoints)
+        dms = _get_dynamical_matrices(dynamical_matrix,
+                                      qpoints[i:j],
+                                      nac_q_direction)
+        if eigenvectors is None:
+            eigvals = np.linalg.eigvalsh(dms).real
+        else:
+            eigvals, eigenvectors[i:j] = np.linalg.eigh(dms)
+            eigvals = eigvals.real
+        frequencies[i:j] = (np.sqrt(np.abs(eigvals)) * np.sign(eigvals) *
+                            frequency_conversion_factor)
+
+
+def _run_py_mixed(frequencies,
+                  eigenvectors,
+                  dynamical_matrix,
+                  qpoints,
+                  frequency_conversion_factor,
+                  nac_q_direction,
+                  cluster_factor=1000):
+    """Solve phonons in single precision with double precision refinement
+
+    Dynamical matrices are diagonalized in single precision, whose errors
+    of eigenvalues are of the order of eps * |D|, where eps is the machine
+    epsilon of single precision and |D| is the spectral norm of dynamical
+    matrix. Eigenvalues are replaced by Rayleigh quotients evaluated in
+    double precision, whose errors are of the order of (eps * |D|)^2 / gap
+    for isolated eigenvalues. Eigenvectors of eigenvalues closer than
+    cluster_factor * eps * |D| are mixed, and only these clusters of
+    eigenpairs are refined by Rayleigh-Ritz procedure in the subspaces
+    spanned by their eigenvectors in double precision. This also refines
+    acoustic modes near Gamma point, which are close to each other.
+
+    """
+
+    eps = np.finfo('single').eps
+    num_qpoints = len(qpoints)
+    num_band = frequencies.shape[1]
+    num_chunk = max(1, 2 ** 22 // num_band ** 2)
+    for i in range(0, num_qpoints, num_chunk):
+        j = min(i + num_chunk, num_qpoints)
+        dms = _get_dynamical_matrices(dynamical_matrix,
+                                      qpoints[i:j],
+                                      nac_q_direction)
+        dms_single = np.array(dms, dtype=get_phonon_dtypes('single')[1])
+        vals, eigvecs = np.linalg.eigh(dms_single)
+        eigvecs = np.array(eigvecs, dtype=dms.dtype)
+        # Rayleigh quotients, eigenvectors are normalized.
+        eigvals = np.einsum('qji,qji->qi',
+                            eigvecs.conj(),
+                            np.matmul(dms, eigvecs)).real
+
+        tolerance = cluster_factor * eps * abs(eigvals).max(axis=1)
+        is_close = np.diff(vals, axis=1) < tolerance[:, None]
+        for k in np.where(is_close.any(axis=1))[0]:
+            for start, stop in _get_clusters(is_close[k]):
+                _refine_cluster(dms[k], eigvals[k], eigvecs[k], start, stop)
+
+        if eigenvectors is not None:
+            eigenvectors[i:j] = eigvecs
+        frequencies[i:j] = (np.sqrt(np.abs(eigvals)) * np.sign(eigvals) *
+                            frequency_conversion_factor)
+
+
+def _get_clusters(is_close):
+    """Return ranges of bands connected by is_close[b] between b and b + 1"""
+    clusters = []
+    start = None
+    for b, close in enumerate(is_close):
+        if close and start is None:
+            start = b
+        elif not close and start is not None:
+            clusters.append((start, b + 1))
+            start = None
+    if start is not None:
+        clusters.append((start, len(is_close) + 1))
+    return clusters
+
+
+def _refine_cluster(dm, eigvals, eigvecs, start, stop):
+    """Rayleigh-Ritz refinement of eigenpairs of bands in [start, stop)"""
+    basis, _ = np.linalg.qr(eigvecs[:, start:stop])
+    vals, vecs = np.linalg.eigh(np.dot(basis.T.conj(), np.dot(dm, basis)))
+    eigvals[start:stop] = vals.real
+    eigvecs[:, start:stop] = np.dot(basis, vecs)
+
+
+def _get_dynamical_matrices(dynamical_matrix, qpoints, nac_q_direction):
+    if dynamical_matrix.is_nac():
+        return dynamical_matrix.run_batch(qpoints,
+                                          q_direction=nac_q_direction)
+    else:
+        return dynamical_matrix.run_batch(qpoints)
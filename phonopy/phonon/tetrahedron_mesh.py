@@ -152,7 +152,11 @@ class TetrahedronMesh(object):
 
         """
         self._cell = cell
-        self._frequencies = frequencies
+        if frequencies.dtype == np.dtype('double'):
+            self._frequencies = frequencies
+        else:
+            self._frequencies = np.array(frequencies,
+                                         dtype='double', order='C')
         self._mesh = np.array(mesh, dtype='intc')
         self._grid_address = grid_address
         self._grid_mapping_table = grid_mapping_table
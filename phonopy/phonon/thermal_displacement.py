@@ -35,14 +35,22 @@
 import numpy as np
 from phonopy.units import AMU, THzToEv, Kb, EV, Hbar, Angstrom
 from phonopy.interface.cif import write_cif_P1
+from phonopy.harmonic.force_constants import similarity_transformation
 
 
 class ThermalMotion(object):
     def __init__(self,
                  iter_mesh,
                  freq_min=None,
-                 freq_max=None):
+                 freq_max=None,
+                 symmetry=None):
         self._iter_mesh = iter_mesh
+        self._symmetry = symmetry
+        self._is_reduced = (iter_mesh.weights != 1).any()
+        if self._is_reduced and symmetry is None:
+            msg = ("Symmetry of primitive cell has to be given when grid "
+                   "points are reduced by symmetry.")
+            raise RuntimeError(msg)
         if freq_min is None:
             self._fmin = 0
         else:
@@ -61,6 +69,145 @@ class ThermalMotion(object):
         return Hbar * EV / Angstrom ** 2 * (
             (self._get_population(freq, t) + 0.5) / (freq * 1e12 * 2 * np.pi))
 
+    def _get_Q2_at_temperatures(self, freqs, temps):  # freqs in THz
+        """Return Q2 of frequencies at temperatures
+
+        Returns
+        -------
+        ndarray
+            dtype='double', shape=(temperatures, frequencies)
+
+        """
+
+        pops = np.zeros((len(temps), len(freqs)), dtype='double')
+        condition = temps > 1.0
+        pops[condition] = 1.0 / (
+            np.exp(np.outer(1.0 / (Kb * temps[condition]),
+                            freqs * THzToEv)) - 1)
+        return Hbar * EV / Angstrom ** 2 * (
+            (pops + 0.5) / (freqs * 1e12 * 2 * np.pi))
+
+    def _get_disp_matrices(self):
+        """Return sums of displacement matrices over grid points
+
+        With grid points reduced by symmetry, only phonons at ir-grid
+        points are solved. Sums over ir-grid points multiplied by their
+        weights are symmetrized by site symmetry, which gives sums over
+        all grid points, i.e., contributions of stars of ir-grid points.
+
+        Returns
+        -------
+        disps : ndarray
+            Displacement matrices divided by masses
+            dtype='double', shape=(temperatures, atoms, 3, 3)
+        num_qpoints : int
+            Number of grid points.
+
+        """
+        temps = self._temperatures
+        num_atom = len(self._masses)
+        disps = np.zeros((len(temps), num_atom, 3, 3),
+                         dtype='double', order='C')
+        num_qpoints = 0
+        for _, weights, freqs, eigvecs in self._iter_mesh.iter_chunks():
+            num_qpoints += weights.sum()
+            valid_indices = self._get_valid_indices(freqs)
+            # [phonons, atoms, 3]
+            vecs = eigvecs.transpose(0, 2, 1)[valid_indices].reshape(
+                -1, num_atom, 3)
+            fs = freqs[valid_indices]
+            try:
+                Q2 = self._get_Q2_at_temperatures(fs, temps)
+            except FloatingPointError:
+                Q2 = self._get_Q2_band_by_band(fs, valid_indices)
+            if self._is_reduced:
+                Q2 *= np.broadcast_to(weights[:, None],
+                                      freqs.shape)[valid_indices]
+            self._add_disp_matrices(disps, Q2, vecs)
+
+        assert np.prod(self._iter_mesh.mesh_numbers) == num_qpoints
+        if self._is_reduced:
+            return self._symmetrize_disp_matrices(disps), num_qpoints
+        else:
+            return disps, num_qpoints
+
+    def _add_disp_matrices(self, disps, Q2, vecs):
+        """Add sum_n Q2[t, n] Re(e_n e_n^H) / m to disps in place
+
+        Imaginary parts of displacement matrices cancel out between q and
+        -q on the full mesh, so only real parts are accumulated.
+
+        Parameters
+        ----------
+        disps : ndarray
+            dtype='double', shape=(temperatures, atoms, 3, 3)
+        Q2 : ndarray
+            dtype='double', shape=(temperatures, phonons)
+        vecs : ndarray
+            Eigenvectors of phonons.
+            dtype=complex, shape=(phonons, atoms, 3)
+
+        """
+        try:
+            import phonopy._phonopy as phonoc
+            dtype_complex = "c%d" % (np.dtype('double').itemsize * 2)
+            phonoc.thermal_displacement_matrices(
+                disps,
+                np.array(Q2.T, dtype='double', order='C'),
+                np.array(vecs, dtype=dtype_complex, order='C').view('double'),
+                np.array(self._masses, dtype='double'))
+        except ImportError:
+            mats = (vecs.real[:, :, :, None] * vecs.real[:, :, None, :] +
+                    vecs.imag[:, :, :, None] * vecs.imag[:, :, None, :])
+            mats /= self._masses[None, :, None, None]
+            disps += np.dot(Q2, mats.reshape(len(mats), -1)).reshape(
+                disps.shape)
+
+    def _symmetrize_disp_matrices(self, disps):
+        """Symmetrize displacement matrices by site symmetry
+
+        Under (R|t) that sends atom i to atom perm[i], the matrix of atom i
+        at q is transformed to that of atom perm[i] at Rq.
+
+        Only the operations whose rotations were used to reduce the mesh are
+        averaged over, since the ir-grid weights are those of this group.
+        When the mesh breaks the point group symmetry, e.g., 4x4x3 mesh for
+        a cubic crystal, it is reduced only by time reversal, which leaves
+        the real displacement matrices unchanged.
+
+        """
+        lattice = self._iter_mesh.dynamical_matrix.primitive.get_cell().T
+        mesh_rotations = self._iter_mesh.mesh_rotations
+        rotations = self._symmetry.get_symmetry_operations()['rotations']
+        perms = self._symmetry.get_atomic_permutations()
+        disps_sym = np.zeros_like(disps)
+        num_ops = 0
+        for r, perm in zip(rotations, perms):
+            if not (mesh_rotations == r).all(axis=(1, 2)).any():
+                continue
+            r_cart = similarity_transformation(lattice, r)
+            disps_sym[:, perm] += np.einsum('ab,tibc,dc->tiad',
+                                            r_cart, disps, r_cart)
+            num_ops += 1
+        return disps_sym / num_ops
+
+    def _get_Q2_band_by_band(self, freqs, valid_indices):
+        Q2 = np.zeros((len(self._temperatures), len(freqs)), dtype='double')
+        band_indices = np.nonzero(valid_indices)[1]
+        for i, (f, i_band) in enumerate(zip(freqs, band_indices)):
+            try:
+                Q2[:, i] = self._get_Q2(f, self._temperatures)
+            except FloatingPointError as e:
+                # Probably, overflow in exp(freq / (kB * T))
+                print("%s: freq=%.2f (band #%d)" % (e, f, i_band))
+        return Q2
+
+    def _get_valid_indices(self, freqs):
+        valid_indices = freqs > self._fmin
+        if self._fmax is not None:
+            valid_indices &= freqs < self._fmax
+        return valid_indices
+
     @property
     def temperatures(self):
         return self._temperatures
@@ -125,15 +272,14 @@ class ThermalDisplacements(ThermalMotion):
                  iter_mesh,
                  projection_direction=None,
                  freq_min=None,
-                 freq_max=None):
+                 freq_max=None,
+                 symmetry=None):
         """Calculate mean square displacements
 
         Parameters
         ----------
         iter_mesh:
-            Mesh or IterMesh instance. Grid points must not be reduced by
-            symmetry, i.e., IterMesh instance has to be create
-            ``is_mesh_symmetry=False``.
+            Mesh or IterMesh instance with eigenvectors.
         projection_direction:
             Eigenvector projection direction in Cartesian
             coordinates. If None, eigenvector is not projected.
@@ -141,13 +287,18 @@ class ThermalDisplacements(ThermalMotion):
             Minimum phonon frequency to determine wheather include or not.
         freq_max:
             Maximum phonon frequency to determine wheather include or not.
+        symmetry:
+            Symmetry instance of primitive cell. This is necessary when grid
+            points of iter_mesh are reduced by symmetry, where phonons are
+            solved only at ir-grid points.
 
         """
 
         ThermalMotion.__init__(self,
                                iter_mesh,
                                freq_min=freq_min,
-                               freq_max=freq_max)
+                               freq_max=freq_max,
+                               symmetry=symmetry)
         if projection_direction is None:
             self._projection_direction = None
         else:
@@ -163,6 +314,17 @@ class ThermalDisplacements(ThermalMotion):
         return (self._temperatures, self._displacements)
 
     def run(self):
+        if self._is_reduced:
+            disps, num_qpoints = self._get_disp_matrices()
+            if self._projection_direction is None:
+                disps = np.diagonal(disps, axis1=2, axis2=3).reshape(
+                    len(disps), -1)
+            else:
+                d = self._projection_direction
+                disps = np.dot(np.dot(disps, d), d)
+            self._displacements = disps / num_qpoints
+            return
+
         if self._projection_direction is not None:
             masses = self._masses
         else:
@@ -170,28 +332,24 @@ class ThermalDisplacements(ThermalMotion):
         temps = self._temperatures
         disps = np.zeros((len(temps), len(masses)), dtype=float)
 
-        for count, (fs, vecs) in enumerate(self._iter_mesh):
+        num_qpoints = 0
+        for _, _, freqs, eigvecs in self._iter_mesh.iter_chunks():
+            num_qpoints += len(freqs)
+            # [q, band, 3 * atoms]
+            vecs = eigvecs.transpose(0, 2, 1)
             if self._projection_direction is not None:
-                p_vecs = np.dot(
-                    vecs.T.reshape(-1, 3),
-                    self._projection_direction).reshape(-1, len(masses))
+                p_vecs = np.dot(vecs.reshape(vecs.shape[:2] + (-1, 3)),
+                                self._projection_direction)
                 vecs2 = np.abs(p_vecs) ** 2 / masses
             else:
-                vecs2 = (abs(vecs) ** 2).T / masses
-
-            valid_indices = fs > self._fmin
-            if self._fmax is not None:
-                valid_indices *= fs < self._fmax
+                vecs2 = np.abs(vecs) ** 2 / masses
 
-            if len(temps) == 1:
-                Q2 = self._get_Q2(fs[valid_indices], temps[0])
-                disps[0] += np.dot(Q2, vecs2[valid_indices])
-            else:
-                for f, v2 in zip(fs[valid_indices], vecs2[valid_indices]):
-                    disps += np.outer(self._get_Q2(f, temps), v2)
+            valid_indices = self._get_valid_indices(freqs)
+            Q2 = self._get_Q2_at_temperatures(freqs[valid_indices], temps)
+            disps += np.dot(Q2, vecs2[valid_indices])
 
-        assert np.prod(self._iter_mesh.mesh_numbers) == count + 1
-        self._displacements = disps / (count + 1)
+        assert np.prod(self._iter_mesh.mesh_numbers) == num_qpoints
+        self._displacements = disps / num_qpoints
 
     def write_yaml(self):
         natom = len(self._masses)
@@ -241,15 +399,14 @@ class ThermalDisplacementMatrices(ThermalMotion):
                  iter_mesh,
                  freq_min=None,
                  freq_max=None,
-                 lattice=None):
+                 lattice=None,
+                 symmetry=None):
         """Calculate mean square displacement matrices
 
         Parameters
         ----------
         iter_mesh:
-            Mesh or IterMesh instance. Grid points must not be reduced by
-            symmetry, i.e., IterMesh instance has to be create
-            ``is_mesh_symmetry=False``.
+            Mesh or IterMesh instance with eigenvectors.
         freq_min: float
             Minimum phonon frequency to determine wheather include or not.
         freq_max: float
@@ -258,13 +415,18 @@ class ThermalDisplacementMatrices(ThermalMotion):
             Lattice parameters (column vectors) in real space
             dtype='double'
             shape=(3, 3)
+        symmetry:
+            Symmetry instance of primitive cell. This is necessary when grid
+            points of iter_mesh are reduced by symmetry, where phonons are
+            solved only at ir-grid points.
 
         """
 
         ThermalMotion.__init__(self,
                                iter_mesh,
                                freq_min=freq_min,
-                               freq_max=freq_max)
+                               freq_max=freq_max,
+                               symmetry=symmetry)
         self._disp_matrices = None
         self._disp_matrices_cif = None
 
@@ -298,53 +460,13 @@ class ThermalDisplacementMatrices(ThermalMotion):
         """
 
         np.seterr(over=np_overflow)
-        self._get_disp_matrices()
+        disps, num_qpoints = self._get_disp_matrices()
+        self._disp_matrices = disps / num_qpoints
         np.seterr(over=None)
 
         if self._ANinv is not None:
-            self._disp_matrices_cif = np.zeros(self._disp_matrices.shape,
-                                               dtype='double')
-            for i, matrices in enumerate(self._disp_matrices):
-                for j, mat in enumerate(matrices):
-                    mat_cif = np.dot(np.dot(self._ANinv, mat),
-                                     self._ANinv.T)
-                    self._disp_matrices_cif[i, j] = mat_cif
-
-        self._get_disp_matrices()
-
-    def _get_disp_matrices(self):
-        dtype_complex = "c%d" % (np.dtype('double').itemsize * 2)
-        disps = np.zeros((len(self._temperatures), len(self._masses),
-                          3, 3), dtype=dtype_complex)
-        for count, (freqs, eigvecs) in enumerate(self._iter_mesh):
-            valid_indices = freqs > self._fmin
-            if self._fmax is not None:
-                valid_indices *= freqs < self._fmax
-            for i_band, (f, vec) in enumerate(
-                    zip(freqs[valid_indices], (eigvecs.T)[valid_indices])):
-                c = np.zeros((len(self._masses), 3, 3),
-                             dtype=dtype_complex, order='C')
-                for i, (v, m) in enumerate(
-                        zip(vec.reshape(-1, 3), self._masses)):
-                    c[i] = np.outer(v, v.conj()) / m
-
-                # for i, t in enumerate(self._temperatures):
-                #     try:
-                #         disps[i] += self._get_Q2(f, t) * np.array(c)
-                #     except FloatingPointError as e:
-                #         # Probably, overflow in exp(freq / (kB * T))
-                #         print("%s: T=%.1f freq=%.2f (band #%d)" %
-                #               (e, t, f, i_band))
-                try:
-                    Q2 = self._get_Q2(f, self._temperatures)
-                    disps += Q2[:, None, None, None] * c[None, :, :, :]
-                except FloatingPointError as e:
-                    # Probably, overflow in exp(freq / (kB * T))
-                    print("%s: freq=%.2f (band #%d)" % (e, f, i_band))
-
-        assert np.prod(self._iter_mesh.mesh_numbers) == count + 1
-        assert (abs(disps.imag) < 1e-10).all()
-        self._disp_matrices = disps.real / (count + 1)
+            self._disp_matrices_cif = np.matmul(
+                np.matmul(self._ANinv, self._disp_matrices), self._ANinv.T)
 
     def write_cif(self, cell, temperature_index):
         write_cif_P1(cell,
@@ -61,6 +61,200 @@ def mode_zero(temp, freqs):
     return np.zeros_like(freqs)
 
 
+def _to_eV(frequencies, band_indices=None, pretend_real=False):
+    freqs = np.array(frequencies, dtype='double', order='C')
+    if band_indices is not None:
+        freqs = np.array(freqs[:, band_indices], dtype='double', order='C')
+    if pretend_real:
+        freqs = abs(freqs)
+    return np.array(freqs, dtype='double', order='C') * THzToEv
+
+
+def _sum_in_order(start, values):
+    """Sum values along the first axis strictly one after another
+
+    Running sums are thereby independent of how q-points are split into
+    blocks.
+
+    """
+    return np.cumsum(np.concatenate(([start], values)), axis=0)[-1]
+
+
+class ThermalPropertiesAccumulator(object):
+    """Thermal properties accumulated from blocks of phonon frequencies
+
+    Only running sums over q-points of free energy, entropy, and heat
+    capacity at each temperature and of zero point energy are stored.
+    Therefore frequencies at all q-points do not have to be held in memory
+    at once, and they can be given block by block, e.g., by
+    IterMesh.iter_chunks or by reading a file step by step. The results
+    are identical to those of ThermalProperties.run.
+
+    Attributes
+    ----------
+    temperatures : ndarray
+        dtype='double', shape=(temperatures,)
+    thermal_properties : list of ndarray
+        [temperatures, free energy (kJ/mol), entropy (J/K/mol),
+        heat capacity (J/K/mol)], each of shape=(temperatures,).
+    zero_point_energy : float
+        Zero point energy in kJ/mol.
+    high_T_entropy : float
+        Entropy in the high temperature limit without the temperature
+        dependent term.
+    number_of_modes : int
+        Number of phonon modes on sampling mesh.
+    number_of_integrated_modes : int
+        Number of phonon modes used for integration on sampling mesh.
+
+    """
+    def __init__(self,
+                 temperatures,
+                 band_indices=None,
+                 cutoff_frequency=None,
+                 pretend_real=False):
+        """
+
+        Parameters
+        ----------
+        temperatures : array_like
+            Temperatures in K.
+            shape=(temperatures,)
+        band_indices : array_like, optional
+            Indices of bands included. Default is None, i.e., all bands.
+        cutoff_frequency : float, optional
+            Modes with frequencies lower than or equal to this value are
+            excluded as in ThermalProperties. Default is None, i.e., 0.
+        pretend_real : bool, optional
+            Absolute values of frequencies are used. Default is False.
+
+        """
+        self._temperatures = np.array(temperatures, dtype='double')
+        if band_indices is None:
+            self._band_indices = None
+        else:
+            self._band_indices = np.hstack(band_indices).astype('intc')
+        if cutoff_frequency is None or cutoff_frequency < 0:
+            self._cutoff_frequency = 0.0
+        else:
+            self._cutoff_frequency = cutoff_frequency
+        self._pretend_real = pretend_real
+
+        # Free energy without zero point energy, entropy, heat capacity (eV)
+        self._sums = np.zeros((len(self._temperatures), 3),
+                              dtype='double', order='C')
+        self._zero_point_energy_sum = 0.0
+        self._high_T_entropy_sum = 0.0
+        self._sum_weights = 0
+        self._num_modes = 0
+        self._num_integrated_modes = 0
+
+    @property
+    def temperatures(self):
+        return self._temperatures
+
+    @property
+    def thermal_properties(self):
+        props = self._sums / self._sum_weights
+        fe = props[:, 0] * EvTokJmol + self.zero_point_energy
+        entropy = props[:, 1] * EvTokJmol * 1000
+        cv = props[:, 2] * EvTokJmol * 1000
+        return [self._temperatures, fe, entropy, cv]
+
+    @property
+    def zero_point_energy(self):
+        return (self._zero_point_energy_sum / self._sum_weights
+                * EvTokJmol)
+
+    @property
+    def high_T_entropy(self):
+        return (self._high_T_entropy_sum * Kb / self._sum_weights
+                * EvTokJmol)
+
+    @property
+    def number_of_modes(self):
+        return self._num_modes
+
+    @property
+    def number_of_integrated_modes(self):
+        return self._num_integrated_modes
+
+    def run(self, chunks):
+        """Accumulate over blocks of q-points
+
+        Parameters
+        ----------
+        chunks : iterable
+            Each item is (frequencies, weights) at a block of q-points,
+            e.g., ((f, w) for _, w, f, _ in iter_mesh.iter_chunks()).
+            frequencies : array_like
+                Phonon frequencies in THz.
+                shape=(qpoints in block, bands)
+            weights : array_like
+                Geometric q-point weights.
+                shape=(qpoints in block,)
+
+        """
+        for frequencies, weights in chunks:
+            self.add(frequencies, weights)
+
+    def add(self, frequencies, weights):
+        """Add phonons at a block of q-points
+
+        See the parameters at ThermalPropertiesAccumulator.run.
+
+        """
+        self._add(_to_eV(frequencies,
+                         band_indices=self._band_indices,
+                         pretend_real=self._pretend_real),
+                  np.array(weights, dtype='intc'))
+
+    def _add(self, freqs, weights):
+        """Add phonons whose frequencies are given in eV"""
+        try:
+            import phonopy._phonopy as phonoc
+            phonoc.thermal_properties(self._sums,
+                                      self._temperatures,
+                                      freqs,
+                                      weights,
+                                      self._cutoff_frequency)
+        except ImportError:
+            self._sums[:] = _sum_in_order(
+                self._sums, self._get_py_thermal_properties(freqs, weights))
+
+        positive = freqs > 0
+        positive_fs = np.where(positive, freqs, 1)
+        self._zero_point_energy_sum = _sum_in_order(
+            self._zero_point_energy_sum,
+            np.where(positive, freqs, 0).sum(axis=1) * weights / 2)
+        self._high_T_entropy_sum = _sum_in_order(
+            self._high_T_entropy_sum,
+            -np.log(positive_fs).sum(axis=1) * weights)
+        self._sum_weights += weights.sum()
+        self._num_modes += freqs.shape[1] * weights.sum()
+        self._num_integrated_modes += np.sum(
+            weights * (freqs > self._cutoff_frequency).sum(axis=1))
+
+    def _get_py_thermal_properties(self, freqs, weights):
+        """Return weighted properties at each q-point
+
+        shape=(qpoints, temperatures, 3)
+
+        """
+        props = np.zeros((len(freqs), len(self._temperatures), 3),
+                         dtype='double')
+        cond = freqs > self._cutoff_frequency
+        fs = np.where(cond, freqs, 1)
+        for i, t in enumerate(self._temperatures):
+            if t > 0:
+                for j, func in enumerate((mode_F, mode_S, mode_cv)):
+                    vals = func(t, fs)
+                    if j == 0:
+                        vals -= fs / 2
+                    props[:, i, j] = np.where(cond, vals, 0).sum(axis=1)
+        return props * weights[:, None, None]
+
+
 class ThermalPropertiesBase(object):
     def __init__(self,
                  mesh,
@@ -70,6 +264,8 @@ class ThermalPropertiesBase(object):
                  pretend_real=False):
         self._is_projection = is_projection
         self._band_indices = None
+        self._pretend_real = pretend_real
+        self._iter_mesh = None
 
         if cutoff_frequency is None or cutoff_frequency < 0:
             self._cutoff_frequency = 0.0
@@ -77,27 +273,64 @@ class ThermalPropertiesBase(object):
             self._cutoff_frequency = cutoff_frequency
 
         if band_indices is not None:
-            bi = np.hstack(band_indices).astype('intc')
-            self._band_indices = bi
-            self._frequencies = np.array(mesh.frequencies[:, bi],
-                                         dtype='double', order='C')
-            if mesh.eigenvectors is not None:
-                self._eigenvectors = np.array(mesh.eigenvectors[:, :, bi],
-                                              dtype='double', order='C')
+            self._band_indices = np.hstack(band_indices).astype('intc')
+
+        # IterMesh does not store phonons. They are generated at blocks of
+        # q-points and only running sums are accumulated when running.
+        if not hasattr(mesh, 'frequencies'):
+            if is_projection:
+                msg = "Projection is not supported with IterMesh."
+                raise RuntimeError(msg)
+            self._iter_mesh = mesh
+            self._frequencies = None
+            self._eigvecs2 = None
+            self._weights = mesh.weights
+            if self._band_indices is None:
+                self._num_bands = (
+                    mesh.dynamical_matrix.primitive.get_number_of_atoms() * 3)
+            else:
+                self._num_bands = len(self._band_indices)
+            self._num_modes = self._num_bands * self._weights.sum()
+            self._num_integrated_modes = None
+            return
+
+        # |e|^2 with shape (q-points, components, bands) for projection
+        if is_projection:
+            self._eigvecs2 = self._get_squared_eigenvectors(
+                mesh.eigenvectors)
         else:
-            self._frequencies = mesh.frequencies
-            self._eigenvectors = mesh.eigenvectors
+            self._eigvecs2 = None
 
-        if pretend_real:
-            self._frequencies = abs(self._frequencies)
-        self._frequencies = np.array(self._frequencies,
-                                     dtype='double', order='C') * THzToEv
+        self._frequencies = _to_eV(mesh.frequencies,
+                                   band_indices=self._band_indices,
+                                   pretend_real=pretend_real)
+        self._num_bands = self._frequencies.shape[1]
         self._weights = mesh.weights
         self._num_modes = self._frequencies.shape[1] * self._weights.sum()
         self._num_integrated_modes = np.sum(
             self._weights * (self._frequencies >
                              self._cutoff_frequency).sum(axis=1))
 
+    def _get_squared_eigenvectors(self, eigenvectors):
+        """Return |e|^2 computed block by block of q-points
+
+        Eigenvectors may be h5py.Dataset, which is read partially.
+
+        """
+        num_qpoints, num_comp, num_band = eigenvectors.shape
+        if self._band_indices is not None:
+            num_band = len(self._band_indices)
+        eigvecs2 = np.zeros((num_qpoints, num_comp, num_band),
+                            dtype='double', order='C')
+        chunk_size = max(1, 2 ** 22 // (num_comp * num_band))
+        for i in range(0, num_qpoints, chunk_size):
+            j = min(i + chunk_size, num_qpoints)
+            vecs = np.array(eigenvectors[i:j])
+            if self._band_indices is not None:
+                vecs = vecs[:, :, self._band_indices]
+            eigvecs2[i:j] = np.abs(vecs) ** 2
+        return eigvecs2
+
     def run_free_energy(self, t):
         if t > 0:
             free_energy = self._calculate_thermal_property(mode_F, t)
@@ -127,9 +360,9 @@ class ThermalPropertiesBase(object):
                 t_property += np.sum(func(t, freqs[cond])) * w
             return t_property
         else:
-            t_property = np.zeros(len(self._frequencies[0]), dtype='double')
+            t_property = np.zeros(self._eigvecs2.shape[1], dtype='double')
             for freqs, eigvecs2, w in zip(self._frequencies,
-                                          np.abs(self._eigenvectors) ** 2,
+                                          self._eigvecs2,
                                           self._weights):
                 cond = freqs > self._cutoff_frequency
                 t_property += np.dot(eigvecs2[:, cond],
@@ -156,7 +389,8 @@ class ThermalProperties(ThermalPropertiesBase):
         self._zero_point_energy = None
         self._projected_thermal_properties = None
 
-        self._set_high_T_entropy_and_zero_point_energy()
+        if self._iter_mesh is None:
+            self._set_high_T_entropy_and_zero_point_energy()
 
     @property
     def temperatures(self):
@@ -172,6 +406,10 @@ class ThermalProperties(ThermalPropertiesBase):
     def get_thermal_properties(self):
         return self.thermal_properties
 
+    @property
+    def projected_thermal_properties(self):
+        return self._projected_thermal_properties
+
     @property
     def zero_point_energy(self):
         return self._zero_point_energy
@@ -256,26 +494,20 @@ class ThermalProperties(ThermalPropertiesBase):
                           "\'set_temperature_range\' method instead.")
             self.set_temperature_range(t_min=t_min, t_max=t_max, t_step=t_step)
 
-        try:
-            import phonopy._phonopy as phonoc
-            self._run_c_thermal_properties()
-        except ImportError:
-            self._run_py_thermal_properties()
+        if self._iter_mesh is not None:
+            self._run_iter_mesh_thermal_properties()
+            return
+
+        tpa = self._get_accumulator()
+        tpa._add(self._frequencies, self._weights)
+        self._thermal_properties = tpa.thermal_properties
 
         if self._is_projection:
-            fe = []
-            entropy = []
-            cv = []
-            for t in self._temperatures:
-                fe.append(self.run_free_energy(t))
-                entropy.append(self.run_entropy(t) * 1000,)
-                cv.append(self.run_heat_capacity(t) * 1000)
-
-            self._projected_thermal_properties = [
-                self._temperatures,
-                np.array(fe, dtype='double'),
-                np.array(entropy, dtype='double'),
-                np.array(cv, dtype='double')]
+            try:
+                import phonopy._phonopy as phonoc
+                self._run_c_projected_thermal_properties()
+            except ImportError:
+                self._run_py_projected_thermal_properties()
 
     def write_yaml(self, filename='thermal_properties.yaml', volume=None):
         lines = self._get_tp_yaml_lines(volume=volume)
@@ -284,40 +516,52 @@ class ThermalProperties(ThermalPropertiesBase):
         with open(filename, 'w') as f:
             f.write("\n".join(lines))
 
-    def _run_c_thermal_properties(self):
+    def _get_accumulator(self, temperatures=None):
+        if temperatures is None:
+            temperatures = self._temperatures
+        return ThermalPropertiesAccumulator(
+            temperatures,
+            band_indices=self._band_indices,
+            cutoff_frequency=self._cutoff_frequency,
+            pretend_real=self._pretend_real)
+
+    def _run_iter_mesh_thermal_properties(self):
+        tpa = self._get_accumulator()
+        tpa.run((freqs, weights) for _, weights, freqs, _
+                in self._iter_mesh.iter_chunks())
+        self._thermal_properties = tpa.thermal_properties
+        self._zero_point_energy = tpa.zero_point_energy
+        self._high_T_entropy = tpa.high_T_entropy
+        self._num_integrated_modes = tpa.number_of_integrated_modes
+
+    def _run_c_projected_thermal_properties(self):
         import phonopy._phonopy as phonoc
 
-        props = np.zeros((len(self._temperatures), 3),
+        props = np.zeros((len(self._temperatures), 3,
+                          self._eigvecs2.shape[1]),
                          dtype='double', order='C')
-        phonoc.thermal_properties(props,
-                                  self._temperatures,
-                                  self._frequencies,
-                                  self._weights,
-                                  self._cutoff_frequency)
-        # for f, w in zip(self._frequencies, self._weights):
-        #     phonoc.thermal_properties(
-        #         props,
-        #         self._temperatures,
-        #         np.array(f, dtype='double', order='C')[None, :],
-        #         np.array([w], dtype='intc'),
-        #         cutoff_frequency)
-
-        props /= np.sum(self._weights)
-        fe = props[:, 0] * EvTokJmol + self._zero_point_energy
-        entropy = props[:, 1] * EvTokJmol * 1000
-        cv = props[:, 2] * EvTokJmol * 1000
-        self._thermal_properties = [self._temperatures, fe, entropy, cv]
+        phonoc.projected_thermal_properties(props,
+                                            self._temperatures,
+                                            self._frequencies,
+                                            self._eigvecs2,
+                                            self._weights,
+                                            self._cutoff_frequency)
+        props *= EvTokJmol / np.sum(self._weights)
+        self._projected_thermal_properties = [
+            self._temperatures,
+            props[:, 0],
+            props[:, 1] * 1000,
+            props[:, 2] * 1000]
 
-    def _run_py_thermal_properties(self):
+    def _run_py_projected_thermal_properties(self):
         fe = []
         entropy = []
         cv = []
         for t in self._temperatures:
-            props = self._get_py_thermal_properties(t)
-            fe.append(props[0])
-            entropy.append(props[1] * 1000)
-            cv.append(props[2] * 1000)
-        self._thermal_properties = [
+            fe.append(self.run_free_energy(t))
+            entropy.append(self.run_entropy(t) * 1000)
+            cv.append(self.run_heat_capacity(t) * 1000)
+        self._projected_thermal_properties = [
             self._temperatures,
             np.array(fe, dtype='double'),
             np.array(entropy, dtype='double'),
@@ -333,7 +577,7 @@ class ThermalProperties(ThermalPropertiesBase):
         lines.append("  entropy:       J/K/mol")
         lines.append("  heat_capacity: J/K/mol")
         lines.append("")
-        lines.append("natom: %-5d" % (self._frequencies[0].shape[0] // 3))
+        lines.append("natom: %-5d" % (self._num_bands // 3))
         if volume is not None:
             lines.append("volume: %-20.10f" % volume)
         lines.append("cutoff_frequency: %8.3f" % self._cutoff_frequency)
@@ -400,17 +644,8 @@ class ThermalProperties(ThermalPropertiesBase):
             lines.append(line)
         return lines
 
-    def _get_py_thermal_properties(self, t):
-        return (self.run_free_energy(t),
-                self.run_entropy(t),
-                self.run_heat_capacity(t))
-
     def _set_high_T_entropy_and_zero_point_energy(self):
-        zp_energy = 0.0
-        entropy = 0.0
-        for freqs, w in zip(self._frequencies, self._weights):
-            positive_fs = np.extract(freqs > 0.0, freqs)
-            entropy -= np.sum(np.log(positive_fs)) * w
-            zp_energy += np.sum(positive_fs) * w / 2
-        self._high_T_entropy = entropy * Kb / np.sum(self._weights) * EvTokJmol
-        self._zero_point_energy = zp_energy / np.sum(self._weights) * EvTokJmol
+        tpa = self._get_accumulator(temperatures=[])
+        tpa._add(self._frequencies, self._weights)
+        self._high_T_entropy = tpa.high_T_entropy
+        self._zero_point_energy = tpa.zero_point_energy
@@ -198,18 +198,21 @@ class DynamicStructureFactor(object):
         Q_cart = np.dot(self._rec_lat, self._Qpoints[self._q_count])
         Q_length = np.linalg.norm(Q_cart)
         if Q_length < 1e-8:
-            DW = np.zeros(len(self._primitive.get_number_of_atoms()),
+            DW = np.zeros(self._primitive.get_number_of_atoms(),
                           dtype='double')
         else:
             _, disps = self._get_thermal_displacements(Q_cart)
             DW = np.exp(-0.5 * (2 * np.pi * Q_length) ** 2 * disps[0])
         S = np.zeros(len(freqs), dtype='double')
-        for i, f in enumerate(freqs):
-            if self._fmin < f:
-                F = self._phonon_structure_factor(
-                    Q_cart, self._Gpoints[self._q_count], DW, f, eigvecs[:, i])
-                n = 1.0 / (np.exp(f * THzToEv / (Kb * self._T)) - 1)
-                S[i] = abs(F) ** 2 * (n + 1)
+        valid_indices = freqs > self._fmin
+        fs = freqs[valid_indices]
+        F = self._phonon_structure_factors(Q_cart,
+                                           self._Gpoints[self._q_count],
+                                           DW,
+                                           fs,
+                                           eigvecs[:, valid_indices])
+        n = 1.0 / (np.exp(fs * THzToEv / (Kb * self._T)) - 1)
+        S[valid_indices] = abs(F) ** 2 * (n + 1)
         return S * self._unit_convertion_factor
 
     def _set_phonon(self):
@@ -228,23 +231,23 @@ class DynamicStructureFactor(object):
         td.run()
         return td.get_thermal_displacements()
 
-    def _phonon_structure_factor(self, Q_cart, G, DW, freq, eigvec):
+    def _phonon_structure_factors(self, Q_cart, G, DW, freqs, eigvecs):
         symbols = self._primitive.get_chemical_symbols()
         masses = self._primitive.get_masses()
         pos = self._primitive.get_scaled_positions()
         phase = np.exp(-2j * np.pi * np.dot(pos, G))
-        W = eigvec.reshape(-1, 3)
-        val = 0
-        for i, m in enumerate(masses):
+        f = np.zeros(len(masses), dtype='double')
+        for i, symbol in enumerate(symbols):
             if self._func_AFF is not None:
-                f = self._func_AFF(symbols[i], np.linalg.norm(Q_cart))
+                f[i] = self._func_AFF(symbol, np.linalg.norm(Q_cart))
             elif self._b is not None:
-                f = self._b[symbols[i]]
+                f[i] = self._b[symbol]
             else:
                 raise RuntimeError
-            QW = np.dot(Q_cart, W[i]) * 2 * np.pi
-            val += f / np.sqrt(2 * m) * DW[i] * QW * phase[i]
-        val /= np.sqrt(freq)
+        # [atoms, bands]
+        QW = np.dot(Q_cart, eigvecs.reshape(len(masses), 3, -1)) * 2 * np.pi
+        val = np.dot(f / np.sqrt(2 * masses) * DW * phase, QW)
+        val /= np.sqrt(freqs)
         return val
 
     def _set_qpoints(self):
@@ -312,6 +312,12 @@ class Primitive(PhonopyAtoms):
         Mapping of primitive cell atoms in supercell to those in primitive
         cell.
         ex. {0: 0, 4: 1}
+    smallest_vectors : tuple of ndarray
+        Shortest vectors and multiplicities in the padded storage. See
+        get_smallest_vectors.
+    compact_smallest_vectors : tuple of ndarray
+        Shortest vectors and multiplicities in the compact storage
+        returned by get_smallest_vectors(..., store_compact_svecs=True).
     atomic_permutations : ndarray
         Atomic position permutation by pure translations is represented by
         changes of indices.
@@ -351,12 +357,23 @@ class Primitive(PhonopyAtoms):
         self._p2p_map = None
         self._smallest_vectors = None
         self._multiplicity = None
+        self._padded_smallest_vectors = None
         self._atomic_permutations = None
         self._primitive_cell(supercell)
         self._map_atomic_indices(supercell.get_scaled_positions())
         self._set_smallest_vectors(supercell)
         self._set_atomic_permutations(supercell)
 
+    def __getstate__(self):
+        """Return state for pickling without padded shortest vectors
+
+        Padded shortest vectors are rebuilt from the compact ones on demand.
+
+        """
+        state = self.__dict__.copy()
+        state['_padded_smallest_vectors'] = None
+        return state
+
     @property
     def primitive_matrix(self):
         return self._primitive_matrix
@@ -385,7 +402,59 @@ class Primitive(PhonopyAtoms):
     def get_primitive_to_primitive_map(self):
         return self.p2p_map
 
+    @property
+    def smallest_vectors(self):
+        if self._padded_smallest_vectors is None:
+            self._padded_smallest_vectors = compact_to_padded_svecs(
+                self._smallest_vectors, self._multiplicity)
+        return self._padded_smallest_vectors
+
     def get_smallest_vectors(self):
+        """Return shortest vectors and multiplicities
+
+        Shortest vectors are stored compactly (see compact_smallest_vectors).
+        The padded arrays are built at the first call and kept, which takes
+        memory of 27 vectors per atom pair.
+
+        Returns
+        -------
+        smallest_vectors : ndarray
+            Shortest vectors from primitive cell atoms to supercell atoms in
+            fractional coordinates of primitive cell. The 27 in shape is the
+            possible maximum number of elements.
+            dtype='double'
+            shape=(num_atoms_in_supercell, num_atoms_in_primitive_cell, 27, 3)
+        multiplicity : ndarray
+            Number of equidistance shortest vectors
+            dtype='intc'
+            shape=(num_atoms_in_supercell, num_atoms_in_primitive_cell)
+
+        """
+        return self.smallest_vectors
+
+    @property
+    def compact_smallest_vectors(self):
+        """Return shortest vectors and multiplicities in compact storage
+
+        Returns
+        -------
+        smallest_vectors : ndarray
+            Shortest vectors from primitive cell atoms to supercell atoms in
+            fractional coordinates of primitive cell, flattened over atom
+            pairs.
+            dtype='double'
+            shape=(num_svecs, 3)
+        multiplicity : ndarray
+            Number of shortest vectors and the address of the first one in
+            smallest_vectors for each atom pair, i.e., vectors of the pair
+            (i_s, i_p) are
+            smallest_vectors[multiplicity[i_s, i_p, 1]:
+                             multiplicity[i_s, i_p, 1] +
+                             multiplicity[i_s, i_p, 0]]
+            dtype='intc'
+            shape=(num_atoms_in_supercell, num_atoms_in_primitive_cell, 2)
+
+        """
         return self._smallest_vectors, self._multiplicity
 
     @property
@@ -584,7 +653,8 @@ def _get_smallest_vectors(supercell, primitive, symprec=1e-5):
     supercell_bases = supercell.get_cell()
     primitive_bases = primitive.get_cell()
     svecs, multi = get_smallest_vectors(
-        supercell_bases, supercell_pos, primitive_pos, symprec=symprec)
+        supercell_bases, supercell_pos, primitive_pos,
+        symprec=symprec, store_compact_svecs=True)
     trans_mat_float = np.dot(supercell_bases, np.linalg.inv(primitive_bases))
     trans_mat = np.rint(trans_mat_float).astype(int)
     assert (np.abs(trans_mat_float - trans_mat) < 1e-8).all()
@@ -595,7 +665,8 @@ def _get_smallest_vectors(supercell, primitive, symprec=1e-5):
 def get_smallest_vectors(supercell_bases,
                          supercell_pos,
                          primitive_pos,
-                         symprec=1e-5):
+                         symprec=1e-5,
+                         store_compact_svecs=False):
     """Find shortest atomic pair vectors
 
     Note
@@ -627,6 +698,10 @@ def get_smallest_vectors(supercell_bases,
         shape=(size_prim, 3)
     symprec : float, optional, default=1e-5
         Tolerance to find equal distances of vectors
+    store_compact_svecs : bool, optional, default=False
+        With True, shortest vectors are stored without padding, i.e.,
+        concatenated over atom pairs, and the multiplicities carry the
+        addresses of the first vectors of respective atom pairs.
 
     Returns
     -------
@@ -635,10 +710,15 @@ def get_smallest_vectors(supercell_bases,
         possible maximum number of elements.
         dtype='double'
         shape=(size_super, size_prim, 27, 3)
+        With store_compact_svecs=True,
+        shape=(sum of multiplicities, 3)
     multiplicities : ndarray
         Number of equidistance shortest vectors
         dtype='intc'
         shape=(size_super, size_prim)
+        With store_compact_svecs=True, the numbers and addresses of shortest
+        vectors in shortest_vectors are stored as
+        shape=(size_super, size_prim, 2)
 
     """
 
@@ -677,12 +757,36 @@ def get_smallest_vectors(supercell_bases,
     # as possible, since numpy can shell out to BLAS to handle the
     # real heavy lifting.
 
+    import phonopy._phonopy as phonoc
+
+    if store_compact_svecs:
+        # First run counts the vectors and the second run stores them.
+        multiplicity = np.zeros(
+            (len(supercell_fracs), len(primitive_fracs), 2),
+            dtype='intc', order='C')
+        shortest_vectors = np.zeros((0, 3), dtype='double', order='C')
+        for initialize in (1, 0):
+            phonoc.gsv_set_smallest_vectors_compact(
+                shortest_vectors,
+                multiplicity,
+                supercell_fracs,
+                primitive_fracs,
+                lattice_points,
+                np.array(reduced_bases.T, dtype='double', order='C'),
+                np.array(trans_mat_inv.T, dtype='intc', order='C'),
+                initialize,
+                symprec)
+            if initialize:
+                shortest_vectors = np.zeros(
+                    (multiplicity[..., 0].sum(), 3),
+                    dtype='double', order='C')
+        return shortest_vectors, multiplicity
+
     shortest_vectors = np.zeros(
         (len(supercell_fracs), len(primitive_fracs), 27, 3),
         dtype='double', order='C')
     multiplicity = np.zeros((len(supercell_fracs), len(primitive_fracs)),
                             dtype='intc', order='C')
-    import phonopy._phonopy as phonoc
     phonoc.gsv_set_smallest_vectors(
         shortest_vectors,
         multiplicity,
@@ -741,6 +845,50 @@ def get_smallest_vectors(supercell_bases,
     return shortest_vectors, multiplicity
 
 
+def padded_to_compact_svecs(svecs, multi):
+    """Convert padded shortest vectors to compact storage
+
+    Parameters
+    ----------
+    svecs : ndarray
+        dtype='double'
+        shape=(size_super, size_prim, 27, 3)
+    multi : ndarray
+        dtype='intc'
+        shape=(size_super, size_prim)
+
+    Returns
+    -------
+    csvecs : ndarray
+        dtype='double'
+        shape=(sum of multiplicities, 3)
+    cmulti : ndarray
+        dtype='intc'
+        shape=(size_super, size_prim, 2)
+
+    """
+    cmulti = np.zeros(multi.shape + (2,), dtype='intc', order='C')
+    cmulti[..., 0] = multi
+    cmulti[..., 1].flat[1:] = np.cumsum(multi.ravel())[:-1]
+    mask = np.arange(svecs.shape[2]) < multi[:, :, None]
+    csvecs = np.array(svecs[mask], dtype='double', order='C')
+    return csvecs, cmulti
+
+
+def compact_to_padded_svecs(svecs, multi):
+    """Convert compact shortest vectors to padded storage
+
+    This is the inverse of padded_to_compact_svecs.
+
+    """
+    psvecs = np.zeros(multi.shape[:2] + (27, 3), dtype='double', order='C')
+    pmulti = np.array(multi[..., 0], dtype='intc', order='C')
+    indices = multi[:, :, 1:2] + np.arange(27)
+    mask = np.arange(27) < pmulti[:, :, None]
+    psvecs[mask] = svecs[indices[mask]]
+    return psvecs, pmulti
+
+
 def compute_all_sg_permutations(positions,  # scaled positions
                                 rotations,  # scaled
                                 translations,  # scaled
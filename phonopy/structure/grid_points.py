@@ -97,6 +97,11 @@ class GridPoints(object):
     grid_mapping_table: ndarray
         Index mapping table from all grid points to ir-grid points.
         dtype='uintp', shape=(prod(mesh_numbers),)
+    mesh_rotations: ndarray
+        Rotation matrices in real space actually used to reduce grid points.
+        Only the identity when the mesh does not have the point group
+        symmetry or when the symmetry search is not performed.
+        dtype='intc', shape=(rotations, 3, 3)
 
     """
 
@@ -165,6 +170,7 @@ class GridPoints(object):
         self._ir_grid_points = None
         self._ir_weights = None
         self._grid_mapping_table = None
+        self._mesh_rotations = None
 
         if self._is_shift is None:
             self._is_mesh_symmetry = False
@@ -210,13 +216,18 @@ class GridPoints(object):
     def get_grid_mapping_table(self):
         return self.grid_mapping_table
 
+    @property
+    def mesh_rotations(self):
+        return self._mesh_rotations
+
     def _set_grid_points(self):
         if self._is_mesh_symmetry and self._has_mesh_symmetry():
-            self._set_ir_qpoints(self._rotations,
-                                 is_time_reversal=self._is_time_reversal)
+            rotations = self._rotations
         else:
-            self._set_ir_qpoints([np.eye(3, dtype='intc')],
-                                 is_time_reversal=self._is_time_reversal)
+            rotations = [np.eye(3, dtype='intc')]
+        self._mesh_rotations = np.array(rotations, dtype='intc', order='C')
+        self._set_ir_qpoints(self._mesh_rotations,
+                             is_time_reversal=self._is_time_reversal)
 
     def _shift2boolean(self,
                        q_mesh_shift,
@@ -252,7 +263,21 @@ class GridPoints(object):
         mesh_equiv = [m[1] == m[2], m[2] == m[0], m[0] == m[1]]
         lattice_equiv = get_lattice_vector_equivalence(
             [r.T for r in self._rotations])
-        return np.extract(lattice_equiv, mesh_equiv).all()
+        if not np.extract(lattice_equiv, mesh_equiv).all():
+            return False
+
+        # Every rotation has to map the (shifted) grid onto itself. In
+        # doubled grid address, r' = D r^T D^-1 has to be an integer matrix
+        # and has to keep the parity of the shift.
+        shift = np.array(self._is_shift, dtype='intc')
+        for r in self._rotations:
+            r_grid = np.array(r).T * m[:, None] / m[None, :].astype('double')
+            r_grid_int = np.rint(r_grid).astype('intc')
+            if (np.abs(r_grid - r_grid_int) > 1e-8).any():
+                return False
+            if ((np.dot(r_grid_int, shift) - shift) % 2 != 0).any():
+                return False
+        return True
 
     def _fit_qpoints_in_BZ(self):
         qpoint_set_in_BZ = get_qpoints_in_Brillouin_zone(self._rec_lat,
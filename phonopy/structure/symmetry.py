@@ -318,6 +318,40 @@ def get_pointgroup(rotations):
     return ptg[0].strip(), ptg[2]
 
 
+def get_little_group_of_q(q_points, reciprocal_rotations, symprec=1e-5):
+    """Return little groups of q-points as boolean table
+
+    Each q-point is shifted by its nearest lattice point, q - rint(q),
+    and a rotation R is in the little group when Rq equals q within the
+    tolerance for all three components. The table is computed for all
+    q-points and rotations at once.
+
+    Parameters
+    ----------
+    q_points : array_like
+        q-points in reduced coordinates.
+        dtype='double', shape=(q_points, 3)
+    reciprocal_rotations : array_like
+        Rotation matrices in reciprocal space, q' = Rq.
+        dtype='intc', shape=(rotations, 3, 3)
+    symprec : float, optional
+        Tolerance of the comparison. Default is 1e-5.
+
+    Returns
+    -------
+    ndarray
+        True where the rotation is in the little group of the q-point.
+        dtype=bool, shape=(q_points, rotations)
+
+    """
+
+    q_in_BZ = np.reshape(q_points, (-1, 3)) - np.rint(
+        np.reshape(q_points, (-1, 3)))
+    diff = (q_in_BZ[:, None, :] -
+            np.einsum('rij,qj->qri', reciprocal_rotations, q_in_BZ))
+    return (np.abs(diff) < symprec).all(axis=2)
+
+
 def get_lattice_vector_equivalence(point_symmetry):
     """Return (b==c, c==a, a==b)"""
     # primitive_vectors: column vectors
@@ -2,9 +2,14 @@ import os
 import sys
 import numpy
 import sysconfig
+from ctypes.util import find_library
 
 with_openmp = False
 
+# Native phonon solver (phonopy._phonopy.phonons_at_qpoints) is built
+# when LAPACK library is found.
+with_lapack = find_library('lapack') is not None
+
 try:
     from setuptools import setup, Extension
     use_setuptools = True
@@ -65,10 +70,17 @@ else:
     extra_compile_args_phonopy = []
     extra_link_args_phonopy = []
 
+define_macros_phonopy = []
+if with_lapack:
+    sources_phonopy.append('c/harmonic/phonon_solver.c')
+    extra_link_args_phonopy.append('-llapack')
+    define_macros_phonopy.append(('PHPY_WITH_LAPACK', None))
+
 extension_phonopy = Extension(
     'phonopy._phonopy',
     extra_compile_args=extra_compile_args_phonopy,
     extra_link_args=extra_link_args_phonopy,
+    define_macros=define_macros_phonopy,
     include_dirs=include_dirs_phonopy,
     sources=sources_phonopy)
 
@@ -0,0 +1,64 @@
+import unittest
+import numpy as np
+from phonopy import Phonopy
+from phonopy.interface.vasp import read_vasp
+from phonopy.file_IO import parse_FORCE_SETS, parse_BORN
+from phonopy.harmonic.derivative_dynmat import DerivativeOfDynamicalMatrix
+import os
+
+data_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestDerivativeOfDynamicalMatrix(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_run_batch(self):
+        qpoints = [[0, 0, 0], [0.1, 0.2, 0.3], [0.5, 0.5, 0], [0.25, 0, 0.5]]
+        directions = [[1, 2, 3], [1, 0, 0], [0, 0, 1]]
+        for is_nac in (False, True):
+            for is_compact_fc in (False, True):
+                phonon = self._get_phonon(is_nac, is_compact_fc)
+                ddm = DerivativeOfDynamicalMatrix(phonon.dynamical_matrix)
+                ddms = ddm.run_batch(qpoints)
+                ddms_dirs = ddm.run_batch(qpoints, directions=directions)
+                ddms_py = ddm.run_batch(qpoints, lang='py')
+                for i, q in enumerate(qpoints):
+                    ddm.run(q)
+                    ddm_q = ddm.get_derivative_of_dynamical_matrix()
+                    np.testing.assert_allclose(ddms[i], ddm_q, atol=1e-12)
+                    np.testing.assert_allclose(
+                        ddms_dirs[i],
+                        np.tensordot(directions, ddm_q, axes=(1, 0)),
+                        atol=1e-12)
+                    np.testing.assert_allclose(ddms_py[i], ddm_q, atol=1e-8)
+
+    def _get_phonon(self, is_nac, is_compact_fc):
+        cell = read_vasp(os.path.join(data_dir, "..", "POSCAR_NaCl"))
+        phonon = Phonopy(cell,
+                         np.diag([2, 2, 2]),
+                         primitive_matrix=[[0, 0.5, 0.5],
+                                           [0.5, 0, 0.5],
+                                           [0.5, 0.5, 0]])
+        filename = os.path.join(data_dir, "..", "FORCE_SETS_NaCl")
+        force_sets = parse_FORCE_SETS(filename=filename)
+        phonon.dataset = force_sets
+        phonon.produce_force_constants(
+            calculate_full_force_constants=(not is_compact_fc))
+        if is_nac:
+            filename_born = os.path.join(data_dir, "..", "BORN_NaCl")
+            nac_params = parse_BORN(phonon.primitive, filename=filename_born)
+            nac_params['method'] = 'wang'
+            phonon.nac_params = nac_params
+            phonon.dynamical_matrix.set_nac_params(nac_params)
+        return phonon
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(
+        TestDerivativeOfDynamicalMatrix)
+    unittest.TextTestRunner(verbosity=2).run(suite)
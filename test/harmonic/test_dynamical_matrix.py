@@ -2,8 +2,15 @@ import unittest
 import numpy as np
 from phonopy import Phonopy
 from phonopy.interface.vasp import read_vasp
-from phonopy.file_IO import parse_FORCE_SETS
+from phonopy.file_IO import parse_FORCE_SETS, parse_BORN
+from phonopy.harmonic.dynamical_matrix import (DynamicalMatrix,
+                                               PhaseFactorCache,
+                                               GonzeNACCache,
+                                               get_G_list)
 import os
+import shutil
+import tempfile
+import warnings
 
 data_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -36,6 +43,232 @@ class TestDynamicalMatrix(unittest.TestCase):
         np.testing.assert_allclose(dynmat.dynamical_matrix,
                                    dynmat.get_dynamical_matrix())
 
+    def test_run_batch(self):
+        phonon = self._get_phonon()
+        qpoints = [[0, 0, 0], [0.1, 0.2, 0.3], [0.5, 0.5, 0], [0.25, 0, 0.5]]
+        for is_compact_fc in (False, True):
+            phonon.produce_force_constants(
+                calculate_full_force_constants=(not is_compact_fc))
+            dynmat = phonon.dynamical_matrix
+            dms = dynmat.run_batch(qpoints)
+            for q, dm in zip(qpoints, dms):
+                dynmat.set_dynamical_matrix(q)
+                np.testing.assert_allclose(dm, dynmat.dynamical_matrix,
+                                           atol=1e-12)
+
+    def test_fc_pair_list(self):
+        phonon = self._get_phonon()
+        qpoints = [[0, 0, 0], [0.1, 0.2, 0.3], [0.5, 0.5, 0], [0.25, 0, 0.5]]
+        for is_compact_fc in (False, True):
+            phonon.produce_force_constants(
+                calculate_full_force_constants=(not is_compact_fc))
+            self.assertFalse(phonon.dynamical_matrix._use_fc_pair_list)
+            phonon.set_force_constants_zero_with_radius(4.0)
+            fc = phonon.force_constants
+            dynmat = DynamicalMatrix(phonon.supercell, phonon.primitive, fc)
+            dynmat_pairs = phonon.dynamical_matrix
+            self.assertTrue(dynmat_pairs._use_fc_pair_list)
+            pair_ptr, _, fc_pairs = dynmat_pairs._fc_pair_list
+            self.assertEqual(pair_ptr[-1], len(fc_pairs))
+            num_satom = phonon.supercell.get_number_of_atoms()
+            self.assertTrue(len(fc_pairs) < num_satom * 2)
+            dms = dynmat_pairs.run_batch(qpoints)
+            for q, dm in zip(qpoints, dms):
+                dynmat.set_dynamical_matrix(q)
+                np.testing.assert_allclose(dm, dynmat.dynamical_matrix,
+                                           atol=1e-12)
+                dynmat_pairs.set_dynamical_matrix(q)
+                np.testing.assert_allclose(dynmat_pairs.dynamical_matrix,
+                                           dynmat.dynamical_matrix,
+                                           atol=1e-12)
+            phonon.force_constants = fc
+            self.assertFalse(phonon.dynamical_matrix._use_fc_pair_list)
+
+    def test_phase_factor_cache(self):
+        phonon = self._get_phonon()
+        qpoints = np.array([[0, 0, 0], [0.1, 0.2, 0.3], [0.5, 0.5, 0]])
+        cache = PhaseFactorCache()
+        for is_compact_fc in (False, True):
+            phonon.produce_force_constants(
+                calculate_full_force_constants=(not is_compact_fc))
+            fc = phonon.force_constants
+            dynmat = DynamicalMatrix(phonon.supercell, phonon.primitive, fc)
+            dynmat_cache = DynamicalMatrix(phonon.supercell,
+                                           phonon.primitive,
+                                           fc,
+                                           phase_factor_cache=cache)
+            np.testing.assert_allclose(dynmat_cache.run_batch(qpoints),
+                                       dynmat.run_batch(qpoints),
+                                       atol=1e-12)
+            # Phase factors are reused for modified force constants.
+            dynmat.force_constants[:] *= 2
+            dynmat_cache.force_constants[:] *= 2
+            np.testing.assert_allclose(dynmat_cache.run_batch(qpoints),
+                                       dynmat.run_batch(qpoints),
+                                       atol=1e-12)
+        self.assertEqual(len(cache._phase_factors), 1)
+
+        nbytes = cache.memory_usage
+        cache = PhaseFactorCache(memory_budget=nbytes)
+        dynmat.phase_factor_cache = cache
+        dynmat.run_batch(qpoints)
+        dynmat.run_batch(qpoints + 0.1)
+        self.assertEqual(len(cache._phase_factors), 1)
+        self.assertEqual(cache.memory_usage, nbytes)
+        cache = PhaseFactorCache(memory_budget=nbytes - 1)
+        dynmat.phase_factor_cache = cache
+        dynmat.run_batch(qpoints)
+        self.assertEqual(cache.memory_usage, 0)
+
+    def test_compute(self):
+        from multiprocessing.pool import ThreadPool
+        phonon = self._get_phonon()
+        phonon.produce_force_constants()
+        filename_born = os.path.join(data_dir, "..", "BORN_NaCl")
+        nac_params = parse_BORN(phonon.primitive, filename=filename_born)
+        qpoints = [[0.1, 0.2, 0.3], [0.5, 0.5, 0], [0.25, 0, 0.5]]
+        for method in ('wang', 'gonze', None):
+            if method is None:
+                phonon.nac_params = None
+            else:
+                phonon.nac_params = nac_params
+                nac_params['method'] = method
+                phonon.dynamical_matrix.set_nac_params(nac_params)
+            dynmat = phonon.dynamical_matrix
+            dynmat.set_dynamical_matrix([0, 0, 0])
+            dm_gamma = dynmat.dynamical_matrix.copy()
+            pool = ThreadPool(2)
+            dms = pool.map(dynmat.compute, qpoints * 4)
+            pool.close()
+            np.testing.assert_allclose(dynmat.dynamical_matrix, dm_gamma)
+            for q, dm in zip(qpoints * 4, dms):
+                dynmat.set_dynamical_matrix(q)
+                np.testing.assert_allclose(dm, dynmat.dynamical_matrix,
+                                           atol=1e-12)
+
+    def test_run_batch_Gonze(self):
+        phonon = self._get_phonon()
+        phonon.produce_force_constants()
+        filename_born = os.path.join(data_dir, "..", "BORN_NaCl")
+        phonon.nac_params = parse_BORN(phonon.primitive,
+                                       filename=filename_born)
+        dynmat = phonon.dynamical_matrix
+        qpoints = [[0, 0, 0], [0.1, 0.2, 0.3], [0.5, 0.5, 0], [1, 0, 0]]
+        dms = dynmat.run_batch(qpoints, q_direction=[1, 0, 0])
+        np.testing.assert_allclose(
+            dms[0], dynmat.compute(qpoints[0], q_direction=[1, 0, 0]),
+            atol=1e-12)
+        for q, dm in zip(qpoints[1:], dms[1:]):
+            np.testing.assert_allclose(dm, dynmat.compute(q), atol=1e-12)
+
+    def test_tune_Gonze_parameters(self):
+        phonon = self._get_phonon()
+        phonon.produce_force_constants()
+        filename_born = os.path.join(data_dir, "..", "BORN_NaCl")
+        nac_params = parse_BORN(phonon.primitive, filename=filename_born)
+        phonon.nac_params = nac_params
+        qpoints = [[0.13, 0.02, 0.41], [0.3, 0.3, 0.1]]
+        dms_ref = phonon.dynamical_matrix.run_batch(qpoints)
+
+        nac_params['Lambda'] = 'auto'
+        nac_params['accuracy'] = 1e-4
+        phonon.nac_params = nac_params
+        dynmat = phonon.dynamical_matrix
+        self.assertAlmostEqual(dynmat.Gonze_accuracy, 1e-4)
+        dms = dynmat.run_batch(qpoints)
+        G_cutoff, G_list, Lambda = dynmat.get_Gonze_nac_dataset()[2:5]
+        self.assertTrue(len(G_list) < 300)
+        np.testing.assert_allclose(dms, dms_ref,
+                                   atol=1e-4 * np.abs(dms_ref).max())
+        self.assertEqual(dynmat.tune_Gonze_parameters(accuracy=1e-4),
+                         (G_cutoff, Lambda))
+        self.assertEqual(dynmat.Gonze_parameters, (G_cutoff, Lambda))
+
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            params = dynmat.tune_Gonze_parameters(accuracy=1e-20)
+            self.assertTrue(any("did not reach" in str(x.message)
+                                for x in w))
+        self.assertEqual(dynmat.Gonze_parameters, params)
+
+    def test_py_Wang_dynamical_matrix(self):
+        phonon = self._get_phonon()
+        phonon.produce_force_constants(calculate_full_force_constants=False)
+        filename_born = os.path.join(data_dir, "..", "BORN_NaCl")
+        nac_params = parse_BORN(phonon.primitive, filename=filename_born)
+        phonon.nac_params = nac_params
+        nac_params['method'] = 'wang'
+        dynmat = phonon.dynamical_matrix
+        dynmat.set_nac_params(nac_params)
+        rec_lat = np.linalg.inv(phonon.primitive.get_cell())
+        for q_red in ([0.1, 0.2, 0.3], [0.5, 0, 0.25]):
+            q = np.dot(q_red, rec_lat.T)
+            factor = dynmat._get_constant_factor(
+                q, dynmat.get_dielectric_constant(),
+                phonon.primitive.get_volume(), nac_params['factor'])
+            np.testing.assert_allclose(
+                dynmat._get_py_Wang_dynamical_matrix(q_red, q, factor),
+                dynmat._get_c_Wang_dynamical_matrix(q_red, q, factor),
+                atol=1e-12)
+
+    def test_get_G_list(self):
+        lattice = np.array([[3.0, 0, 0], [1.5, 2.6, 0], [0.3, 0.2, 7.0]])
+        rec_lat = np.linalg.inv(lattice)
+        G_cutoff = 1.3
+        pts = np.arange(-20, 21)
+        grid = np.array(np.meshgrid(pts, pts, pts)).reshape(3, -1).T
+        G_vecs = np.dot(grid, rec_lat.T)
+        G_ref = G_vecs[(G_vecs ** 2).sum(axis=1) < G_cutoff ** 2]
+        G_list = get_G_list(rec_lat, G_cutoff)
+        np.testing.assert_allclose(G_list, G_ref)
+        self.assertTrue(G_list is get_G_list(rec_lat.copy(), G_cutoff))
+
+    def test_Gonze_nac_cache(self):
+        phonon = self._get_phonon()
+        phonon.produce_force_constants()
+        filename_born = os.path.join(data_dir, "..", "BORN_NaCl")
+        nac_params = parse_BORN(phonon.primitive, filename=filename_born)
+        phonon.nac_params = nac_params
+        dynmat = phonon.dynamical_matrix
+        q = [0.1, 0.2, 0.3]
+        dm_ref = dynmat.compute(q)
+        fc_ref = dynmat.get_Gonze_nac_dataset()[0].copy()
+
+        directory = tempfile.mkdtemp()
+        try:
+            cache = GonzeNACCache(directory)
+            for i in range(2):
+                dynmat.Gonze_nac_cache = cache
+                dynmat.make_Gonze_nac_dataset()
+                self.assertEqual(len(os.listdir(directory)), 1)
+                np.testing.assert_allclose(
+                    dynmat.get_Gonze_nac_dataset()[0], fc_ref, atol=1e-12)
+                np.testing.assert_allclose(
+                    dynmat.compute(q), dm_ref, atol=1e-12)
+
+            # Different Lambda gives a different file and the older one is
+            # removed when the cache is full.
+            cache = GonzeNACCache(directory, max_size=1)
+            dynmat.Gonze_nac_cache = cache
+            nac_params['Lambda'] = 0.3
+            dynmat.set_nac_params(nac_params)
+            dynmat.make_Gonze_nac_dataset()
+            self.assertEqual(len(os.listdir(directory)), 1)
+        finally:
+            shutil.rmtree(directory)
+
+    def _get_phonon(self):
+        cell = read_vasp(os.path.join(data_dir, "..", "POSCAR_NaCl"))
+        phonon = Phonopy(cell,
+                         np.diag([2, 2, 2]),
+                         primitive_matrix=[[0, 0.5, 0.5],
+                                           [0.5, 0, 0.5],
+                                           [0.5, 0.5, 0]])
+        filename = os.path.join(data_dir, "..", "FORCE_SETS_NaCl")
+        force_sets = parse_FORCE_SETS(filename=filename)
+        phonon.set_displacement_dataset(force_sets)
+        return phonon
+
 
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(TestDynamicalMatrix)
@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+from phonopy.phonon.degeneracy import (degenerate_sets,
+                                       get_degenerate_blocks,
+                                       rotate_eigenvectors,
+                                       rotate_eigenvectors_at_qpoints)
+
+
+class TestDegeneracy(unittest.TestCase):
+    def setUp(self):
+        num_qpoints = 20
+        num_band = 9
+        rng = np.random.RandomState(0)
+        eigvals = rng.randint(0, 5, size=(num_qpoints, num_band))
+        eigvals = eigvals + rng.normal(0, 1e-6, (num_qpoints, num_band))
+        self._eigvals = np.sort(eigvals, axis=1)
+        self._eigvals[3] = self._eigvals[3][::-1]
+        matrices = []
+        for i in range(2):
+            a = (rng.normal(size=(num_qpoints, num_band, num_band)) +
+                 1j * rng.normal(size=(num_qpoints, num_band, num_band)))
+            matrices.append(a + np.swapaxes(a, 1, 2).conj())
+        self._eigvecs = np.linalg.eigh(matrices[0])[1]
+        self._dDs = matrices[1]
+
+    def tearDown(self):
+        pass
+
+    def test_get_degenerate_blocks(self):
+        deg_sets = [[] for _ in self._eigvals]
+        for q_indices, band_indices in get_degenerate_blocks(self._eigvals):
+            for i, bands in zip(q_indices, band_indices):
+                deg_sets[i].append(list(bands))
+        for eigvals, deg_sets_q in zip(self._eigvals, deg_sets):
+            self.assertEqual(sorted(deg_sets_q), degenerate_sets(eigvals))
+
+    def test_rotate_eigenvectors_at_qpoints(self):
+        rot_eigvecs, eigvals_dD = rotate_eigenvectors_at_qpoints(
+            self._eigvals, self._eigvecs, self._dDs)
+        for i in range(len(self._eigvals)):
+            rot_eigvecs_q, eigvals_dD_q = rotate_eigenvectors(
+                self._eigvals[i], self._eigvecs[i], self._dDs[i])
+            np.testing.assert_allclose(rot_eigvecs[i], rot_eigvecs_q,
+                                       atol=1e-10)
+            np.testing.assert_allclose(eigvals_dD[i], eigvals_dD_q,
+                                       atol=1e-10)
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestDegeneracy)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -2,6 +2,7 @@ import unittest
 import os
 import numpy as np
 import phonopy
+from phonopy.phonon.dos import TotalDos, PartialDos
 
 data_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -73,6 +74,27 @@ class TestDOS(unittest.TestCase):
         # for f, d in zip(freqs, dos):
         #     print("%f %f" % (f, d))
 
+    def testSmearingMethodTolerance(self):
+        phonon = self._phonon
+        phonon.run_mesh([5, 5, 5],
+                        is_mesh_symmetry=False,
+                        with_eigenvectors=True)
+        for function_name in ('Normal', 'Cauchy'):
+            for cls in (TotalDos, PartialDos):
+                dos = cls(phonon.mesh, sigma=0.1)
+                dos.set_smearing_function(function_name)
+                dos.set_draw_area(freq_pitch=0.05)
+                dos.set_smearing_tolerance(1e-6)
+                dos.run()
+                dos_fft = np.array(dos.get_dos()[1] if cls is TotalDos
+                                   else dos.get_partial_dos()[1])
+                dos.set_smearing_tolerance(None)
+                dos.run()
+                dos_sum = (dos.get_dos()[1] if cls is TotalDos
+                           else dos.get_partial_dos()[1])
+                bound = 1e-6 * 6 * dos._smearing_function.calc(0)
+                self.assertTrue((np.abs(dos_fft - dos_sum) < bound).all())
+
     def testTotalDOSTetrahedron(self):
         phonon = self._phonon
         phonon.run_mesh([5, 5, 5])
@@ -100,6 +122,29 @@ class TestDOS(unittest.TestCase):
         # for f, d in zip(freqs, pdos.T):
         #     print(("%f" + " %f" * len(d)) % ((f, ) + tuple(d)))
 
+    def testPartialDOSWithoutEigenvectors(self):
+        phonon = self._phonon
+        for use_tetrahedron_method in (False, True):
+            for xyz_projection in (False, True):
+                phonon.run_mesh([5, 5, 5],
+                                is_mesh_symmetry=False,
+                                with_eigenvectors=True)
+                phonon.run_projected_dos(
+                    freq_pitch=1,
+                    use_tetrahedron_method=use_tetrahedron_method,
+                    xyz_projection=xyz_projection)
+                pdos_ref = phonon.projected_dos.projected_dos
+                phonon.run_mesh([5, 5, 5], is_mesh_symmetry=False)
+                phonon.run_projected_dos(
+                    freq_pitch=1,
+                    use_tetrahedron_method=use_tetrahedron_method,
+                    xyz_projection=xyz_projection)
+                self.assertTrue(phonon.mesh.eigenvectors is None)
+                self.assertEqual(phonon.mesh.projected_weights.dtype,
+                                 np.dtype('single'))
+                np.testing.assert_allclose(
+                    phonon.projected_dos.projected_dos, pdos_ref, atol=1e-6)
+
     def testPartialDOSTetrahedron(self):
         phonon = self._phonon
         phonon.run_mesh([5, 5, 5],
@@ -1,10 +1,14 @@
 import unittest
 import os
+import shutil
+import tempfile
 import numpy as np
 from phonopy import Phonopy
 from phonopy.interface.vasp import read_vasp
 from phonopy.file_IO import parse_FORCE_SETS, parse_BORN
-from phonopy.phonon.mesh import Mesh
+from phonopy.phonon.mesh import Mesh, MeshHDF5Reader
+from phonopy.phonon.dos import TotalDos, PartialDos
+from phonopy.phonon.thermal_properties import ThermalProperties
 
 data_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -34,6 +38,111 @@ class TestMesh(unittest.TestCase):
         np.testing.assert_allclose(mesh_freqs, freqs)
         np.testing.assert_allclose(mesh_eigvecs, eigvecs)
 
+    def testMeshSinglePrecision(self):
+        phonon = self._get_phonon()
+        phonon.run_mesh([5, 5, 5], with_eigenvectors=True)
+        freqs_ref = phonon.mesh.frequencies
+        phonon.run_mesh([5, 5, 5], with_eigenvectors=True, precision='single')
+        freqs = phonon.mesh.frequencies
+        eigvecs = phonon.mesh.eigenvectors
+        self.assertEqual(freqs.dtype, np.dtype('single'))
+        self.assertEqual(eigvecs.dtype, np.dtype('complex64'))
+        np.testing.assert_allclose(freqs, freqs_ref, atol=1e-5)
+        for eigvecs_q in eigvecs:
+            np.testing.assert_allclose(
+                np.dot(eigvecs_q.T.conj(), eigvecs_q),
+                np.eye(len(eigvecs_q)), atol=1e-5)
+        dms = phonon.dynamical_matrix.run_batch(phonon.mesh.qpoints)
+        eigvals = (freqs / phonon.unit_conversion_factor) ** 2
+        np.testing.assert_allclose(
+            np.matmul(dms, eigvecs),
+            eigvecs * eigvals[:, None, :] * np.sign(freqs)[:, None, :],
+            atol=1e-5)
+        self.assertRaises(ValueError, phonon.run_mesh, [5, 5, 5],
+                          precision='half')
+
+    def testMeshProcesses(self):
+        phonon = self._get_phonon()
+        phonon.run_mesh([5, 5, 5], with_eigenvectors=True)
+        freqs_ref = phonon.mesh.frequencies
+        eigvecs_ref = phonon.mesh.eigenvectors
+        phonon.run_mesh([5, 5, 5], with_eigenvectors=True, nprocs=2)
+        np.testing.assert_allclose(phonon.mesh.frequencies, freqs_ref)
+        np.testing.assert_allclose(phonon.mesh.eigenvectors, eigvecs_ref)
+
+    def testIterMeshChunks(self):
+        phonon = self._get_phonon()
+        phonon.run_mesh([4, 4, 4], with_eigenvectors=True)
+        mesh_freqs = phonon.mesh.frequencies
+        mesh_eigvecs = phonon.mesh.eigenvectors
+        phonon.init_mesh(mesh=[4, 4, 4],
+                         with_eigenvectors=True,
+                         use_iter_mesh=True,
+                         chunk_size=3)
+        blocks = list(phonon.mesh)
+        self.assertEqual(len(blocks[0][0]), 3)
+        np.testing.assert_allclose(np.vstack([b[0] for b in blocks]),
+                                   phonon.mesh.qpoints)
+        np.testing.assert_array_equal(np.hstack([b[1] for b in blocks]),
+                                      phonon.mesh.weights)
+        np.testing.assert_allclose(np.vstack([b[2] for b in blocks]),
+                                   mesh_freqs, atol=1e-10)
+        np.testing.assert_allclose(
+            abs(np.vstack([b[3] for b in blocks])), abs(mesh_eigvecs),
+            atol=1e-8)
+
+        phonon.init_mesh(mesh=[4, 4, 4], use_iter_mesh=True)
+        for f, e in phonon.mesh:
+            self.assertTrue(e is None)
+
+    def testMeshHDF5(self):
+        phonon = self._get_phonon()
+        phonon.run_mesh([4, 4, 4], with_eigenvectors=True)
+        mesh = phonon.mesh
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, "mesh.hdf5")
+            phonon.init_mesh(mesh=[4, 4, 4],
+                             with_eigenvectors=True,
+                             use_iter_mesh=True,
+                             chunk_size=3)
+            phonon.write_hdf5_mesh(filename=filename, compression='gzip')
+            with MeshHDF5Reader(filename) as reader:
+                np.testing.assert_array_equal(reader.mesh_numbers,
+                                              mesh.mesh_numbers)
+                np.testing.assert_allclose(reader.qpoints, mesh.qpoints)
+                np.testing.assert_array_equal(reader.weights, mesh.weights)
+                np.testing.assert_allclose(reader.frequencies[:],
+                                           mesh.frequencies, atol=1e-10)
+                np.testing.assert_allclose(abs(reader.eigenvectors[2]),
+                                           abs(mesh.eigenvectors[2]),
+                                           atol=1e-8)
+
+                total_dos = [TotalDos(m, sigma=0.1) for m in (mesh, reader)]
+                pdos = [PartialDos(m, sigma=0.1, direction=[1, 0, 0])
+                        for m in (mesh, reader)]
+                for dos in total_dos + pdos:
+                    dos.run()
+                np.testing.assert_allclose(total_dos[1].dos, total_dos[0].dos,
+                                           atol=1e-8)
+                np.testing.assert_allclose(pdos[1].partial_dos,
+                                           pdos[0].partial_dos, atol=1e-8)
+            phonon.write_hdf5_mesh(filename=filename,
+                                   eigenvector_precision='single')
+            with MeshHDF5Reader(filename) as reader:
+                self.assertEqual(reader.eigenvectors.dtype, np.complex64)
+                tps = [ThermalProperties(m, is_projection=True)
+                       for m in (mesh, reader)]
+                for tp in tps:
+                    tp.set_temperatures([0, 100, 300])
+                    tp.run()
+                for vals, vals_ref in zip(
+                        tps[1].projected_thermal_properties,
+                        tps[0].projected_thermal_properties):
+                    np.testing.assert_allclose(vals, vals_ref, atol=1e-5)
+        finally:
+            shutil.rmtree(tmpdir)
+
     def _get_phonon(self):
         cell = read_vasp(os.path.join(data_dir, "..", "POSCAR_NaCl"))
         phonon = Phonopy(cell,
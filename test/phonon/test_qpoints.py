@@ -5,6 +5,8 @@ from phonopy import Phonopy
 from phonopy.interface.vasp import read_vasp
 from phonopy.file_IO import parse_FORCE_SETS, parse_BORN
 from phonopy.units import VaspToTHz
+from phonopy.phonon.group_velocity import GroupVelocity
+from phonopy.phonon.solver import is_native_solver_available
 
 data_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -47,6 +49,55 @@ class TestQpoints(unittest.TestCase):
         freqs = phonon.qpoints.frequencies
         np.testing.assert_allclose(freqs ** 2 * np.sign(freqs), eigs)
 
+    @unittest.skipIf(not is_native_solver_available(),
+                     "C/LAPACK phonon solver is not compiled")
+    def testQpointsLapackSolver(self):
+        qpoints = [[0, 0, 0], [0.1, 0.2, 0.3], [0.5, 0, 0.5]]
+        for method in ('wang', 'gonze', None):
+            phonon = self._get_phonon()
+            if method is None:
+                phonon.nac_params = None
+            else:
+                nac_params = phonon.nac_params.copy()
+                nac_params['method'] = method
+                phonon.dynamical_matrix.set_nac_params(nac_params)
+            phonon.run_qpoints(qpoints,
+                               nac_q_direction=[1, 0, 0],
+                               with_eigenvectors=True)
+            freqs_ref = phonon.qpoints.frequencies
+            phonon._use_lapack_solver = True
+            phonon.run_qpoints(qpoints,
+                               nac_q_direction=[1, 0, 0],
+                               with_eigenvectors=True)
+            freqs = phonon.qpoints.frequencies
+            eigvecs = phonon.qpoints.eigenvectors
+            np.testing.assert_allclose(freqs, freqs_ref, atol=1e-6)
+            for eigvecs_q in eigvecs:
+                np.testing.assert_allclose(
+                    np.dot(eigvecs_q.T.conj(), eigvecs_q),
+                    np.eye(len(eigvecs_q)), atol=1e-10)
+
+    def testQpointsGroupVelocity(self):
+        qpoints = [[0.1, 0.2, 0.3], [0.5, 0, 0.5], [0.25, 0.25, 0]]
+        phonon = self._get_phonon()
+        phonon.run_qpoints(qpoints, with_group_velocities=True)
+        gv = phonon.qpoints.group_velocities
+        phonon.run_qpoints(qpoints,
+                           with_eigenvectors=True,
+                           with_group_velocities=True)
+        np.testing.assert_allclose(phonon.qpoints.group_velocities, gv,
+                                   atol=1e-8)
+        group_velocity = GroupVelocity(
+            phonon.dynamical_matrix,
+            symmetry=phonon.primitive_symmetry,
+            frequency_factor_to_THz=VaspToTHz)
+        group_velocity.set_q_points(
+            qpoints,
+            frequencies=phonon.qpoints.frequencies,
+            eigenvectors=phonon.qpoints.eigenvectors)
+        np.testing.assert_allclose(group_velocity.get_group_velocity(), gv,
+                                   atol=1e-8)
+
 
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(TestQpoints)
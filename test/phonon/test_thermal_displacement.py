@@ -0,0 +1,80 @@
+import unittest
+import os
+import numpy as np
+import phonopy
+
+data_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestThermalDisplacement(unittest.TestCase):
+    def setUp(self):
+        self._phonon = phonopy.load(
+            supercell_matrix=[[2, 0, 0], [0, 2, 0], [0, 0, 2]],
+            primitive_matrix=[[0, 0.5, 0.5],
+                              [0.5, 0, 0.5],
+                              [0.5, 0.5, 0]],
+            unitcell_filename=os.path.join(data_dir, "..", "POSCAR_NaCl"),
+            force_sets_filename=os.path.join(data_dir, "..",
+                                             "FORCE_SETS_NaCl"))
+
+    def tearDown(self):
+        pass
+
+    def testReducedMesh(self):
+        self._compare_with_full_mesh(self._phonon, [4, 4, 4])
+
+    def testReducedAnisotropicMesh(self):
+        # Cubic non-symmorphic crystal on a mesh breaking the cubic symmetry
+        phonon = phonopy.load(
+            supercell_matrix=[[2, 0, 0], [0, 2, 0], [0, 0, 2]],
+            unitcell_filename=os.path.join(data_dir, "POSCAR_P2_13"),
+            force_sets_filename=os.path.join(data_dir, "FORCE_SETS_P2_13"))
+        self._compare_with_full_mesh(phonon, [4, 4, 3])
+        self._compare_with_full_mesh(phonon, [4, 4, 4])
+
+    def _compare_with_full_mesh(self, phonon, mesh):
+        temps = [0, 300, 1000]
+        results = []
+        for is_mesh_symmetry in (False, True):
+            phonon.init_mesh(mesh,
+                             is_mesh_symmetry=is_mesh_symmetry,
+                             is_gamma_center=True,
+                             with_eigenvectors=True,
+                             use_iter_mesh=True,
+                             chunk_size=5)
+            phonon.run_thermal_displacement_matrices(temperatures=temps)
+            tdm = phonon.thermal_displacement_matrices
+            phonon.run_thermal_displacements(temperatures=temps)
+            disps = phonon.thermal_displacements.thermal_displacements
+            phonon.run_thermal_displacements(temperatures=temps,
+                                             direction=[1, 2, 3])
+            disps_proj = phonon.thermal_displacements.thermal_displacements
+            results.append((tdm.thermal_displacement_matrices,
+                            tdm.thermal_displacement_matrices_cif,
+                            disps,
+                            disps_proj))
+        self.assertTrue(len(phonon.mesh.weights) < np.prod(mesh))
+        for vals, vals_reduced in zip(*results):
+            np.testing.assert_allclose(vals_reduced, vals, atol=1e-12)
+
+    def testDiagonalOfMatrices(self):
+        phonon = self._phonon
+        phonon.run_mesh([4, 4, 4],
+                        is_mesh_symmetry=False,
+                        with_eigenvectors=True)
+        phonon.run_thermal_displacement_matrices(t_step=100, t_max=1000)
+        tdm = phonon.thermal_displacement_matrices
+        mats = tdm.thermal_displacement_matrices
+        phonon.run_thermal_displacements(t_step=100, t_max=1000)
+        disps = phonon.thermal_displacements.thermal_displacements
+        np.testing.assert_allclose(
+            np.diagonal(mats, axis1=2, axis2=3).reshape(len(mats), -1),
+            disps, atol=1e-12)
+        np.testing.assert_allclose(mats, np.swapaxes(mats, 2, 3),
+                                   atol=1e-12)
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(
+        TestThermalDisplacement)
+    unittest.TextTestRunner(verbosity=2).run(suite)
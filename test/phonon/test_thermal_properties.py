@@ -2,6 +2,8 @@ import unittest
 import os
 import numpy as np
 import phonopy
+from phonopy.phonon.thermal_properties import (
+    ThermalProperties, ThermalPropertiesAccumulator)
 
 data_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -42,6 +44,53 @@ class TestThermalProperties(unittest.TestCase):
         tp_ref = np.reshape([float(x) for x in tp_str.split()], (-1, 10))
         np.testing.assert_allclose(tp.thermal_properties, tp_ref, atol=1e-5)
 
+    def testProjectedThermalProperties(self):
+        phonon = self._get_phonon()
+        phonon.run_mesh([5, 5, 5], with_eigenvectors=True)
+        phonon.run_thermal_properties(t_step=100, t_max=900,
+                                      is_projection=True)
+        tp = phonon.thermal_properties
+        tp_proj = tp.projected_thermal_properties
+        for i in range(3):
+            np.testing.assert_allclose(tp_proj[i + 1].sum(axis=1),
+                                       tp.thermal_properties[i + 1],
+                                       atol=1e-8)
+
+        tp_py = ThermalProperties(phonon.mesh, is_projection=True)
+        tp_py.set_temperature_range(t_min=0, t_step=100, t_max=900)
+        tp_py._run_py_projected_thermal_properties()
+        for i in range(4):
+            np.testing.assert_allclose(
+                tp_proj[i], tp_py.projected_thermal_properties[i],
+                atol=1e-8)
+
+    def testThermalPropertiesIterMesh(self):
+        phonon = self._get_phonon()
+        phonon.run_mesh([5, 5, 5])
+        phonon.run_thermal_properties(t_step=100, t_max=900)
+        tp = phonon.thermal_properties
+        freqs = phonon.mesh.frequencies
+        weights = phonon.mesh.weights
+
+        phonon.init_mesh([5, 5, 5], use_iter_mesh=True, chunk_size=3)
+        phonon.run_thermal_properties(t_step=100, t_max=900)
+        tp_iter = phonon.thermal_properties
+
+        tpa = ThermalPropertiesAccumulator(tp.temperatures)
+        tpa.run((freqs[i:i + 7], weights[i:i + 7])
+                for i in range(0, len(freqs), 7))
+
+        for tp_chunk in (tp_iter, tpa):
+            for vals, vals_chunk in zip(tp.thermal_properties,
+                                        tp_chunk.thermal_properties):
+                np.testing.assert_array_equal(vals, vals_chunk)
+            self.assertEqual(tp.zero_point_energy,
+                             tp_chunk.zero_point_energy)
+            self.assertEqual(tp.high_T_entropy, tp_chunk.high_T_entropy)
+            self.assertEqual(tp.number_of_modes, tp_chunk.number_of_modes)
+            self.assertEqual(tp.number_of_integrated_modes,
+                             tp_chunk.number_of_integrated_modes)
+
     def _get_phonon(self):
         phonon = phonopy.load(
             supercell_matrix=[[2, 0, 0], [0, 2, 0], [0, 0, 2]],
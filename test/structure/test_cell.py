@@ -3,7 +3,9 @@ import unittest
 import os
 import numpy as np
 from phonopy.structure.atoms import PhonopyAtoms as Atoms
-from phonopy.structure.cells import get_supercell, get_primitive
+from phonopy.structure.cells import (
+    get_supercell, get_primitive, get_smallest_vectors,
+    padded_to_compact_svecs, compact_to_padded_svecs)
 from phonopy.interface.phonopy_yaml import read_cell_yaml
 
 data_dir = os.path.dirname(os.path.abspath(__file__))
@@ -94,6 +96,34 @@ class TestPrimitive(unittest.TestCase):
         self.assertTrue(id(self._pcell.p2p_map)
                         == id(self._pcell.get_primitive_to_primitive_map()))
 
+    def test_smallest_vectors(self):
+        cell = read_cell_yaml(os.path.join(data_dir, "..", "NaCl.yaml"))
+        scell = get_supercell(cell, np.diag([2, 2, 2]))
+        pos = scell.get_scaled_positions()
+        p2s = self._pcell.p2s_map
+        svecs, multi = get_smallest_vectors(scell.get_cell(), pos, pos[p2s])
+        csvecs, cmulti = get_smallest_vectors(scell.get_cell(), pos, pos[p2s],
+                                              store_compact_svecs=True)
+        self.assertTrue((multi > 1).any())
+        self.assertEqual(csvecs.shape, (multi.sum(), 3))
+        np.testing.assert_array_equal(cmulti[:, :, 0], multi)
+        _svecs, _multi = padded_to_compact_svecs(svecs, multi)
+        np.testing.assert_allclose(csvecs, _svecs)
+        np.testing.assert_array_equal(cmulti, _multi)
+        _svecs, _multi = compact_to_padded_svecs(csvecs, cmulti)
+        np.testing.assert_allclose(svecs, _svecs)
+        np.testing.assert_array_equal(multi, _multi)
+
+        svecs, multi = self._pcell.compact_smallest_vectors
+        self.assertEqual(multi.shape, (len(cell.numbers), len(p2s), 2))
+        self.assertEqual(len(svecs), multi[-1, -1].sum())
+        _svecs, _multi = self._pcell.get_smallest_vectors()
+        self.assertEqual(_svecs.shape, (len(cell.numbers), len(p2s), 27, 3))
+        np.testing.assert_array_equal(_multi, multi[:, :, 0])
+        _svecs, _multi = padded_to_compact_svecs(_svecs, _multi)
+        np.testing.assert_allclose(_svecs, svecs)
+        np.testing.assert_array_equal(_multi, multi)
+
 
 
 if __name__ == '__main__':
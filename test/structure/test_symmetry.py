@@ -1,9 +1,9 @@
 import unittest
 
 import numpy as np
-import time
 
 from phonopy.structure.symmetry import (Symmetry, symmetrize_borns_and_epsilon,
+                                        get_little_group_of_q,
                                         _get_supercell_and_primitive,
                                         _get_mapping_between_cells)
 from phonopy.structure.cells import get_supercell
@@ -41,6 +41,20 @@ class TestSymmetry(unittest.TestCase):
             diff -= np.rint(diff)
             self.assertTrue((diff < symprec).all())
 
+    def test_get_little_group_of_q(self):
+        cell = read_cell_yaml(os.path.join(data_dir, "..", "NaCl.yaml"))
+        symmetry = Symmetry(cell)
+        rotations = symmetry.get_reciprocal_operations()
+        q_points = [[0, 0, 0], [0.5, 0, 0], [0.1, 0.1, 0.1], [0.1, 0.2, 0.3],
+                    [1, 0, 1]]
+        little_groups = get_little_group_of_q(q_points, rotations)
+        self.assertEqual(little_groups.shape, (5, len(rotations)))
+        np.testing.assert_array_equal(little_groups.sum(axis=1),
+                                      [48, 8, 6, 1, 48])
+        for q, lg in zip(q_points[:4], little_groups):
+            for r, is_in in zip(rotations, lg):
+                self.assertEqual(np.allclose(np.dot(r, q), q), is_in)
+
     def test_magmom(self):
         symprec = 1e-5
         cell = read_cell_yaml(os.path.join(data_dir, "Cr.yaml"))